@@ -0,0 +1,525 @@
+import argparse
+import ast
+import glob
+import logging
+import os
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+try:
+    import onnxruntime as ort
+except ImportError:  # only needed for the "onnx" backend
+    ort = None
+
+try:
+    import openvino as ov
+except ImportError:  # only needed for the "openvino" backend
+    ov = None
+
+logger = logging.getLogger("detector-backend")
+
+# Inference backends for YoloObjectTracker, "auto" picks one from the model path
+BACKENDS = ("auto", "ultralytics", "onnx", "openvino")
+
+# Boxes, confidences and class ids of one image:
+# (N, 4) float32 xyxy in image pixels, (N,) float32, (N,) int64
+Prediction = Tuple[np.ndarray, np.ndarray, np.ndarray]
+
+LETTERBOX_COLOR = (114, 114, 114)
+
+
+def empty_prediction() -> Prediction:
+    return (
+        np.zeros((0, 4), dtype=np.float32),
+        np.zeros((0,), dtype=np.float32),
+        np.zeros((0,), dtype=np.int64),
+    )
+
+
+@dataclass
+class Batch:
+    """Images prepared for one forward pass plus what is needed to map boxes back"""
+
+    images: List[np.ndarray]
+    confidence_threshold: float
+    tensor: Optional[np.ndarray] = None
+    ratios: List[float] = field(default_factory=list)
+    pads: List[Tuple[float, float]] = field(default_factory=list)
+
+
+def letterbox(
+    image: np.ndarray, new_shape: Tuple[int, int]
+) -> Tuple[np.ndarray, float, Tuple[float, float]]:
+    """Resize keeping the aspect ratio and pad to new_shape (height, width)
+
+    Returns:
+        Tuple of (padded_image, scale_ratio, (pad_x, pad_y))
+    """
+    height, width = image.shape[:2]
+    new_h, new_w = new_shape
+    ratio = min(new_h / height, new_w / width)
+
+    resized_w, resized_h = int(round(width * ratio)), int(round(height * ratio))
+    pad_x, pad_y = (new_w - resized_w) / 2, (new_h - resized_h) / 2
+
+    if (resized_w, resized_h) != (width, height):
+        image = cv2.resize(
+            image, (resized_w, resized_h), interpolation=cv2.INTER_LINEAR
+        )
+
+    top, bottom = int(round(pad_y - 0.1)), int(round(pad_y + 0.1))
+    left, right = int(round(pad_x - 0.1)), int(round(pad_x + 0.1))
+    padded = cv2.copyMakeBorder(
+        image, top, bottom, left, right, cv2.BORDER_CONSTANT, value=LETTERBOX_COLOR
+    )
+    return padded, ratio, (pad_x, pad_y)
+
+
+def non_max_suppression(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    iou_threshold: float = 0.45,
+    metric: str = "iou",
+) -> np.ndarray:
+    """Greedy NMS on xyxy boxes, returns the kept indices by descending score
+
+    metric "ios" divides the overlap by the smaller box instead of the union,
+    which also suppresses partial boxes of objects cut by a tile edge.
+    """
+    if len(boxes) == 0:
+        return np.zeros((0,), dtype=np.int64)
+
+    x1, y1, x2, y2 = boxes[:, 0], boxes[:, 1], boxes[:, 2], boxes[:, 3]
+    areas = np.maximum(x2 - x1, 0) * np.maximum(y2 - y1, 0)
+    order = np.argsort(-scores, kind="stable")
+
+    keep = []
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        w = np.maximum(np.minimum(x2[i], x2[rest]) - np.maximum(x1[i], x1[rest]), 0)
+        h = np.maximum(np.minimum(y2[i], y2[rest]) - np.maximum(y1[i], y1[rest]), 0)
+        intersection = w * h
+        if metric == "ios":
+            overlap = intersection / (np.minimum(areas[i], areas[rest]) + 1e-9)
+        else:
+            overlap = intersection / (areas[i] + areas[rest] - intersection + 1e-9)
+        order = rest[overlap <= iou_threshold]
+
+    return np.asarray(keep, dtype=np.int64)
+
+
+def batched_non_max_suppression(
+    boxes: np.ndarray,
+    scores: np.ndarray,
+    class_ids: np.ndarray,
+    iou_threshold: float = 0.45,
+    metric: str = "iou",
+) -> np.ndarray:
+    """Class aware NMS, boxes of different classes never suppress each other"""
+    if len(boxes) == 0:
+        return np.zeros((0,), dtype=np.int64)
+    # Shift every class into its own coordinate range, one NMS pass for all
+    offsets = class_ids.astype(np.float32)[:, None] * (float(boxes.max()) + 1.0)
+    return non_max_suppression(boxes + offsets, scores, iou_threshold, metric)
+
+
+def _parse_names(names) -> Dict[int, str]:
+    """Class names from exported model metadata, a dict or its repr"""
+    if isinstance(names, str):
+        names = ast.literal_eval(names)
+    if isinstance(names, (list, tuple)):
+        names = dict(enumerate(names))
+    return {int(k): str(v) for k, v in dict(names or {}).items()}
+
+
+class DetectorBackend(ABC):
+    """Common interface of the detector runtimes
+
+    predict() is preprocess -> forward -> postprocess so the stages can also be
+    run separately, e.g. on different threads.
+    """
+
+    names: Dict[int, str] = {}
+
+    @abstractmethod
+    def preprocess(
+        self, images: Sequence[np.ndarray], confidence_threshold: float = 0.25
+    ) -> Batch:
+        """Prepare a list of BGR images for the model"""
+
+    @abstractmethod
+    def forward(self, batch: Batch):
+        """Run the model on a prepared batch"""
+
+    @abstractmethod
+    def postprocess(self, outputs, batch: Batch) -> List[Prediction]:
+        """Turn the model outputs into one Prediction per image of the batch"""
+
+    def forward_batches(self, batches: Sequence[Batch]) -> List[Any]:
+        """Forward pass of each batch, in one model call where the runtime allows
+
+        Lets frames of different cameras share an inference call.
+        """
+        return [self.forward(batch) for batch in batches]
+
+    def predict(
+        self, images: Sequence[np.ndarray], confidence_threshold: float = 0.25
+    ) -> List[Prediction]:
+        """Detect objects in a list of BGR images, one Prediction per image"""
+        batch = self.preprocess(images, confidence_threshold)
+        return self.postprocess(self.forward(batch), batch)
+
+
+class UltralyticsBackend(DetectorBackend):
+    """PyTorch .pt models through Ultralytics, which does its own pre/postprocessing"""
+
+    def __init__(self, model_path: str):
+        from ultralytics import YOLO
+
+        self.model = YOLO(model_path, verbose=False)
+        self.names = _parse_names(self.model.names)
+
+    def preprocess(self, images, confidence_threshold=0.25) -> Batch:
+        return Batch(images=list(images), confidence_threshold=confidence_threshold)
+
+    def forward(self, batch: Batch):
+        return self.model(
+            batch.images, conf=batch.confidence_threshold, verbose=False
+        )
+
+    def forward_batches(self, batches: Sequence[Batch]) -> List[Any]:
+        thresholds = {batch.confidence_threshold for batch in batches}
+        if len(batches) < 2 or len(thresholds) > 1:
+            return super().forward_batches(batches)
+        results = self.model(
+            [image for batch in batches for image in batch.images],
+            conf=thresholds.pop(),
+            verbose=False,
+        )
+        outputs, start = [], 0
+        for batch in batches:
+            outputs.append(results[start : start + len(batch.images)])
+            start += len(batch.images)
+        return outputs
+
+    def postprocess(self, outputs, batch: Batch) -> List[Prediction]:
+        predictions = []
+        for result in outputs:
+            boxes = result.boxes
+            if boxes is None or len(boxes) == 0:
+                predictions.append(empty_prediction())
+                continue
+            predictions.append(
+                (
+                    boxes.xyxy.cpu().numpy().astype(np.float32),
+                    boxes.conf.cpu().numpy().astype(np.float32),
+                    boxes.cls.cpu().numpy().astype(np.int64),
+                )
+            )
+        return predictions
+
+
+class LetterboxBackend(DetectorBackend):
+    """Pre/postprocessing shared by the exported YOLO model runtimes
+
+    Expects the raw YOLOv8 head output (B, 4 + num_classes, anchors) with
+    cxcywh boxes, or an end-to-end (B, max_det, 6) output with NMS included.
+    """
+
+    def __init__(
+        self,
+        input_shape: Tuple[int, int],
+        names: Dict[int, str],
+        batch_size: Optional[int] = None,
+        iou_threshold: float = 0.7,  # Ultralytics predict() default
+        max_detections: int = 300,
+    ):
+        self.input_shape = input_shape
+        self.names = names
+        self.batch_size = batch_size  # None for a dynamic batch dimension
+        self.iou_threshold = iou_threshold
+        self.max_detections = max_detections
+
+    def preprocess(self, images, confidence_threshold=0.25) -> Batch:
+        batch = Batch(images=list(images), confidence_threshold=confidence_threshold)
+        padded = []
+        for image in batch.images:
+            image, ratio, pad = letterbox(image, self.input_shape)
+            padded.append(image)
+            batch.ratios.append(ratio)
+            batch.pads.append(pad)
+
+        # BGR HWC uint8 -> RGB NCHW float32 in [0, 1]
+        batch.tensor = cv2.dnn.blobFromImages(
+            padded, scalefactor=1 / 255.0, swapRB=True
+        )
+        return batch
+
+    @abstractmethod
+    def _run(self, tensor: np.ndarray) -> np.ndarray:
+        """Run the exported model on an NCHW float32 tensor"""
+
+    def forward(self, batch: Batch) -> np.ndarray:
+        if self.batch_size is None or self.batch_size == len(batch.images):
+            return self._run(batch.tensor)
+        # Static batch export, run the images one at a time
+        return np.concatenate(
+            [self._run(batch.tensor[i : i + 1]) for i in range(len(batch.images))]
+        )
+
+    def forward_batches(self, batches: Sequence[Batch]) -> List[np.ndarray]:
+        if len(batches) < 2 or self.batch_size is not None:
+            return super().forward_batches(batches)
+        # Dynamic batch export, stack every image into one call
+        outputs = self._run(np.concatenate([batch.tensor for batch in batches]))
+        splits = np.cumsum([len(batch.images) for batch in batches])[:-1]
+        return np.split(outputs, splits)
+
+    def postprocess(self, outputs: np.ndarray, batch: Batch) -> List[Prediction]:
+        end_to_end = outputs.shape[-1] == 6 and outputs.shape[1] != 4 + len(self.names)
+
+        predictions = []
+        for i, image in enumerate(batch.images):
+            decode = self._decode_end_to_end if end_to_end else self._decode_raw
+            boxes, confidence, class_ids = decode(outputs[i], batch)
+
+            if len(boxes) == 0:
+                predictions.append(empty_prediction())
+                continue
+
+            # Undo the letterbox
+            pad_x, pad_y = batch.pads[i]
+            boxes[:, [0, 2]] -= pad_x
+            boxes[:, [1, 3]] -= pad_y
+            boxes /= batch.ratios[i]
+            height, width = image.shape[:2]
+            boxes[:, [0, 2]] = boxes[:, [0, 2]].clip(0, width)
+            boxes[:, [1, 3]] = boxes[:, [1, 3]].clip(0, height)
+
+            predictions.append((boxes, confidence, class_ids))
+        return predictions
+
+    def _decode_raw(self, output: np.ndarray, batch: Batch) -> Prediction:
+        output = output.T  # (anchors, 4 + num_classes)
+        scores = output[:, 4:]
+        class_ids = scores.argmax(axis=1)
+        confidence = scores[np.arange(len(scores)), class_ids]
+
+        mask = confidence >= batch.confidence_threshold
+        if not mask.any():
+            return empty_prediction()
+
+        cxcywh = output[mask, :4]
+        confidence = confidence[mask].astype(np.float32)
+        class_ids = class_ids[mask].astype(np.int64)
+
+        boxes = np.empty_like(cxcywh, dtype=np.float32)
+        boxes[:, :2] = cxcywh[:, :2] - cxcywh[:, 2:] / 2
+        boxes[:, 2:] = cxcywh[:, :2] + cxcywh[:, 2:] / 2
+
+        keep = batched_non_max_suppression(
+            boxes, confidence, class_ids, self.iou_threshold
+        )[: self.max_detections]
+        return boxes[keep], confidence[keep], class_ids[keep]
+
+    def _decode_end_to_end(self, output: np.ndarray, batch: Batch) -> Prediction:
+        output = output[output[:, 4] >= batch.confidence_threshold]
+        return (
+            output[:, :4].astype(np.float32),
+            output[:, 4].astype(np.float32),
+            output[:, 5].astype(np.int64),
+        )
+
+
+def _static_dim(value) -> Optional[int]:
+    return value if isinstance(value, int) and value > 0 else None
+
+
+class OnnxBackend(LetterboxBackend):
+    """Exported .onnx models on ONNX Runtime, CPU by default"""
+
+    def __init__(
+        self,
+        model_path: str,
+        imgsz: int = 640,
+        providers: Optional[List[str]] = None,
+        **kwargs,
+    ):
+        if ort is None:
+            raise RuntimeError(
+                "onnxruntime is required for the onnx backend, install it with "
+                "`pip install onnxruntime`"
+            )
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            model_path, options, providers=providers or ["CPUExecutionProvider"]
+        )
+
+        model_input = self.session.get_inputs()[0]
+        self.input_name = model_input.name
+        batch_size, _, height, width = model_input.shape
+        metadata = self.session.get_modelmeta().custom_metadata_map
+
+        super().__init__(
+            input_shape=(_static_dim(height) or imgsz, _static_dim(width) or imgsz),
+            names=_parse_names(metadata.get("names")),
+            batch_size=_static_dim(batch_size),
+            **kwargs,
+        )
+        logger.info(
+            "Loaded ONNX model %s, input %s, providers %s",
+            model_path,
+            self.input_shape,
+            self.session.get_providers(),
+        )
+
+    def _run(self, tensor: np.ndarray) -> np.ndarray:
+        return self.session.run(None, {self.input_name: tensor})[0]
+
+
+class OpenVinoBackend(LetterboxBackend):
+    """Ultralytics OpenVINO exports (model directory or .xml) on the CPU plugin"""
+
+    def __init__(
+        self, model_path: str, imgsz: int = 640, device: str = "CPU", **kwargs
+    ):
+        if ov is None:
+            raise RuntimeError(
+                "openvino is required for the openvino backend, install it with "
+                "`pip install openvino`"
+            )
+
+        xml_path = model_path
+        if os.path.isdir(model_path):
+            xml_files = glob.glob(os.path.join(model_path, "*.xml"))
+            if not xml_files:
+                raise FileNotFoundError(f"No OpenVINO .xml model in {model_path}")
+            xml_path = xml_files[0]
+
+        core = ov.Core()
+        model = core.read_model(xml_path)
+        shape = model.input(0).get_partial_shape()
+        dims = [d.get_length() if d.is_static else None for d in shape]
+
+        self.compiled = core.compile_model(
+            model, device, {"PERFORMANCE_HINT": "LATENCY"}
+        )
+        self.output = self.compiled.output(0)
+
+        super().__init__(
+            input_shape=(dims[2] or imgsz, dims[3] or imgsz),
+            names=self._load_names(os.path.dirname(xml_path)),
+            batch_size=dims[0],
+            **kwargs,
+        )
+        logger.info("Loaded OpenVINO model %s on %s", xml_path, device)
+
+    @staticmethod
+    def _load_names(model_dir: str) -> Dict[int, str]:
+        metadata_path = os.path.join(model_dir, "metadata.yaml")
+        if not os.path.exists(metadata_path):
+            logger.warning("No metadata.yaml in %s, class names unknown", model_dir)
+            return {}
+
+        import yaml
+
+        with open(metadata_path, "r") as file:
+            return _parse_names((yaml.safe_load(file) or {}).get("names"))
+
+    def _run(self, tensor: np.ndarray) -> np.ndarray:
+        return self.compiled(tensor)[self.output]
+
+
+def exported_model_path(weights: str, backend: str) -> str:
+    """Where Ultralytics export() writes the model, e.g. sim.pt -> sim.onnx"""
+    stem = os.path.splitext(weights)[0]
+    if backend == "onnx":
+        return stem + ".onnx"
+    if backend == "openvino":
+        return stem + "_openvino_model"
+    return weights
+
+
+def resolve_backend(model_path: str, backend: str = "auto") -> str:
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}', use one of {BACKENDS}")
+    if backend != "auto":
+        return backend
+    if model_path.endswith(".onnx"):
+        return "onnx"
+    if model_path.endswith(".xml") or os.path.isdir(model_path):
+        return "openvino"
+    return "ultralytics"
+
+
+def create_backend(
+    model_path: str, backend: str = "auto", imgsz: int = 640
+) -> DetectorBackend:
+    """Load a detector, a .pt path with an exported backend loads the export"""
+    backend = resolve_backend(model_path, backend)
+    if backend == "ultralytics":
+        return UltralyticsBackend(model_path)
+
+    if model_path.endswith(".pt"):
+        model_path = exported_model_path(model_path, backend)
+    if not os.path.exists(model_path):
+        raise FileNotFoundError(
+            f"{model_path} not found, export it first with "
+            "`python -m src.controls.detection.backends <weights.pt> "
+            f"--format {backend}`"
+        )
+
+    if backend == "onnx":
+        return OnnxBackend(model_path, imgsz=imgsz)
+    return OpenVinoBackend(model_path, imgsz=imgsz)
+
+
+def export_model(
+    weights: str,
+    format: str = "onnx",
+    imgsz: int = 640,
+    half: bool = False,
+    dynamic: bool = False,
+) -> str:
+    """Export Ultralytics weights for the onnx/openvino backends, returns the path"""
+    from ultralytics import YOLO
+
+    if format not in ("onnx", "openvino"):
+        raise ValueError(f"Unsupported export format '{format}'")
+
+    model = YOLO(weights, verbose=False)
+    path = model.export(
+        format=format, imgsz=imgsz, half=half, dynamic=dynamic, simplify=True
+    )
+    logger.info("Exported %s to %s", weights, path)
+    return str(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Export YOLO weights for CPU inference"
+    )
+    parser.add_argument("weights", help="Ultralytics .pt weights, e.g. sim.pt")
+    parser.add_argument("--format", choices=["onnx", "openvino"], default="onnx")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--half", action="store_true", help="FP16 weights")
+    parser.add_argument("--dynamic", action="store_true", help="Dynamic batch/size")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    export_model(args.weights, args.format, args.imgsz, args.half, args.dynamic)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,6 +7,8 @@ from typing import Dict, Generator, List, Optional, Tuple, Union
 import cv2
 import numpy as np
 
+from src.controls.gps.geolocation import EARTH_RADIUS_M, CameraGeometry, offset_gps
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -366,7 +368,9 @@ class GeolocationEstimator:
             camera_matrix: 3x3 camera intrinsic matrix
         """
         self.camera_matrix = camera_matrix
-        self.earth_radius = 6378137.0  # Earth radius in meters (WGS84)
+        self.earth_radius = EARTH_RADIUS_M  # Earth radius in meters (WGS84)
+        # Inverse intrinsics cached for every estimate
+        self.geometry = CameraGeometry(camera_matrix)
 
     def estimate_position(
         self, image_point: Tuple[float, float], drone_state: DroneState
@@ -381,98 +385,69 @@ class GeolocationEstimator:
         Returns:
             GeolocationResult with estimated coordinates and accuracy
         """
-        # Convert image coordinates to normalized camera coordinates
-        fx, fy = self.camera_matrix[0, 0], self.camera_matrix[1, 1]
-        cx, cy = self.camera_matrix[0, 2], self.camera_matrix[1, 2]
+        return self.estimate_positions([image_point], drone_state)[0]
 
-        # Normalize image coordinates
-        x_norm = (image_point[0] - cx) / fx
-        y_norm = (image_point[1] - cy) / fy
+    def estimate_positions(
+        self, image_points: np.ndarray, drone_state: DroneState
+    ) -> List[GeolocationResult]:
+        """
+        Estimate world coordinates of several image points seen in one frame.
 
-        # Create ray in camera coordinate system
-        ray_camera = np.array([x_norm, y_norm, 1.0])
-        ray_camera = ray_camera / np.linalg.norm(ray_camera)
+        Args:
+            image_points: (N, 2) coordinates in image
+            drone_state: Current drone state
 
-        # Transform ray to world coordinates using drone attitude
-        R = self._rotation_matrix_from_euler(
-            drone_state.roll, drone_state.pitch, drone_state.yaw
+        Returns:
+            One GeolocationResult per image point
+        """
+        # Rays in the world frame, one rotation for every point
+        rays_world = self.geometry.world_rays(
+            image_points, (drone_state.roll, drone_state.pitch, drone_state.yaw)
         )
-        ray_world = R @ ray_camera
 
         # Calculate intersection with ground plane (assuming flat ground)
         # Ground plane is at altitude 0 (sea level)
         height_above_ground = drone_state.altitude
 
-        # Calculate scale factor to reach ground
-        if abs(ray_world[2]) < 1e-6:  # Ray is parallel to ground
-            # Return drone position with low accuracy
-            return GeolocationResult(
+        results: List[Optional[GeolocationResult]] = [None] * len(rays_world)
+        # Rays parallel to the ground get the drone position with low accuracy
+        parallel = np.abs(rays_world[:, 2]) < 1e-6
+        for i in np.flatnonzero(parallel):
+            results[i] = GeolocationResult(
                 latitude=drone_state.latitude,
                 longitude=drone_state.longitude,
                 accuracy_meters=1000.0,  # Very low accuracy
                 confidence=0.1,
             )
 
-        scale = -height_above_ground / ray_world[2]
-
-        # Calculate ground intersection point in local coordinates
-        ground_point_local = scale * ray_world
-
-        # Convert local coordinates to GPS coordinates
-        lat_offset = ground_point_local[1] / self.earth_radius * 180.0 / math.pi
-        lon_offset = (
-            ground_point_local[0]
-            / (self.earth_radius * math.cos(math.radians(drone_state.latitude)))
-            * 180.0
-            / math.pi
-        )
-
-        target_lat = drone_state.latitude + lat_offset
-        target_lon = drone_state.longitude + lon_offset
-
-        # Estimate accuracy based on various factors
-        accuracy = self._estimate_accuracy(drone_state, ray_world, height_above_ground)
-        confidence = self._calculate_confidence(accuracy, height_above_ground)
+        hits = np.flatnonzero(~parallel)
+        scale = -height_above_ground / rays_world[hits, 2]
 
-        return GeolocationResult(
-            latitude=target_lat,
-            longitude=target_lon,
-            accuracy_meters=accuracy,
-            confidence=confidence,
+        # Ground intersection points in local coordinates, x east and y north
+        ground_points = scale[:, None] * rays_world[hits]
+        target_lats, target_lons = offset_gps(
+            drone_state.latitude,
+            drone_state.longitude,
+            north=ground_points[:, 1],
+            east=ground_points[:, 0],
         )
 
-    def _rotation_matrix_from_euler(
-        self, roll: float, pitch: float, yaw: float
-    ) -> np.ndarray:
-        """Create rotation matrix from Euler angles (roll, pitch, yaw)."""
-        # Rotation matrices for each axis
-        R_x = np.array(
-            [
-                [1, 0, 0],
-                [0, math.cos(roll), -math.sin(roll)],
-                [0, math.sin(roll), math.cos(roll)],
-            ]
-        )
-
-        R_y = np.array(
-            [
-                [math.cos(pitch), 0, math.sin(pitch)],
-                [0, 1, 0],
-                [-math.sin(pitch), 0, math.cos(pitch)],
-            ]
-        )
-
-        R_z = np.array(
-            [
-                [math.cos(yaw), -math.sin(yaw), 0],
-                [math.sin(yaw), math.cos(yaw), 0],
-                [0, 0, 1],
-            ]
-        )
+        for i, ray_world, lat, lon in zip(
+            hits, rays_world[hits], target_lats, target_lons
+        ):
+            # Estimate accuracy based on various factors
+            accuracy = self._estimate_accuracy(
+                drone_state, ray_world, height_above_ground
+            )
+            confidence = self._calculate_confidence(accuracy, height_above_ground)
+            results[i] = GeolocationResult(
+                latitude=float(lat),
+                longitude=float(lon),
+                accuracy_meters=accuracy,
+                confidence=confidence,
+            )
 
-        # Combined rotation matrix (ZYX convention)
-        R = R_z @ R_y @ R_x
-        return R
+        return results
 
     def _estimate_accuracy(
         self, drone_state: DroneState, ray_world: np.ndarray, height: float
@@ -565,21 +540,21 @@ class HelipadTracker:
         annotated_frame = frame.copy()
         current_helipads = {}
 
-        for obj in tracked_objects:
-            if obj.class_name == "helipad":
-                # Estimate geolocation
-                geolocation = self.geolocation_estimator.estimate_position(
-                    obj.center, drone_state
-                )
+        helipads = [obj for obj in tracked_objects if obj.class_name == "helipad"]
+        geolocations = []
+        if helipads:
+            # Estimate geolocation of every helipad in one batch
+            geolocations = self.geolocation_estimator.estimate_positions(
+                np.array([obj.center for obj in helipads]), drone_state
+            )
 
-                # Store helipad position
-                self.helipad_positions[obj.track_id] = geolocation
-                current_helipads[obj.track_id] = geolocation
+        for obj, geolocation in zip(helipads, geolocations):
+            # Store helipad position
+            self.helipad_positions[obj.track_id] = geolocation
+            current_helipads[obj.track_id] = geolocation
 
-                # Annotate frame
-                annotated_frame = self._annotate_frame(
-                    annotated_frame, obj, geolocation
-                )
+            # Annotate frame
+            annotated_frame = self._annotate_frame(annotated_frame, obj, geolocation)
 
         return annotated_frame, current_helipads
 
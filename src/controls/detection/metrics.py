@@ -0,0 +1,128 @@
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# COCO style IoU thresholds 0.50:0.05:0.95
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+def box_iou(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """Pairwise IoU of two sets of xyxy boxes, shape (N, M)"""
+    boxes1 = np.asarray(boxes1, dtype=np.float32).reshape(-1, 4)
+    boxes2 = np.asarray(boxes2, dtype=np.float32).reshape(-1, 4)
+
+    top_left = np.maximum(boxes1[:, None, :2], boxes2[None, :, :2])
+    bottom_right = np.minimum(boxes1[:, None, 2:], boxes2[None, :, 2:])
+    intersection = np.prod(np.clip(bottom_right - top_left, 0, None), axis=2)
+
+    area1 = np.prod(boxes1[:, 2:] - boxes1[:, :2], axis=1)
+    area2 = np.prod(boxes2[:, 2:] - boxes2[:, :2], axis=1)
+    return intersection / (area1[:, None] + area2[None, :] - intersection + 1e-9)
+
+
+def average_precision(recall: np.ndarray, precision: np.ndarray) -> float:
+    """101-point interpolated AP as in COCO, recall must be non-decreasing"""
+    if len(recall) == 0:
+        return 0.0
+    # Best precision at this or any higher recall
+    envelope = np.flip(np.maximum.accumulate(np.flip(precision)))
+    indices = np.searchsorted(recall, np.linspace(0, 1, 101), side="left")
+    padded = np.append(envelope, 0.0)
+    return float(padded[np.minimum(indices, len(envelope))].mean())
+
+
+class DetectionMetrics:
+    """Accumulates predictions against ground truth and computes mAP"""
+
+    def __init__(self, iou_thresholds: np.ndarray = IOU_THRESHOLDS):
+        self.iou_thresholds = np.asarray(iou_thresholds)
+        self.true_positives: List[np.ndarray] = []
+        self.confidences: List[np.ndarray] = []
+        self.pred_classes: List[np.ndarray] = []
+        self.gt_classes: List[np.ndarray] = []
+
+    def update(
+        self,
+        boxes: np.ndarray,
+        confidences: np.ndarray,
+        class_ids: np.ndarray,
+        gt_boxes: np.ndarray,
+        gt_class_ids: np.ndarray,
+    ):
+        """Add the predictions and ground truth of one image"""
+        boxes = np.asarray(boxes, dtype=np.float32).reshape(-1, 4)
+        gt_boxes = np.asarray(gt_boxes, dtype=np.float32).reshape(-1, 4)
+        confidences = np.asarray(confidences, dtype=np.float32)
+        class_ids = np.asarray(class_ids, dtype=np.int64)
+        gt_class_ids = np.asarray(gt_class_ids, dtype=np.int64)
+
+        true_positives = np.zeros((len(boxes), len(self.iou_thresholds)), dtype=bool)
+        if len(boxes) and len(gt_boxes):
+            iou = box_iou(boxes, gt_boxes)
+            iou[class_ids[:, None] != gt_class_ids[None, :]] = 0.0
+            order = np.argsort(-confidences, kind="stable")
+
+            # Greedy matching by confidence, each ground truth box matches once
+            for t, threshold in enumerate(self.iou_thresholds):
+                matched = np.zeros(len(gt_boxes), dtype=bool)
+                for i in order:
+                    candidates = np.where(~matched & (iou[i] >= threshold))[0]
+                    if len(candidates):
+                        best = candidates[np.argmax(iou[i, candidates])]
+                        matched[best] = True
+                        true_positives[i, t] = True
+
+        self.true_positives.append(true_positives)
+        self.confidences.append(confidences)
+        self.pred_classes.append(class_ids)
+        self.gt_classes.append(gt_class_ids)
+
+    def compute(self, names: Optional[Dict[int, str]] = None) -> dict:
+        """mAP@0.5, mAP@0.5:0.95 and recall@0.5 over every class in the ground truth
+
+        Recall counts every prediction passed to update(), so it depends on the
+        confidence threshold the predictions were made with.
+        """
+        num_thresholds = len(self.iou_thresholds)
+        true_positives = np.concatenate(
+            self.true_positives or [np.zeros((0, num_thresholds), dtype=bool)]
+        )
+        confidences = np.concatenate(self.confidences or [np.zeros(0)])
+        pred_classes = np.concatenate(self.pred_classes or [np.zeros(0, np.int64)])
+        gt_classes = np.concatenate(self.gt_classes or [np.zeros(0, np.int64)])
+
+        order = np.argsort(-confidences, kind="stable")
+        true_positives = true_positives[order]
+        pred_classes = pred_classes[order]
+
+        per_class = {}
+        for class_id in np.unique(gt_classes):
+            is_class = pred_classes == class_id
+            num_gt = int(np.sum(gt_classes == class_id))
+
+            tp = np.cumsum(true_positives[is_class], axis=0)
+            fp = np.cumsum(~true_positives[is_class], axis=0)
+            recall = tp / num_gt
+            precision = tp / np.maximum(tp + fp, 1)
+
+            ap = np.array(
+                [
+                    average_precision(recall[:, t], precision[:, t])
+                    for t in range(num_thresholds)
+                ]
+            )
+            name = (names or {}).get(int(class_id), str(int(class_id)))
+            per_class[name] = {
+                "ap50": float(ap[0]),
+                "ap50_95": float(ap.mean()),
+                "recall50": float(recall[-1, 0]) if len(recall) else 0.0,
+            }
+
+        if not per_class:
+            return {"map50": 0.0, "map50_95": 0.0, "recall50": 0.0, "per_class": {}}
+        return {
+            "map50": float(np.mean([c["ap50"] for c in per_class.values()])),
+            "map50_95": float(np.mean([c["ap50_95"] for c in per_class.values()])),
+            "recall50": float(np.mean([c["recall50"] for c in per_class.values()])),
+            "per_class": per_class,
+        }
@@ -0,0 +1,289 @@
+"""INT8 post-training quantization of the YOLO detector
+
+Calibrates on a folder of extracted flight frames (see
+src/controls/scripts/extract_frames_script.py), writes a QDQ INT8 ONNX model
+and reports mAP and per-frame latency against the FP32 .pt model.
+
+    python -m src.controls.detection.quantize src/controls/detection/sim.pt frames/
+"""
+
+import argparse
+import glob
+import logging
+import os
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from src.controls.detection.backends import (
+    DetectorBackend,
+    OnnxBackend,
+    UltralyticsBackend,
+    export_model,
+    letterbox,
+)
+from src.controls.detection.metrics import DetectionMetrics
+
+try:
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        CalibrationMethod,
+        QuantFormat,
+        QuantType,
+        quantize_static,
+    )
+except ImportError:  # quantization needs onnxruntime
+    CalibrationDataReader = object
+    quantize_static = None
+
+logger = logging.getLogger("quantize")
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+CALIBRATION_METHODS = ("minmax", "entropy", "percentile")
+
+
+def list_frames(frames_dir: str, limit: Optional[int] = None) -> List[str]:
+    """Image files in a folder, evenly subsampled down to `limit`"""
+    paths = sorted(
+        path
+        for path in glob.glob(os.path.join(frames_dir, "*"))
+        if path.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if limit and len(paths) > limit:
+        # Spread the selection over the whole flight rather than its start
+        indices = np.linspace(0, len(paths) - 1, limit).round().astype(int)
+        paths = [paths[i] for i in indices]
+    return paths
+
+
+class FrameCalibrationReader(CalibrationDataReader):
+    """Feeds letterboxed frames to the ONNX Runtime calibrator"""
+
+    def __init__(
+        self, paths: List[str], input_name: str, input_shape: Tuple[int, int]
+    ):
+        self.paths = paths
+        self.input_name = input_name
+        self.input_shape = input_shape
+        self.iterator: Optional[Iterator[Dict[str, np.ndarray]]] = None
+
+    def _tensors(self) -> Iterator[Dict[str, np.ndarray]]:
+        for path in self.paths:
+            image = cv2.imread(path)
+            if image is None:
+                logger.warning("Skipping unreadable frame %s", path)
+                continue
+            padded, _, _ = letterbox(image, self.input_shape)
+            tensor = cv2.dnn.blobFromImage(padded, scalefactor=1 / 255.0, swapRB=True)
+            yield {self.input_name: tensor}
+
+    def get_next(self) -> Optional[Dict[str, np.ndarray]]:
+        if self.iterator is None:
+            self.iterator = self._tensors()
+        return next(self.iterator, None)
+
+    def rewind(self):
+        self.iterator = None
+
+
+def quantize_model(
+    fp32_path: str,
+    output_path: str,
+    frames_dir: str,
+    num_frames: int = 200,
+    method: str = "minmax",
+    per_channel: bool = True,
+) -> str:
+    """Static INT8 quantization of an FP32 ONNX model, returns output_path"""
+    if quantize_static is None:
+        raise RuntimeError(
+            "onnxruntime is required for quantization, install it with "
+            "`pip install onnxruntime`"
+        )
+    if method not in CALIBRATION_METHODS:
+        raise ValueError(f"Unknown calibration method '{method}'")
+
+    paths = list_frames(frames_dir, num_frames)
+    if not paths:
+        raise FileNotFoundError(f"No calibration frames found in {frames_dir}")
+
+    fp32 = OnnxBackend(fp32_path)
+    reader = FrameCalibrationReader(paths, fp32.input_name, fp32.input_shape)
+    logger.info("Calibrating on %d frames with %s", len(paths), method)
+
+    quantize_static(
+        fp32_path,
+        output_path,
+        reader,
+        quant_format=QuantFormat.QDQ,
+        activation_type=QuantType.QUInt8,
+        weight_type=QuantType.QInt8,
+        per_channel=per_channel,
+        calibrate_method={
+            "minmax": CalibrationMethod.MinMax,
+            "entropy": CalibrationMethod.Entropy,
+            "percentile": CalibrationMethod.Percentile,
+        }[method],
+    )
+
+    # quantize_static drops the metadata, keep the class names with the model
+    _copy_metadata(fp32_path, output_path)
+    logger.info("Wrote INT8 model to %s", output_path)
+    return output_path
+
+
+def _copy_metadata(source_path: str, target_path: str):
+    import onnx
+
+    source = onnx.load(source_path, load_external_data=False)
+    target = onnx.load(target_path)
+    del target.metadata_props[:]
+    target.metadata_props.extend(source.metadata_props)
+    onnx.save(target, target_path)
+
+
+def load_labels(
+    label_path: str, image_shape: Tuple[int, int]
+) -> Tuple[np.ndarray, np.ndarray]:
+    """YOLO format label file (class cx cy w h, normalized) to xyxy pixels"""
+    if not os.path.exists(label_path):
+        return np.zeros((0, 4), dtype=np.float32), np.zeros((0,), dtype=np.int64)
+
+    rows = np.loadtxt(label_path, ndmin=2, dtype=np.float32)
+    if rows.size == 0:
+        return np.zeros((0, 4), dtype=np.float32), np.zeros((0,), dtype=np.int64)
+
+    height, width = image_shape
+    cx, cy = rows[:, 1] * width, rows[:, 2] * height
+    w, h = rows[:, 3] * width, rows[:, 4] * height
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+    return boxes, rows[:, 0].astype(np.int64)
+
+
+def evaluate(
+    models: Dict[str, DetectorBackend],
+    paths: List[str],
+    labels_dir: Optional[str] = None,
+    reference: Optional[str] = None,
+    confidence_threshold: float = 0.001,
+    latency_threshold: float = 0.5,
+    warmup: int = 5,
+) -> Dict[str, dict]:
+    """mAP and latency of each model on the same frames
+
+    mAP is computed at a low confidence threshold over the full PR curve,
+    latency at the threshold the server runs with.
+
+    Ground truth is read from YOLO label files in labels_dir. Without labels
+    the predictions of the `reference` model at conf 0.25 are used instead, the
+    other models' mAP then measures agreement with it.
+    """
+    frames = [(path, cv2.imread(path)) for path in paths]
+    frames = [(path, image) for path, image in frames if image is not None]
+    if not frames:
+        raise FileNotFoundError("No readable evaluation frames")
+    images = [image for _, image in frames]
+
+    ground_truth = []
+    for path, image in frames:
+        if labels_dir is not None:
+            stem = os.path.splitext(os.path.basename(path))[0]
+            label_path = os.path.join(labels_dir, stem + ".txt")
+            ground_truth.append(load_labels(label_path, image.shape[:2]))
+        else:
+            boxes, _, class_ids = models[reference].predict([image], 0.25)[0]
+            ground_truth.append((boxes, class_ids))
+
+    report = {}
+    for name, model in models.items():
+        for image in images[:warmup]:
+            model.predict([image], confidence_threshold)
+
+        metrics = DetectionMetrics()
+        for image, (gt_boxes, gt_classes) in zip(images, ground_truth):
+            prediction = model.predict([image], confidence_threshold)[0]
+            metrics.update(*prediction, gt_boxes, gt_classes)
+
+        latencies = []
+        for image in images:
+            start = time.perf_counter()
+            model.predict([image], latency_threshold)
+            latencies.append(time.perf_counter() - start)
+
+        latencies_ms = np.array(latencies) * 1000
+        report[name] = {
+            **metrics.compute(model.names),
+            "latency_mean_ms": float(latencies_ms.mean()),
+            "latency_p50_ms": float(np.percentile(latencies_ms, 50)),
+            "latency_p95_ms": float(np.percentile(latencies_ms, 95)),
+        }
+    return report
+
+
+def print_report(report: Dict[str, dict], baseline: str):
+    header = (
+        f"{'model':<12}{'mAP50':>8}{'mAP50-95':>10}{'dmAP50-95':>11}"
+        f"{'mean ms':>9}{'p95 ms':>8}"
+    )
+    print(header)
+    print("-" * len(header))
+    for name, row in report.items():
+        delta = row["map50_95"] - report[baseline]["map50_95"]
+        print(
+            f"{name:<12}{row['map50']:>8.3f}{row['map50_95']:>10.3f}{delta:>+11.3f}"
+            f"{row['latency_mean_ms']:>9.1f}{row['latency_p95_ms']:>8.1f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="INT8 quantization of the YOLO detector"
+    )
+    parser.add_argument("weights", help="FP32 Ultralytics .pt weights, e.g. sim.pt")
+    parser.add_argument("frames", help="Folder of extracted flight frames")
+    parser.add_argument(
+        "--output", default=None, help="Defaults to <weights>_int8.onnx"
+    )
+    parser.add_argument("--calibration-frames", type=int, default=200)
+    parser.add_argument("--eval-frames", type=int, default=200)
+    parser.add_argument("--method", choices=CALIBRATION_METHODS, default="minmax")
+    parser.add_argument(
+        "--labels",
+        default=None,
+        help="YOLO label folder, else the .pt predictions are used as ground truth",
+    )
+    parser.add_argument("--imgsz", type=int, default=640)
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+
+    stem = os.path.splitext(args.weights)[0]
+    output = args.output or stem + "_int8.onnx"
+    if args.labels is None and os.path.isdir(os.path.join(args.frames, "labels")):
+        args.labels = os.path.join(args.frames, "labels")
+
+    # Static shapes, the calibrator needs a fixed input
+    fp32_onnx = export_model(args.weights, "onnx", imgsz=args.imgsz)
+    quantize_model(fp32_onnx, output, args.frames, args.calibration_frames, args.method)
+
+    models = {
+        "fp32 .pt": UltralyticsBackend(args.weights),
+        "fp32 onnx": OnnxBackend(fp32_onnx),
+        "int8 onnx": OnnxBackend(output),
+    }
+    report = evaluate(
+        models,
+        list_frames(args.frames, args.eval_frames),
+        labels_dir=args.labels,
+        reference="fp32 .pt",
+    )
+    print_report(report, baseline="fp32 .pt")
+
+
+if __name__ == "__main__":
+    main()
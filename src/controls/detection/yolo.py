@@ -1,19 +1,25 @@
 import csv
 import logging
 import math
+import threading
 from contextlib import contextmanager
-from dataclasses import dataclass
-from typing import Dict, List, Optional, Tuple
+from dataclasses import dataclass, field, replace
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import cv2
 import numpy as np
 import supervision as sv
 from trackers import SORTTracker
-from ultralytics import YOLO
-
-# Constants
-EARTH_RADIUS_M = 6378137.0
 
+from src.controls.detection.backends import (
+    Batch,
+    DetectorBackend,
+    Prediction,
+    batched_non_max_suppression,
+    create_backend,
+)
+from src.controls.gps.dem import ElevationModel
+from src.controls.gps.geolocation import EARTH_RADIUS_M, CameraGeometry
 
 # Suppress ultralytics logging
 logging.getLogger("ultralytics").setLevel(logging.WARNING)
@@ -43,6 +49,29 @@ class Detection:
     class_id: int
     size: Tuple[float, float]
     track_id: Optional[int] = None
+    predicted: bool = False  # propagated from an earlier frame, not detected
+
+
+@dataclass
+class DetectionJob:
+    """One frame moving through the prepare -> run -> finish detection stages"""
+
+    image: np.ndarray
+    confidence_threshold: float
+    object_classes: List[str]
+    # Crop windows (x1, y1, x2, y2) run as one batch, empty for the full frame
+    windows: List[Tuple[int, int, int, int]] = field(default_factory=list)
+    metric: str = "iou"  # overlap measure when merging windows
+    roi: bool = False  # windows are crops around tracked targets
+    tiled: bool = False  # full frame searches run as overlapping tiles
+    batch: Optional[Batch] = None
+    outputs: Any = None
+    gray: Optional[np.ndarray] = None  # kept for optical flow propagation
+    detections: Optional[Dict[str, Detection]] = None  # set when propagated
+    # Order of the tracker's propagating jobs, state only moves forwards
+    seq: int = 0
+    # Propagated in finish_detection, earlier frames were still in flight
+    propagate: bool = False
 
 
 def compute_K(
@@ -57,22 +86,112 @@ def compute_K(
     return K
 
 
+def tile_windows(
+    frame_shape: Tuple[int, int], tile_size: int = 640, overlap: float = 0.2
+) -> List[Tuple[int, int, int, int]]:
+    """Overlapping (x1, y1, x2, y2) tiles covering the frame
+
+    The last tile of each row/column is shifted inwards to end at the frame edge.
+    """
+    height, width = frame_shape
+    step = max(int(tile_size * (1 - overlap)), 1)
+
+    def starts(length: int) -> List[int]:
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, step))
+        return positions + [length - tile_size]
+
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in starts(height)
+        for x in starts(width)
+    ]
+
+
 class YoloObjectTracker:
     """Enhanced YOLO object tracker with GPS estimation capabilities"""
 
+    # Confidence of propagated boxes decays by this factor per frame
+    PROPAGATION_DECAY = 0.9
+    # Fewer tracked corners than this in a box forces a detector run
+    MIN_FLOW_POINTS = 5
+
     def __init__(
         self,
         K: np.ndarray,
         model_path: str = "detection/best.pt",
+        backend: Union[str, DetectorBackend] = "auto",
+        imgsz: int = 640,
+        detect_interval: int = 1,
+        min_track_confidence: float = 0.3,
+        roi_mode: bool = False,
+        roi_padding: float = 1.0,
+        full_frame_interval: int = 10,
+        tiled: bool = False,
+        tile_overlap: float = 0.2,
+        distortion: Optional[np.ndarray] = None,
+        terrain: Optional[ElevationModel] = None,
     ):
-        self.model = YOLO(model_path, verbose=False)
-        self.names = list(dict(self.model.names).values())
+        # "ultralytics" runs the .pt model on PyTorch, "onnx"/"openvino" run an
+        # exported model with their own letterbox and NMS (see backends.py).
+        # A backend instance shares one loaded model between trackers, e.g.
+        # one tracker per camera
+        if isinstance(backend, DetectorBackend):
+            self.backend = backend
+        else:
+            self.backend = create_backend(model_path, backend=backend, imgsz=imgsz)
+        self.class_names = self.backend.names
+        self.names = list(self.class_names.values())
+        self.class_ids_by_name = {name: i for i, name in self.class_names.items()}
+        # Requested class list -> model class IDs, see _class_ids_for()
+        self.wanted_class_ids: Dict[Tuple[str, ...], np.ndarray] = {}
         logger.info(f"Model classes: {', '.join(self.names)}")
 
         self.annotator = sv.LabelAnnotator(text_position=sv.Position.CENTER)
         self.tracker = SORTTracker()
 
+        # K_inv is cached with K, see the K property. Detection centers are
+        # undistorted with `distortion` (k1, k2, p1, p2[, k3]) through a lookup
+        # table built for the size of the first geolocated frame
+        self.distortion = distortion
         self.K = K
+        # Rays meet the elevation model's terrain where it has data, the flat
+        # plane at ground_level_masl elsewhere
+        self.terrain = terrain
+        self.call_geometry: Optional[CameraGeometry] = None  # for a per-call K
+
+        # Run the detector every `detect_interval` frames, or sooner when the
+        # propagated confidence drops below `min_track_confidence`
+        self.detect_interval = max(int(detect_interval), 1)
+        self.min_track_confidence = min_track_confidence
+        # Pipelined, frame N+1 is prepared before frame N is finished. The
+        # cadence is planned in preparation order, the flow itself runs on the
+        # newest finished state, see prepare_detection()
+        self.schedule_lock = threading.Lock()
+        self.previous_gray: Optional[np.ndarray] = None
+        self.previous_detections: Dict[str, Detection] = {}
+        self.frames_since_detection = 0  # prepared since the last detector run
+        self.detection_due = False  # a deferred propagation failed
+        self.prepared_seq = 0
+        self.finished_seq = 0
+        self.state_seq = 0  # job whose frame is previous_gray
+
+        # ROI mode: once targets have a track ID, run the model on native
+        # resolution crops around them and search the whole frame only every
+        # `full_frame_interval` detector runs
+        self.imgsz = imgsz
+        self.roi_mode = roi_mode
+        self.roi_padding = roi_padding
+        self.full_frame_interval = max(int(full_frame_interval), 1)
+        self.roi_lock = threading.Lock()
+        self.roi_targets: List[Tuple[int, int, int, int]] = []
+        self.runs_since_full_frame = 0
+
+        # Tiled mode: full frame searches run on overlapping model-sized tiles
+        # at native resolution, for targets only a few pixels wide at altitude
+        self.tiled = tiled
+        self.tile_overlap = tile_overlap
 
     def _validate_object_classes(self, object_classes: List[str]) -> None:
         """Validate that all requested object classes exist in the model"""
@@ -84,11 +203,25 @@ class YoloObjectTracker:
                     f"{', '.join(self.names)}"
                 )
 
+    def _class_ids_for(self, object_classes: List[str]) -> np.ndarray:
+        """Model class IDs of the requested classes, validated once per class list"""
+        key = tuple(object_classes)
+        class_ids = self.wanted_class_ids.get(key)
+        if class_ids is None:
+            self._validate_object_classes(object_classes)
+            class_ids = np.array(
+                [self.class_ids_by_name[name] for name in object_classes],
+                dtype=np.int64,
+            )
+            self.wanted_class_ids[key] = class_ids
+        return class_ids
+
     def detect(
         self,
         image: np.ndarray,
         confidence_threshold: float = 0.5,
         object_classes: List[str] = ["helipad", "real_tank"],
+        tiled: Optional[bool] = None,
     ) -> Dict[str, Detection]:
         """
         Detect objects in image and return structured detection results
@@ -97,97 +230,414 @@ class YoloObjectTracker:
             image: Input image
             confidence_threshold: Minimum confidence for detections
             object_classes: List of object classes to detect
+            tiled: Override the tracker's tiled mode for this frame
 
         Returns:
             Dictionary mapping object class names to Detection objects
         """
-        self._validate_object_classes(object_classes)
+        job = self.prepare_detection(
+            image, confidence_threshold, object_classes, tiled=tiled
+        )
+        return self.finish_detection(self.run_detection(job))
+
+    def prepare_detection(
+        self,
+        image: np.ndarray,
+        confidence_threshold: float = 0.5,
+        object_classes: List[str] = ["helipad", "real_tank"],
+        propagate: bool = False,
+        tiled: Optional[bool] = None,
+    ) -> DetectionJob:
+        """First detection stage: propagation or window planning, then letterboxing
+
+        detect() is prepare_detection -> run_detection -> finish_detection, the
+        stages can also run on separate threads to overlap consecutive frames.
+        With `propagate`, frames between detector runs are tracked with optical
+        flow (see track()) and skip the later stages' work. While earlier frames
+        are still in flight the flow waits for finish_detection(), which runs in
+        frame order; a frame that can not be propagated there gets no
+        detections and the next prepared frame runs the detector. `tiled`
+        overrides the tracker's tiled mode for this frame.
+        """
+        self._class_ids_for(object_classes)
+        job = DetectionJob(
+            image,
+            confidence_threshold,
+            list(object_classes),
+            tiled=self.tiled if tiled is None else tiled,
+        )
+
+        if propagate and self.detect_interval > 1:
+            job.gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            with self.schedule_lock:
+                self.prepared_seq += 1
+                job.seq = self.prepared_seq
+                due = (
+                    self.detection_due
+                    or self.frames_since_detection + 1 >= self.detect_interval
+                )
+                if not due and self.finished_seq == job.seq - 1:
+                    # Nothing in flight, the state is this frame's predecessor
+                    job.detections = self._try_propagate(job, object_classes)
+                else:
+                    job.propagate = not due
+                if job.detections is not None or job.propagate:
+                    self.frames_since_detection += 1
+                    return job
+                self.frames_since_detection = 0
+                self.detection_due = False
+
+        job.windows = self._roi_windows(image.shape[:2]) if self.roi_mode else []
+        job.roi = bool(job.windows)
+        if not job.roi:
+            self._plan_full_frame(job)
+        self._preprocess(job)
+        return job
+
+    def run_detection(self, job: DetectionJob) -> DetectionJob:
+        """Second detection stage: the model forward pass"""
+        if job.batch is not None:
+            job.outputs = self.backend.forward(job.batch)
+        return job
+
+    def run_detections(self, jobs: List[DetectionJob]) -> List[DetectionJob]:
+        """run_detection() for several jobs in as few model calls as possible
+
+        The jobs may come from other trackers sharing this tracker's backend.
+        """
+        pending = [job for job in jobs if job.batch is not None]
+        outputs = self.backend.forward_batches([job.batch for job in pending])
+        for job, output in zip(pending, outputs):
+            job.outputs = output
+        return jobs
+
+    def finish_detection(self, job: DetectionJob) -> Dict[str, Detection]:
+        """Last detection stage: decoding, SORT update and best box per class
+
+        Must be called in preparation order for the propagation state.
+        """
+        if job.detections is not None:
+            detections = job.detections  # propagated when prepared
+        elif job.propagate:
+            with self.schedule_lock:
+                detections = self._try_propagate(job, job.object_classes)
+                if detections is None:
+                    self.detection_due = True
+                    detections = {}
+        else:
+            detections = self._build_detections(self._decode(job), job.object_classes)
+            if job.gray is not None:
+                with self.schedule_lock:
+                    self._store_state(job, detections)
+
+        if job.seq:
+            with self.schedule_lock:
+                self.finished_seq = max(self.finished_seq, job.seq)
+        return detections
+
+    def infer(self, image: np.ndarray, confidence_threshold: float) -> Prediction:
+        """Raw boxes of one frame without tracking
+
+        Uses ROI crops around tracked targets when possible, otherwise the
+        overlapping tiles in tiled mode or the full frame.
+        """
+        job = self.prepare_detection(image, confidence_threshold, self.names)
+        return self._decode(self.run_detection(job))
+
+    def _plan_full_frame(self, job: DetectionJob):
+        """Full frame search, as overlapping tiles in tiled mode"""
+        with self.roi_lock:
+            self.runs_since_full_frame = 0
+
+        if job.tiled:
+            height, width = job.image.shape[:2]
+            windows = tile_windows((height, width), self.imgsz, self.tile_overlap)
+            if len(windows) > 1:
+                # Plus the whole frame for targets larger than a tile
+                job.windows = windows + [(0, 0, width, height)]
+                job.metric = "ios"
+
+    def _preprocess(self, job: DetectionJob):
+        crops = [job.image[y1:y2, x1:x2] for x1, y1, x2, y2 in job.windows]
+        job.batch = self.backend.preprocess(
+            crops or [job.image], job.confidence_threshold
+        )
+
+    def _decode(self, job: DetectionJob) -> Prediction:
+        """Boxes of the job in full-frame coordinates"""
+        predictions = self.backend.postprocess(job.outputs, job.batch)
+        if not job.windows:
+            return predictions[0]
+
+        boxes, confidences, class_ids = [], [], []
+        for (x1, y1, _, _), (xyxy, conf, cls) in zip(job.windows, predictions):
+            boxes.append(xyxy + np.array([x1, y1, x1, y1], dtype=np.float32))
+            confidences.append(conf)
+            class_ids.append(cls)
+        boxes = np.concatenate(boxes)
+        confidences = np.concatenate(confidences)
+        class_ids = np.concatenate(class_ids)
+
+        if job.roi and len(boxes) == 0:
+            # Lost the targets, the next prepared frame searches the whole
+            # frame. Not a model run here, decoding is the postprocess stage
+            with self.roi_lock:
+                self.roi_targets = []
+            return boxes, confidences, class_ids
+
+        # Overlapping windows can see the same target twice
+        keep = batched_non_max_suppression(
+            boxes, confidences, class_ids, iou_threshold=0.5, metric=job.metric
+        )
+        return boxes[keep], confidences[keep], class_ids[keep]
 
-        results = self.model(image, conf=confidence_threshold)
-        if len(results) == 0:
-            return {}
+    def _build_detections(
+        self, prediction: Prediction, object_classes: List[str]
+    ) -> Dict[str, Detection]:
+        """SORT update and the highest confidence box of each requested class"""
+        xyxy, confidences, class_ids = prediction
+        wanted_class_ids = self._class_ids_for(object_classes)
 
-        detections = sv.Detections.from_ultralytics(results[0])
+        detections = sv.Detections(
+            xyxy=xyxy, confidence=confidences, class_id=class_ids
+        )
         tracked_detections = self.tracker.update(detections)
 
+        # Track IDs by box index, SORT keeps the order of its input
+        track_ids = getattr(tracked_detections, "tracker_id", None)
+        if track_ids is not None and len(track_ids) != len(xyxy):
+            track_ids = None
+
+        candidates = np.flatnonzero(np.isin(class_ids, wanted_class_ids))
+        candidates = candidates[np.argsort(-confidences[candidates], kind="stable")]
+        _, first = np.unique(class_ids[candidates], return_index=True)
+
         outputs = {}
-        boxes = results[0].boxes
-
-        if boxes is not None:
-            for i, box in enumerate(boxes):
-                class_name = self.model.names[int(box.cls[0])]
-
-                if class_name in object_classes:
-                    x1, y1, x2, y2 = box.xyxy[0].cpu().numpy()
-                    confidence = float(box.conf[0].cpu().numpy())
-                    class_id = int(box.cls[0].cpu().numpy())
-
-                    center_x = int((x1 + x2) / 2)
-                    center_y = int((y1 + y2) / 2)
-                    width = x2 - x1
-                    height = y2 - y1
-
-                    # Get track ID if available
-                    track_id = None
-                    if (
-                        hasattr(tracked_detections, "tracker_id") and
-                        tracked_detections.tracker_id is not None 
-                        and len(tracked_detections.tracker_id) > i
-                    ):
-                        track_id = tracked_detections.tracker_id[i]
-
-                    detection = Detection(
-                        center_pixel=(center_x, center_y),
-                        bbox=(int(x1), int(y1), int(x2), int(y2)),
-                        confidence=confidence,
-                        class_id=class_id,
-                        size=(width, height),
-                        track_id=track_id,
-                    )
+        for i in candidates[first]:
+            x1, y1, x2, y2 = xyxy[i]
+            class_id = int(class_ids[i])
+            outputs[self.class_names[class_id]] = Detection(
+                center_pixel=(int((x1 + x2) / 2), int((y1 + y2) / 2)),
+                bbox=(int(x1), int(y1), int(x2), int(y2)),
+                confidence=float(confidences[i]),
+                class_id=class_id,
+                size=(float(x2 - x1), float(y2 - y1)),
+                track_id=None if track_ids is None else int(track_ids[i]),
+            )
 
-                    # Store the best detection for each class
-                    if (
-                        class_name not in outputs
-                        or detection.confidence > outputs[class_name].confidence
-                    ):
-                        outputs[class_name] = detection
+        if self.roi_mode:
+            self._update_roi_targets(outputs)
 
         return outputs
 
-    def _create_rotation_matrix(
-        self, roll: float, pitch: float, yaw: float
-    ) -> np.ndarray:
-        """Create rotation matrix from Euler angles"""
-        R_x = np.array(
-            [
-                [1, 0, 0],
-                [0, math.cos(roll), -math.sin(roll)],
-                [0, math.sin(roll), math.cos(roll)],
+    def _roi_windows(
+        self, frame_shape: Tuple[int, int]
+    ) -> List[Tuple[int, int, int, int]]:
+        """Padded crop windows around the tracked targets, [] for a full frame run"""
+        height, width = frame_shape
+        with self.roi_lock:
+            if (
+                not self.roi_targets
+                or self.runs_since_full_frame + 1 >= self.full_frame_interval
+            ):
+                return []
+            self.runs_since_full_frame += 1
+            targets = list(self.roi_targets)
+
+        windows = []
+        for x1, y1, x2, y2 in targets:
+            # At least one model input of native pixels, so small targets are
+            # not downscaled
+            side = max(
+                self.imgsz, int(max(x2 - x1, y2 - y1) * (1 + 2 * self.roi_padding))
+            )
+            win_w, win_h = min(side, width), min(side, height)
+            left = int(np.clip((x1 + x2) // 2 - win_w // 2, 0, width - win_w))
+            top = int(np.clip((y1 + y2) // 2 - win_h // 2, 0, height - win_h))
+            windows.append((left, top, left + win_w, top + win_h))
+
+        # Crops covering most of the frame are no cheaper than the frame itself
+        covered = sum((x2 - x1) * (y2 - y1) for x1, y1, x2, y2 in windows)
+        if covered >= 0.75 * width * height:
+            return []
+        return windows
+
+    def _update_roi_targets(self, detections: Dict[str, Detection]):
+        """Use boxes with a confirmed track ID as the next ROI centers"""
+        with self.roi_lock:
+            self.roi_targets = [
+                detection.bbox
+                for detection in detections.values()
+                if detection.track_id is not None and detection.track_id >= 0
             ]
+
+    def track(
+        self,
+        image: np.ndarray,
+        confidence_threshold: float = 0.5,
+        object_classes: List[str] = ["helipad", "real_tank"],
+        tiled: Optional[bool] = None,
+    ) -> Dict[str, Detection]:
+        """
+        Detect objects every `detect_interval` frames and propagate them with
+        sparse optical flow in between. Same output as detect(), propagated
+        detections have `predicted` set.
+        """
+        job = self.prepare_detection(
+            image, confidence_threshold, object_classes, propagate=True, tiled=tiled
         )
-        R_y = np.array(
-            [
-                [math.cos(pitch), 0, math.sin(pitch)],
-                [0, 1, 0],
-                [-math.sin(pitch), 0, math.cos(pitch)],
-            ]
+        return self.finish_detection(self.run_detection(job))
+
+    def _store_state(self, job: DetectionJob, detections: Dict[str, Detection]):
+        """Keep a job's frame and detections for propagation, unless older
+
+        Call with schedule_lock held.
+        """
+        if job.seq and job.seq <= self.state_seq:
+            return
+        self.previous_gray = job.gray
+        self.previous_detections = detections
+        self.state_seq = job.seq
+
+    def _try_propagate(
+        self, job: DetectionJob, object_classes: List[str]
+    ) -> Optional[Dict[str, Detection]]:
+        """Previous detections moved onto the job's frame, None on failure
+
+        Call with schedule_lock held.
+        """
+        if job.seq <= self.state_seq or not self._can_propagate(
+            job.gray, object_classes
+        ):
+            return None
+        propagated = self._propagate(
+            self.previous_gray, job.gray, self.previous_detections
         )
-        R_z = np.array(
-            [
-                [math.cos(yaw), -math.sin(yaw), 0],
-                [math.sin(yaw), math.cos(yaw), 0],
-                [0, 0, 1],
-            ]
+        if propagated is not None:
+            self._store_state(job, propagated)
+        return propagated
+
+    def _can_propagate(self, gray: np.ndarray, object_classes: List[str]) -> bool:
+        """Whether the previous detections are still good enough to propagate
+
+        The detector cadence is planned by prepare_detection().
+        """
+        detections = self.previous_detections
+        return (
+            self.previous_gray is not None
+            and self.previous_gray.shape == gray.shape
+            and bool(detections)
+            and set(detections) <= set(object_classes)
+            and all(
+                d.confidence >= self.min_track_confidence for d in detections.values()
+            )
         )
-        return R_z @ R_y @ R_x
 
-    def _offset_gps(
-        self, lat: float, lon: float, north: float, east: float
-    ) -> Tuple[float, float]:
-        """Convert North-East offsets to GPS coordinates"""
-        dLat = north / EARTH_RADIUS_M
-        dLon = east / (EARTH_RADIUS_M * np.cos(np.deg2rad(lat)))
-        return lat + np.rad2deg(dLat), lon + np.rad2deg(dLon)
+    def _propagate(
+        self,
+        previous_gray: np.ndarray,
+        gray: np.ndarray,
+        detections: Dict[str, Detection],
+    ) -> Optional[Dict[str, Detection]]:
+        """Shift boxes by the median Lucas-Kanade flow of corners inside them
+
+        Returns None if any box has too few trackable corners.
+        """
+        height, width = gray.shape
+        points, owners = [], []
+        for object_class, detection in detections.items():
+            x1, y1, x2, y2 = detection.bbox
+            mask = np.zeros_like(previous_gray)
+            mask[max(y1, 0) : max(y2, 0), max(x1, 0) : max(x2, 0)] = 255
+            corners = cv2.goodFeaturesToTrack(
+                previous_gray,
+                maxCorners=50,
+                qualityLevel=0.01,
+                minDistance=5,
+                mask=mask,
+            )
+            if corners is None or len(corners) < self.MIN_FLOW_POINTS:
+                return None
+            points.append(corners)
+            owners.extend([object_class] * len(corners))
+
+        # One pyramid LK call for all boxes
+        points = np.concatenate(points).astype(np.float32)
+        moved, status, _ = cv2.calcOpticalFlowPyrLK(
+            previous_gray, gray, points, None, winSize=(21, 21), maxLevel=3
+        )
+        tracked = status.ravel() == 1
+        flow = (moved - points).reshape(-1, 2)
+        owners = np.array(owners)
+
+        propagated = {}
+        for object_class, detection in detections.items():
+            own = owners == object_class
+            good = own & tracked
+            if good.sum() < self.MIN_FLOW_POINTS:
+                return None
+            dx, dy = np.median(flow[good], axis=0)
+
+            x1, y1, x2, y2 = detection.bbox
+            x1, x2 = int(round(x1 + dx)), int(round(x2 + dx))
+            y1, y2 = int(round(y1 + dy)), int(round(y2 + dy))
+            center_x, center_y = (x1 + x2) // 2, (y1 + y2) // 2
+            if not (0 <= center_x < width and 0 <= center_y < height):
+                return None  # Target left the frame, let the detector decide
+
+            propagated[object_class] = replace(
+                detection,
+                center_pixel=(center_x, center_y),
+                bbox=(x1, y1, x2, y2),
+                # Fewer surviving corners mean a less reliable shift
+                confidence=detection.confidence
+                * self.PROPAGATION_DECAY
+                * float(good.sum() / own.sum()),
+                predicted=True,
+            )
+        return propagated
+
+    @property
+    def K(self) -> np.ndarray:
+        return self.geometry.K
+
+    @K.setter
+    def K(self, K: np.ndarray):
+        self.geometry = CameraGeometry(K, self.distortion)
+
+    def _geometry_for(self, K: Optional[np.ndarray]) -> CameraGeometry:
+        """Geometry of a per-call intrinsic matrix, the tracker's by default"""
+        if K is None or np.array_equal(K, self.geometry.K):
+            return self.geometry
+        if self.call_geometry is None or not np.array_equal(K, self.call_geometry.K):
+            self.call_geometry = CameraGeometry(K, self.distortion)
+        return self.call_geometry
+
+    def pixels_to_gps(
+        self,
+        pixels: np.ndarray,
+        drone_gps: Tuple[float, float, float],
+        drone_attitude: Tuple[float, float, float],
+        ground_level_masl: float,
+        K: Optional[np.ndarray] = None,
+        image_size: Optional[Tuple[int, int]] = None,
+    ) -> np.ndarray:
+        """(N, 2) lat/lon of (N, 2) pixel coordinates seen from one drone pose
+
+        Rows are NaN where no position could be computed, see
+        CameraGeometry.pixels_to_gps(). With the (width, height) `image_size`
+        a distorted camera builds its undistortion table on the first call.
+        """
+        try:
+            geometry = self._geometry_for(K)
+        except ValueError:
+            logger.error("Camera intrinsic matrix is singular")
+            return np.full((len(np.reshape(pixels, (-1, 2))), 2), np.nan)
+        if image_size is not None:
+            geometry.use_lut(image_size)
+        return geometry.pixels_to_gps(
+            pixels, drone_gps, drone_attitude, ground_level_masl, self.terrain
+        )
 
     def pixel_to_gps(
         self,
@@ -210,52 +660,12 @@ class YoloObjectTracker:
         Returns:
             (lat, lon) GPS coordinates or None if computation fails
         """
-        if K is None:
-            K = self.K
-
-        drone_lat, drone_lon, drone_alt_masl = drone_gps
-        roll, pitch, yaw = drone_attitude
-
-        # Height above ground
-        height_above_ground = drone_alt_masl - ground_level_masl
-        if height_above_ground <= 0:
-            logger.warning("Drone is at or below ground level — cannot compute GPS")
+        lat, lon = self.pixels_to_gps(
+            [pixel_coords], drone_gps, drone_attitude, ground_level_masl, K
+        )[0]
+        if np.isnan(lat):
             return None
-
-        # Convert pixel to camera ray
-        u, v = pixel_coords
-        pixel_homog = np.array([u, v, 1.0])
-
-        try:
-            K_inv = np.linalg.inv(K)
-        except np.linalg.LinAlgError:
-            logger.error("Camera intrinsic matrix is singular")
-            return None
-
-        cam_ray = K_inv @ pixel_homog
-        cam_ray = cam_ray / np.linalg.norm(cam_ray)
-
-        # Transform to world coordinates
-        R = self._create_rotation_matrix(roll, pitch, yaw)
-        dir_world = R @ cam_ray
-
-        # Check if ray points downward
-        if dir_world[2] >= 0:
-            logger.warning(
-                f"Camera ray points upward/horizontal (z={dir_world[2]:.3f})"
-            )
-            # return None
-
-        # Compute intersection with ground plane
-        t = height_above_ground / -dir_world[2]
-        offset_ned = t * dir_world
-
-        # Convert to GPS
-        target_lat, target_lon = self._offset_gps(
-            drone_lat, drone_lon, offset_ned[0], offset_ned[1]
-        )
-
-        return target_lat, target_lon
+        return float(lat), float(lon)
 
     def write_on_frame(
         self,
@@ -476,14 +886,18 @@ class YoloObjectTracker:
         K: Optional[np.ndarray] = None,
         object_classes: List[str] = ["helipad", "real_tank"],
         threshold: float = 0.5,
+        inplace: bool = False,
     ) -> Tuple[np.ndarray, Dict[str, Tuple[float, float]], Dict[str, Tuple[int, int]]]:
         """
         Process a single frame for object detection and GPS estimation
 
+        Args:
+            inplace: Draw annotations directly on `frame` instead of a copy
+
         Returns:
             Tuple of (annotated_frame, gps_coordinates, pixel_coordinates)
         """
-        detections = self.detect(
+        detections = self.track(
             frame, confidence_threshold=threshold, object_classes=object_classes
         )
 
@@ -493,18 +907,32 @@ class YoloObjectTracker:
 
         # self.log(f"Detected {len(detections)} objects")
 
-        annotated_frame = frame.copy()
-        gps_coords = {}
-        pixel_coords = {}
+        annotated_frame = self.draw_detections(
+            frame if inplace else frame.copy(), detections
+        )
+        gps_coords, pixel_coords = self.geolocate_detections(
+            detections,
+            drone_gps=drone_gps,
+            drone_attitude=drone_attitude,
+            ground_level_masl=ground_level_masl,
+            K=K,
+            image_size=frame.shape[1::-1],
+        )
+
+        return annotated_frame, gps_coords, pixel_coords
 
+    def draw_detections(
+        self, frame: np.ndarray, detections: Dict[str, Detection]
+    ) -> np.ndarray:
+        """Draw boxes, centers and labels of detections on the frame in place"""
         for object_class, detection in detections.items():
             # Draw bounding box and center
             x1, y1, x2, y2 = detection.bbox
             center = detection.center_pixel
 
             color = (100, 255, 0)  # Could be made configurable
-            cv2.rectangle(annotated_frame, (x1, y1), (x2, y2), color, 2)
-            cv2.circle(annotated_frame, center, 8, (255, 0, 255), -1)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, 2)
+            cv2.circle(frame, center, 8, (255, 0, 255), -1)
 
             # Add label with tracking ID if available
             label = f"{object_class}: {detection.confidence:.2f}"
@@ -512,7 +940,7 @@ class YoloObjectTracker:
                 label += f" (ID: {detection.track_id})"
 
             cv2.putText(
-                annotated_frame,
+                frame,
                 label,
                 (x1, y1 - 10),
                 cv2.FONT_HERSHEY_SIMPLEX,
@@ -521,20 +949,47 @@ class YoloObjectTracker:
                 2,
             )
 
-            # Compute GPS coordinates
-            gps_result = self.pixel_to_gps(
-                pixel_coords=center,
-                drone_gps=drone_gps,
-                drone_attitude=drone_attitude,
-                ground_level_masl=ground_level_masl,
-                K=K,
-            )
+        return frame
 
-            if gps_result is not None:
-                gps_coords[object_class] = gps_result
+    def geolocate_detections(
+        self,
+        detections: Dict[str, Detection],
+        drone_gps: Tuple[float, float, float],
+        drone_attitude: Tuple[float, float, float],
+        ground_level_masl: float,
+        K: Optional[np.ndarray] = None,
+        image_size: Optional[Tuple[int, int]] = None,
+    ) -> Tuple[Dict[str, Tuple[float, float]], Dict[str, Tuple[int, int]]]:
+        """Estimate GPS coordinates of detection centers
+
+        `image_size` is the (width, height) of the frame, see pixels_to_gps().
+
+        Returns:
+            Tuple of (gps_coordinates, pixel_coordinates), only for objects
+            whose position could be computed
+        """
+        gps_coords = {}
+        pixel_coords = {}
+        if not detections:
+            return gps_coords, pixel_coords
+
+        # One rotation and one batched intersection for every detection
+        centers = [detection.center_pixel for detection in detections.values()]
+        coordinates = self.pixels_to_gps(
+            np.array(centers),
+            drone_gps,
+            drone_attitude,
+            ground_level_masl,
+            K,
+            image_size,
+        )
+
+        for object_class, center, (lat, lon) in zip(detections, centers, coordinates):
+            if not np.isnan(lat):
+                gps_coords[object_class] = (float(lat), float(lon))
                 pixel_coords[object_class] = center
 
-        return annotated_frame, gps_coords, pixel_coords
+        return gps_coords, pixel_coords
 
     @contextmanager
     def dataset_writer(self, dataset_path: str):
@@ -0,0 +1,307 @@
+"""Local digital elevation model for terrain aware geolocation
+
+Tiles are read from one folder:
+
+- ``N47E008.hgt``: SRTM tiles, big-endian int16, memory-mapped
+- ``N47E008.npy``: the same 1x1 degree layout as a 2D numpy array (row 0 is
+  the north edge, both edges included), memory-mapped
+- ``*.tif``: GeoTIFFs of any extent in WGS84 lat/lon, read with rasterio
+
+Only the tiles a query touches are opened, the most recently used ones stay
+open. Heights are metres above mean sea level like the drone's GPS altitude.
+"""
+
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.controls.gps.geolocation import offset_gps
+
+try:
+    import rasterio
+except ImportError:  # only needed for GeoTIFF tiles
+    rasterio = None
+
+logger = logging.getLogger("dem")
+
+TILE_NAME = re.compile(r"^([NS])(\d{2})([EW])(\d{3})$", re.IGNORECASE)
+SRTM_VOID = -32768
+
+
+def tile_corner(stem: str) -> Optional[Tuple[int, int]]:
+    """South-west corner (lat, lon) of a tile named like N47E008"""
+    match = TILE_NAME.match(stem)
+    if match is None:
+        return None
+    south = int(match.group(2)) * (1 if match.group(1) in "Nn" else -1)
+    west = int(match.group(4)) * (1 if match.group(3) in "Ee" else -1)
+    return south, west
+
+
+@dataclass
+class DemTile:
+    """Heights on a regular lat/lon grid, row 0 the northernmost"""
+
+    heights: np.ndarray  # memory-mapped where the format allows it
+    north: float  # latitude of the first row's samples
+    west: float  # longitude of the first column's samples
+    lat_step: float
+    lon_step: float
+    nodata: Optional[float] = None
+
+    def sample(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """Bilinearly interpolated heights, NaN off the tile or on voids"""
+        rows, cols = self.heights.shape
+        row = (self.north - lat) / self.lat_step
+        col = (lon - self.west) / self.lon_step
+        inside = (row >= 0) & (col >= 0) & (row <= rows - 1) & (col <= cols - 1)
+        heights = np.full(len(lat), np.nan)
+        if not inside.any():
+            return heights
+
+        row, col = row[inside], col[inside]
+        r0 = np.minimum(row.astype(np.intp), rows - 2)
+        c0 = np.minimum(col.astype(np.intp), cols - 2)
+        wr, wc = row - r0, col - c0
+        # Fancy indexing only pages in the samples' part of a memory map
+        corners = np.stack(
+            [
+                self.heights[r0, c0],
+                self.heights[r0, c0 + 1],
+                self.heights[r0 + 1, c0],
+                self.heights[r0 + 1, c0 + 1],
+            ]
+        ).astype(np.float64)
+        if self.nodata is not None:
+            corners[corners == self.nodata] = np.nan
+        top = corners[0] * (1 - wc) + corners[1] * wc
+        bottom = corners[2] * (1 - wc) + corners[3] * wc
+        heights[inside] = top * (1 - wr) + bottom * wr
+        return heights
+
+
+class ElevationModel:
+    """Elevation tiles of a folder with an LRU cache of open tiles
+
+    intersect() ray-marches camera rays against the terrain, a few hundred
+    samples per ray in one vectorized height query for all rays of a frame.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        max_tiles: int = 4,
+        step_m: float = 2.0,
+        search_m: float = 150.0,
+        max_samples: int = 256,
+        refine_steps: int = 5,
+    ):
+        self.directory = directory
+        self.max_tiles = max(int(max_tiles), 1)
+        # Rays are sampled every `step_m` metres, at most `max_samples` times,
+        # between the heights `search_m` above and below the ground under the
+        # drone, then the crossing is bisected `refine_steps` times
+        self.step_m = step_m
+        self.search_m = search_m
+        self.max_samples = max_samples
+        self.refine_steps = refine_steps
+
+        # (south, west, north, east) bounds of every tile file
+        self.index: List[Tuple[Tuple[float, float, float, float], str]] = []
+        self._build_index()
+        self.tiles: "OrderedDict[str, DemTile]" = OrderedDict()
+        self.tiles_lock = threading.Lock()
+        self.loads = 0
+
+    def __getstate__(self):
+        # Worker processes open their own tiles
+        state = self.__dict__.copy()
+        state["tiles"] = OrderedDict()
+        del state["tiles_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.tiles_lock = threading.Lock()
+
+    def _build_index(self):
+        if not os.path.isdir(self.directory):
+            raise FileNotFoundError(f"Elevation folder {self.directory} not found")
+
+        for name in sorted(os.listdir(self.directory)):
+            path = os.path.join(self.directory, name)
+            stem, extension = os.path.splitext(name)
+            extension = extension.lower()
+            if extension in (".hgt", ".npy"):
+                corner = tile_corner(stem)
+                if corner is None:
+                    logger.warning(f"Skipping {name}, expected a name like N47E008")
+                    continue
+                south, west = corner
+                self.index.append(((south, west, south + 1, west + 1), path))
+            elif extension in (".tif", ".tiff"):
+                if rasterio is None:
+                    raise RuntimeError(
+                        "rasterio is required for GeoTIFF elevation tiles, "
+                        "install it with `pip install rasterio`"
+                    )
+                with rasterio.open(path) as dataset:
+                    bounds = dataset.bounds
+                self.index.append(
+                    ((bounds.bottom, bounds.left, bounds.top, bounds.right), path)
+                )
+
+        if not self.index:
+            raise ValueError(f"No elevation tiles in {self.directory}")
+        logger.info(f"Indexed {len(self.index)} elevation tiles in {self.directory}")
+
+    def _open(self, path: str) -> DemTile:
+        """Open one tile file, memory-mapped unless it is a GeoTIFF"""
+        stem, extension = os.path.splitext(os.path.basename(path))
+        extension = extension.lower()
+        if extension in (".tif", ".tiff"):
+            with rasterio.open(path) as dataset:
+                transform = dataset.transform
+                return DemTile(
+                    heights=dataset.read(1),
+                    north=transform.f + transform.e / 2,
+                    west=transform.c + transform.a / 2,
+                    lat_step=-transform.e,
+                    lon_step=transform.a,
+                    nodata=dataset.nodata,
+                )
+
+        if extension == ".hgt":
+            size = int(round(np.sqrt(os.path.getsize(path) / 2)))
+            heights = np.memmap(path, dtype=">i2", mode="r", shape=(size, size))
+            nodata = SRTM_VOID
+        else:
+            heights = np.load(path, mmap_mode="r")
+            nodata = SRTM_VOID if heights.dtype.kind == "i" else None
+        south, west = tile_corner(stem)
+        rows, cols = heights.shape
+        return DemTile(
+            heights=heights,
+            north=south + 1,
+            west=west,
+            lat_step=1 / (rows - 1),
+            lon_step=1 / (cols - 1),
+            nodata=nodata,
+        )
+
+    def _tile(self, path: str) -> DemTile:
+        with self.tiles_lock:
+            tile = self.tiles.get(path)
+            if tile is not None:
+                self.tiles.move_to_end(path)
+                return tile
+        tile = self._open(path)
+        with self.tiles_lock:
+            self.loads += 1
+            self.tiles[path] = tile
+            while len(self.tiles) > self.max_tiles:
+                self.tiles.popitem(last=False)
+        return tile
+
+    def elevation(self, lat: np.ndarray, lon: np.ndarray) -> np.ndarray:
+        """Terrain heights at arrays of coordinates, NaN where no tile has data"""
+        lat = np.asarray(lat, dtype=np.float64).ravel()
+        lon = np.asarray(lon, dtype=np.float64).ravel()
+        heights = np.full(len(lat), np.nan)
+        if len(lat) == 0:
+            return heights
+
+        bounds = (lat.min(), lon.min(), lat.max(), lon.max())
+        for (south, west, north, east), path in self.index:
+            # Skip tiles outside the query's bounding box without opening them
+            if south > bounds[2] or north < bounds[0]:
+                continue
+            if west > bounds[3] or east < bounds[1]:
+                continue
+            todo = np.flatnonzero(np.isnan(heights))
+            if len(todo) == 0:
+                break
+            inside = (
+                (lat[todo] >= south)
+                & (lat[todo] <= north)
+                & (lon[todo] >= west)
+                & (lon[todo] <= east)
+            )
+            if inside.any():
+                rows = todo[inside]
+                heights[rows] = self._tile(path).sample(lat[rows], lon[rows])
+        return heights
+
+    def intersect(
+        self, drone_gps: Sequence[float], directions: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """North/east offsets in metres where (N, 3) world rays meet the terrain
+
+        Rays are CameraGeometry.world_rays(). Like its flat ground, t = h / -z,
+        a ray meets the ground along its line whichever way z points, so rays
+        are marched with z turned downwards. Offsets are NaN for rays that
+        leave the elevation data or the search band without a crossing.
+        """
+        directions = np.asarray(directions, dtype=np.float64).reshape(-1, 3)
+        north = np.full(len(directions), np.nan)
+        east = np.full(len(directions), np.nan)
+        drone_lat, drone_lon, drone_alt = drone_gps
+
+        below = self.elevation([drone_lat], [drone_lon])[0]
+        if np.isnan(below):
+            return north, east
+        if drone_alt <= below:
+            logger.warning("Drone is at or below the terrain — cannot compute GPS")
+            return north, east
+
+        rays = np.flatnonzero(np.abs(directions[:, 2]) > 1e-9)
+        if len(rays) == 0:
+            return north, east
+        d = directions[rays] * -np.sign(directions[rays, 2])[:, None]
+        climb = -d[:, 2]
+
+        def gap(t: np.ndarray) -> np.ndarray:
+            """Height above the terrain of every ray at (M, S) distances t"""
+            lat, lon = offset_gps(drone_lat, drone_lon, t * d[:, :1], t * d[:, 1:2])
+            ground = self.elevation(lat, lon).reshape(t.shape)
+            return drone_alt - t * climb[:, None] - ground
+
+        # Coarse march between the top and the bottom of the search band
+        t_near = np.maximum(drone_alt - (below + self.search_m), 0) / climb
+        t_far = (drone_alt - (below - self.search_m)) / climb
+        samples = np.ceil((t_far - t_near).max() / self.step_m)
+        samples = int(np.clip(samples, 1, self.max_samples - 1)) + 1
+        t = t_near[:, None] + (t_far - t_near)[:, None] * np.linspace(0, 1, samples)
+        crossed = gap(t) <= 0
+
+        hit = crossed.any(axis=1)
+        first = crossed.argmax(axis=1)
+        index = np.arange(len(rays))
+        high = t[index, first]
+        low = t[index, np.maximum(first - 1, 0)]
+
+        # Bisect the bracketing interval, NaN heights count as above ground
+        for _ in range(self.refine_steps):
+            middle = (low + high) / 2
+            under = gap(middle[:, None])[:, 0] <= 0
+            high = np.where(under, middle, high)
+            low = np.where(under, low, middle)
+
+        t_hit = np.where(hit, (low + high) / 2, np.nan)
+        north[rays] = t_hit * d[:, 0]
+        east[rays] = t_hit * d[:, 1]
+        return north, east
+
+    def get_stats(self) -> dict:
+        with self.tiles_lock:
+            return {
+                "tiles": len(self.index),
+                "open": len(self.tiles),
+                "loads": self.loads,
+            }
@@ -0,0 +1,238 @@
+"""Batched Kalman filtering of geolocated targets
+
+One constant velocity filter per target key (e.g. camera and class), all
+tracks stored in preallocated arrays and predicted, gated and updated
+together with batched numpy operations instead of one filter object each.
+States are north/east metres and m/s in a local tangent plane around the
+first measurement.
+"""
+
+import logging
+from typing import Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from src.controls.gps.geolocation import EARTH_RADIUS_M, offset_gps
+
+logger = logging.getLogger("filter-bank")
+
+# Mahalanobis distance squared for 99% of 2D Gaussian measurements
+GATE_99 = 9.21
+
+
+class TargetFilterBank:
+    """Constant velocity Kalman filters of up to `max_tracks` targets
+
+    update() creates a track for every new key, predicts the known ones to
+    the measurement time, rejects measurements outside the gate and updates
+    the rest. A track gated `reset_after` times in a row restarts at the
+    measurement, tracks without an accepted measurement for `max_age` seconds
+    are retired.
+    """
+
+    def __init__(
+        self,
+        max_tracks: int = 32,
+        measurement_sigma: float = 3.0,
+        accel_sigma: float = 0.5,
+        initial_speed_sigma: float = 2.0,
+        gate: float = GATE_99,
+        max_age: float = 5.0,
+        reset_after: int = 3,
+    ):
+        self.max_tracks = max_tracks
+        self.measurement_var = measurement_sigma**2
+        self.accel_var = accel_sigma**2
+        self.initial_speed_var = initial_speed_sigma**2
+        self.gate = gate
+        self.max_age = max_age
+        self.reset_after = reset_after
+
+        # [north, east, v_north, v_east] and covariance of every slot
+        self.x = np.zeros((max_tracks, 4))
+        self.P = np.zeros((max_tracks, 4, 4))
+        self.last_update = np.zeros(max_tracks)
+        self.active = np.zeros(max_tracks, dtype=bool)
+        self.gated = np.zeros(max_tracks, dtype=np.int64)  # consecutive rejects
+        self.slots: Dict[Hashable, int] = {}
+        self.keys: List[Optional[Hashable]] = [None] * max_tracks
+        self.labels: List[Optional[str]] = [None] * max_tracks
+        self.origin: Optional[Tuple[float, float]] = None
+
+        # Stats
+        self.created = 0
+        self.retired = 0
+        self.rejected = 0
+
+    def _to_local(self, coordinates: np.ndarray) -> np.ndarray:
+        """(N, 2) lat/lon to north/east metres from the origin"""
+        lat0, lon0 = self.origin
+        north = np.deg2rad(coordinates[:, 0] - lat0) * EARTH_RADIUS_M
+        east = (
+            np.deg2rad(coordinates[:, 1] - lon0)
+            * EARTH_RADIUS_M
+            * np.cos(np.deg2rad(lat0))
+        )
+        return np.column_stack([north, east])
+
+    def _to_gps(self, local: np.ndarray) -> np.ndarray:
+        lat, lon = offset_gps(*self.origin, local[:, 0], local[:, 1])
+        return np.column_stack([lat, lon])
+
+    def _free(self, slots: np.ndarray):
+        for slot in slots:
+            del self.slots[self.keys[slot]]
+            self.keys[slot] = None
+            self.labels[slot] = None
+        self.active[slots] = False
+        self.retired += len(slots)
+
+    def retire(self, timestamp: float):
+        """Drop tracks without an update for more than max_age seconds"""
+        stale = np.flatnonzero(
+            self.active & (timestamp - self.last_update > self.max_age)
+        )
+        if len(stale):
+            self._free(stale)
+
+    def _allocate(
+        self, key: Hashable, label: Optional[str], in_use: np.ndarray
+    ) -> int:
+        """Slot for a new track, evicting the stalest track not in `in_use`"""
+        free = np.flatnonzero(~self.active)
+        if len(free):
+            slot = int(free[0])
+        else:
+            candidates = np.setdiff1d(np.arange(self.max_tracks), in_use)
+            if len(candidates) == 0:
+                candidates = np.arange(self.max_tracks)
+            slot = int(candidates[np.argmin(self.last_update[candidates])])
+            self._free(np.array([slot]))
+        self.slots[key] = slot
+        self.keys[slot] = key
+        self.labels[slot] = label
+        self.active[slot] = True
+        self.created += 1
+        return slot
+
+    def _initialize(self, slots: np.ndarray, z: np.ndarray):
+        self.x[slots] = 0.0
+        self.x[slots, :2] = z
+        self.P[slots] = np.diag(
+            [self.measurement_var] * 2 + [self.initial_speed_var] * 2
+        )
+        self.gated[slots] = 0
+
+    def _predict(
+        self, slots: np.ndarray, dt: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Constant velocity prediction of the slots by per-track dt
+
+        Returns the predicted states and covariances, the slots are unchanged.
+        """
+        x = self.x[slots]
+        x[:, :2] += dt[:, None] * x[:, 2:]
+
+        F = np.tile(np.eye(4), (len(slots), 1, 1))
+        F[:, 0, 2] = F[:, 1, 3] = dt
+        # White acceleration noise, per axis q * [[dt^4/4, dt^3/2], [dt^3/2, dt^2]]
+        Q = np.zeros((len(slots), 4, 4))
+        for position, velocity in ((0, 2), (1, 3)):
+            Q[:, position, position] = dt**4 / 4
+            Q[:, position, velocity] = Q[:, velocity, position] = dt**3 / 2
+            Q[:, velocity, velocity] = dt**2
+        return x, F @ self.P[slots] @ F.transpose(0, 2, 1) + Q * self.accel_var
+
+    def update(
+        self,
+        keys: Sequence[Hashable],
+        coordinates: np.ndarray,
+        timestamp: float,
+        labels: Optional[Sequence[str]] = None,
+        weights: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """Filter one lat/lon measurement per key, returns the (N, 2) estimates
+
+        `weights` in (0, 1] scale down the trust in a measurement, its
+        variance is divided by the weight. Keys must be unique per call.
+        """
+        coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        if len(coordinates) == 0:
+            return np.empty((0, 2))
+        if self.origin is None:
+            self.origin = (float(coordinates[0, 0]), float(coordinates[0, 1]))
+        self.retire(timestamp)
+
+        labels = labels if labels is not None else [None] * len(keys)
+        slots = np.array([self.slots.get(key, -1) for key in keys], dtype=np.intp)
+        new = slots < 0
+        for i in np.flatnonzero(new):
+            slots[i] = self._allocate(keys[i], labels[i], slots[slots >= 0])
+        z = self._to_local(coordinates)
+        self._initialize(slots[new], z[new])
+        self.last_update[slots[new]] = timestamp
+        estimates = z.copy()
+
+        known = slots[~new]
+        if len(known):
+            dt = np.maximum(timestamp - self.last_update[known], 0.0)
+            x, P = self._predict(known, dt)
+
+            weight = np.ones(len(known))
+            if weights is not None:
+                weight = np.asarray(weights, dtype=np.float64)[~new]
+            R = self.measurement_var / np.clip(weight, 1e-3, 1.0)
+            y = z[~new] - x[:, :2]
+            S = P[:, :2, :2] + R[:, None, None] * np.eye(2)
+            S_inv = np.linalg.inv(S)
+            distance = np.einsum("mi,mij,mj->m", y, S_inv, y)
+
+            accept = distance <= self.gate
+            K = P[:, :, :2] @ S_inv
+            x_updated = x + np.einsum("mij,mj->mi", K, y)
+            P_updated = P - K @ P[:, :2, :]
+            self.x[known[accept]] = x_updated[accept]
+            self.P[known[accept]] = P_updated[accept]
+            self.gated[known[accept]] = 0
+            self.last_update[known[accept]] = timestamp
+
+            # Outliers leave the track as it was, so it ages towards retirement,
+            # and are reported at the prediction. Persistent ones restart it
+            rejected = known[~accept]
+            self.rejected += len(rejected)
+            self.gated[rejected] += 1
+            restart = self.gated[rejected] >= self.reset_after
+            if restart.any():
+                logger.debug(f"Restarting {int(restart.sum())} gated tracks")
+                self._initialize(rejected[restart], z[~new][~accept][restart])
+                self.last_update[rejected[restart]] = timestamp
+            held = (self.gated[known] > 0)[:, None]
+            estimates[~new] = np.where(held, x[:, :2], self.x[known, :2])
+
+        return self._to_gps(estimates)
+
+    def estimates(
+        self, timestamp: Optional[float] = None
+    ) -> Dict[str, Tuple[float, float]]:
+        """(lat, lon) of the most recently updated live track of every label"""
+        if timestamp is not None:
+            self.retire(timestamp)
+        live = np.flatnonzero(self.active)
+        if len(live) == 0:
+            return {}
+        live = live[np.argsort(self.last_update[live])]
+        positions = self._to_gps(self.x[live, :2])
+        # Later (more recent) tracks overwrite earlier ones of the same label
+        return {
+            self.labels[slot]: (float(lat), float(lon))
+            for slot, (lat, lon) in zip(live, positions)
+            if self.labels[slot] is not None
+        }
+
+    def get_stats(self) -> Dict[str, int]:
+        return {
+            "tracks": int(self.active.sum()),
+            "created": self.created,
+            "retired": self.retired,
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,258 @@
+"""Vectorized pixel to GPS geolocation
+
+CameraGeometry caches the inverse intrinsics once per camera, the rotation is
+built once per frame and every detection of the frame is intersected with the
+ground in one set of numpy operations. The ground is a flat plane unless an
+elevation model is given (see dem.py). Lens distortion is removed from the
+detection pixels only, frames are never undistorted.
+"""
+
+import logging
+import time
+from typing import Any, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+EARTH_RADIUS_M = 6378137.0
+
+# The default 5 undistortion iterations leave up to a pixel of error towards
+# the edges of strongly distorted lenses
+UNDISTORT_CRITERIA = (cv2.TERM_CRITERIA_COUNT | cv2.TERM_CRITERIA_EPS, 20, 1e-9)
+# Undistorted points reprojecting further off than this lie where the
+# distortion polynomial cannot be inverted, usually the frame corners
+MAX_REPROJECTION_ERROR_PX = 0.5
+
+logger = logging.getLogger("geolocation")
+
+
+def rotation_matrix(roll: float, pitch: float, yaw: float) -> np.ndarray:
+    """Body to world rotation R_z(yaw) @ R_y(pitch) @ R_x(roll)"""
+    cr, sr = np.cos(roll), np.sin(roll)
+    cp, sp = np.cos(pitch), np.sin(pitch)
+    cy, sy = np.cos(yaw), np.sin(yaw)
+    return np.array(
+        [
+            [cy * cp, cy * sp * sr - sy * cr, cy * sp * cr + sy * sr],
+            [sy * cp, sy * sp * sr + cy * cr, sy * sp * cr - cy * sr],
+            [-sp, cp * sr, cp * cr],
+        ]
+    )
+
+
+def offset_gps(
+    lat: float, lon: float, north: np.ndarray, east: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray]:
+    """Latitudes and longitudes of North-East offsets in metres from (lat, lon)"""
+    d_lat = np.asarray(north) / EARTH_RADIUS_M
+    d_lon = np.asarray(east) / (EARTH_RADIUS_M * np.cos(np.deg2rad(lat)))
+    return lat + np.rad2deg(d_lat), lon + np.rad2deg(d_lon)
+
+
+class CameraGeometry:
+    """Intrinsics and lens distortion of one camera with the inverse computed once
+
+    With distortion coefficients (OpenCV order k1, k2, p1, p2[, k3, ...]) the
+    pixels are undistorted before they become rays: by bilinear lookup in a
+    table of every pixel's undistorted coordinates (a sparse
+    initUndistortRectifyMap) once use_lut() knows the image size, by
+    cv2.undistortPoints otherwise.
+    """
+
+    def __init__(
+        self,
+        K: np.ndarray,
+        distortion: Optional[np.ndarray] = None,
+        image_size: Optional[Tuple[int, int]] = None,
+    ):
+        self.K = np.asarray(K, dtype=np.float64)
+        try:
+            self.K_inv = np.linalg.inv(self.K)
+        except np.linalg.LinAlgError:
+            raise ValueError("Camera intrinsic matrix is singular") from None
+
+        self.distortion: Optional[np.ndarray] = None
+        if distortion is not None and np.any(distortion):
+            self.distortion = np.asarray(distortion, dtype=np.float64).ravel()
+        # ((width, height), table) swapped in as one tuple for reader threads
+        self.lut: Optional[Tuple[Tuple[int, int], np.ndarray]] = None
+        if image_size is not None:
+            self.use_lut(image_size)
+
+    def needs_lut(self, image_size: Tuple[int, int]) -> bool:
+        """Whether use_lut() would build a table for a (width, height) image"""
+        width, height = (int(v) for v in image_size)
+        if self.distortion is None or width < 2 or height < 2:
+            return False
+        return self.lut is None or self.lut[0] != (width, height)
+
+    def use_lut(self, image_size: Tuple[int, int]) -> None:
+        """Precompute the undistorted coordinates of a (width, height) image
+
+        Does nothing without distortion or when the table already has this
+        size. Building it takes about a second for 1280x720, lookups are then
+        a few microseconds however many pixels are queried.
+        """
+        if not self.needs_lut(image_size):
+            return
+
+        width, height = (int(v) for v in image_size)
+        start = time.perf_counter()
+        grid = np.mgrid[0:height, 0:width][::-1].reshape(2, -1).T
+        table = self.undistort_points(grid.astype(np.float64))
+        table = table.reshape(height, width, 2).astype(np.float32)
+        self.lut = ((width, height), table)
+        logger.info(
+            "Built %dx%d undistortion table in %.2f s, %.1f%% of pixels "
+            "outside the distortion model",
+            width,
+            height,
+            time.perf_counter() - start,
+            100.0 * np.isnan(table[..., 0]).mean(),
+        )
+
+    def undistort_points(self, pixels: np.ndarray) -> np.ndarray:
+        """Normalized image coordinates of (N, 2) distorted pixels
+
+        Rows are NaN where the distortion model cannot be inverted.
+        """
+        pixels = np.asarray(pixels, dtype=np.float64).reshape(-1, 2)
+        if len(pixels) == 0:
+            return np.empty((0, 2))
+        normalized = cv2.undistortPoints(
+            pixels.reshape(-1, 1, 2),
+            self.K,
+            self.distortion,
+            criteria=UNDISTORT_CRITERIA,
+        ).reshape(-1, 2)
+
+        # The iteration also "converges" past the polynomial's turning point,
+        # only points that map back onto their pixel are kept
+        reprojected, _ = cv2.projectPoints(
+            np.column_stack([normalized, np.ones(len(normalized))]),
+            np.zeros(3),
+            np.zeros(3),
+            self.K,
+            self.distortion,
+        )
+        error = np.linalg.norm(reprojected.reshape(-1, 2) - pixels, axis=1)
+        normalized[error > MAX_REPROJECTION_ERROR_PX] = np.nan
+        return normalized
+
+    def _lookup(self, pixels: np.ndarray) -> np.ndarray:
+        """Undistorted coordinates of (N, 2) pixels from the table
+
+        cv2.remap does the bilinear lookup of all pixels in one call, pixels
+        off the table or next to its invalid corners are solved directly.
+        """
+        (width, height), table = self.lut
+        normalized = cv2.remap(
+            table,
+            pixels.astype(np.float32).reshape(-1, 1, 2),
+            None,
+            cv2.INTER_LINEAR,
+            borderMode=cv2.BORDER_CONSTANT,
+            borderValue=(np.nan, np.nan),
+        )
+        normalized = normalized.reshape(-1, 2).astype(np.float64)
+        missing = np.flatnonzero(np.isnan(normalized[:, 0]))
+        if len(missing) == 0:
+            return normalized
+
+        # Pixels whose nearest table entry is invalid stay invalid
+        nearest = np.rint(pixels[missing]).astype(np.intp)
+        on_table = (
+            (nearest >= 0).all(axis=1)
+            & (nearest[:, 0] < width)
+            & (nearest[:, 1] < height)
+        )
+        retry = np.ones(len(missing), dtype=bool)
+        retry[on_table] = ~np.isnan(
+            table[nearest[on_table, 1], nearest[on_table, 0], 0]
+        )
+        if retry.any():
+            rows = missing[retry]
+            normalized[rows] = self.undistort_points(pixels[rows])
+        return normalized
+
+    def rays(self, pixels: np.ndarray) -> np.ndarray:
+        """Unit camera frame rays through (N, 2) pixel coordinates, shape (N, 3)
+
+        Rays of pixels outside the distortion model are NaN.
+        """
+        pixels = np.asarray(pixels, dtype=np.float64).reshape(-1, 2)
+        if self.distortion is None:
+            homogeneous = np.column_stack([pixels, np.ones(len(pixels))])
+            rays = homogeneous @ self.K_inv.T
+        else:
+            normalized = (
+                self._lookup(pixels)
+                if self.lut is not None
+                else self.undistort_points(pixels)
+            )
+            rays = np.column_stack([normalized, np.ones(len(pixels))])
+        return rays / np.linalg.norm(rays, axis=1, keepdims=True)
+
+    def world_rays(
+        self, pixels: np.ndarray, drone_attitude: Sequence[float]
+    ) -> np.ndarray:
+        """Rays through the pixels rotated by the (roll, pitch, yaw) attitude"""
+        return self.rays(pixels) @ rotation_matrix(*drone_attitude).T
+
+    def pixels_to_gps(
+        self,
+        pixels: np.ndarray,
+        drone_gps: Sequence[float],
+        drone_attitude: Sequence[float],
+        ground_level_masl: float,
+        terrain: Optional[Any] = None,
+    ) -> np.ndarray:
+        """(N, 2) lat/lon where the pixels' rays meet the ground
+
+        The ground is the `terrain` dem.ElevationModel where it has data and
+        the plane at `ground_level_masl` elsewhere. Rows are NaN where no position
+        can be computed, every row when the drone is at or below ground level.
+        """
+        pixels = np.asarray(pixels, dtype=np.float64).reshape(-1, 2)
+        coordinates = np.full((len(pixels), 2), np.nan)
+        drone_lat, drone_lon, drone_alt_masl = drone_gps
+
+        height_above_ground = drone_alt_masl - ground_level_masl
+        if height_above_ground <= 0 and terrain is None:
+            logger.warning("Drone is at or below ground level — cannot compute GPS")
+            return coordinates
+        if len(pixels) == 0:
+            return coordinates
+
+        directions = self.world_rays(pixels, drone_attitude)
+        undistorted = ~np.isnan(directions[:, 2])
+        if not undistorted.all():
+            logger.debug(
+                "%d of %d pixels outside the distortion model",
+                int((~undistorted).sum()),
+                len(pixels),
+            )
+        upward = directions[:, 2] >= 0
+        if upward.any():
+            logger.warning(
+                "Camera ray points upward/horizontal for %d of %d pixels (z=%.3f)",
+                int(upward.sum()),
+                len(pixels),
+                float(directions[upward, 2].max()),
+            )
+
+        north = np.full(len(pixels), np.nan)
+        east = np.full(len(pixels), np.nan)
+        if terrain is not None:
+            north, east = terrain.intersect(drone_gps, directions)
+
+        flat = (np.abs(directions[:, 2]) > 1e-9) & np.isnan(north)
+        if flat.any() and height_above_ground > 0:
+            t = height_above_ground / -directions[flat, 2]
+            north[flat] = t * directions[flat, 0]
+            east[flat] = t * directions[flat, 1]
+
+        coordinates[:, 0], coordinates[:, 1] = offset_gps(
+            drone_lat, drone_lon, north, east
+        )
+        return coordinates
@@ -38,14 +38,15 @@ def deprecated_method(func):
     return wrapper
 
 
-def get_camera_intrinsics():
-    # check the config/default.yaml for the camera intrinsics
+def get_camera_intrinsics(section: str = "camera"):
+    # check the config/default.yaml for the camera intrinsics, additional
+    # cameras have their own section, e.g. forward_camera
     config_path = os.path.join(
         os.path.dirname(__file__), "..", "..", "..", "config", "default.yaml"
     )
     with open(config_path, "r", encoding="utf-8") as file:
         config = yaml.safe_load(file)
-        camera_intrinsics = config.get("camera", {})
+        camera_intrinsics = config.get(section, {})
         if not camera_intrinsics:
             raise ValueError("Camera intrinsics not found in the configuration file.")
         intrinsics = camera_intrinsics.get("intrinsics", None)
@@ -0,0 +1,102 @@
+import os
+import sys
+
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+)
+
+import argparse
+import logging
+import time
+
+import cv2
+import numpy as np
+
+from src.controls.detection.metrics import DetectionMetrics
+from src.controls.detection.quantize import list_frames, load_labels
+from src.controls.detection.yolo import YoloObjectTracker, tile_windows
+
+logging.getLogger("ultralytics").setLevel(logging.WARNING)
+
+
+def benchmark(tracker, frames, ground_truth, tiled, conf, warmup=3):
+    """Recall and latency of single pass or tiled inference over the frames"""
+    tracker.tiled = tiled
+    for image in frames[:warmup]:
+        tracker.infer(image, conf)
+
+    metrics = DetectionMetrics()
+    latencies = []
+    for image, (gt_boxes, gt_classes) in zip(frames, ground_truth):
+        start = time.perf_counter()
+        boxes, confidences, class_ids = tracker.infer(image, conf)
+        latencies.append(time.perf_counter() - start)
+        metrics.update(boxes, confidences, class_ids, gt_boxes, gt_classes)
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        **metrics.compute(tracker.class_names),
+        "latency_mean_ms": float(latencies_ms.mean()),
+        "latency_p95_ms": float(np.percentile(latencies_ms, 95)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Compare tiled and single pass detection on recorded frames"
+    )
+    parser.add_argument("frames", help="Folder of extracted frames")
+    parser.add_argument(
+        "--labels", default=None, help="YOLO label folder, defaults to <frames>/labels"
+    )
+    parser.add_argument("--model", default="src/controls/detection/sim.pt")
+    parser.add_argument("--backend", default="auto")
+    parser.add_argument("--imgsz", type=int, default=640)
+    parser.add_argument("--overlap", type=float, default=0.2)
+    parser.add_argument("--conf", type=float, default=0.5)
+    parser.add_argument("--limit", type=int, default=200)
+    args = parser.parse_args()
+
+    labels_dir = args.labels or os.path.join(args.frames, "labels")
+    if not os.path.isdir(labels_dir):
+        print(f"Recall needs ground truth, no label folder at {labels_dir}")
+        return
+
+    frames, ground_truth = [], []
+    for path in list_frames(args.frames, args.limit):
+        image = cv2.imread(path)
+        if image is None:
+            continue
+        stem = os.path.splitext(os.path.basename(path))[0]
+        frames.append(image)
+        ground_truth.append(
+            load_labels(os.path.join(labels_dir, stem + ".txt"), image.shape[:2])
+        )
+    if not frames:
+        print(f"No frames found in {args.frames}")
+        return
+
+    tracker = YoloObjectTracker(
+        K=np.eye(3),
+        model_path=args.model,
+        backend=args.backend,
+        imgsz=args.imgsz,
+        tile_overlap=args.overlap,
+    )
+    tiles = len(tile_windows(frames[0].shape[:2], args.imgsz, args.overlap))
+    height, width = frames[0].shape[:2]
+    print(f"{len(frames)} frames of {width}x{height}, {tiles} tiles per frame")
+
+    print(f"{'mode':<8}{'recall50':>10}{'mAP50':>8}{'mean ms':>9}{'p95 ms':>8}")
+    for name, tiled in (("single", False), ("tiled", True)):
+        row = benchmark(tracker, frames, ground_truth, tiled, args.conf)
+        print(
+            f"{name:<8}{row['recall50']:>10.3f}{row['map50']:>8.3f}"
+            f"{row['latency_mean_ms']:>9.1f}{row['latency_p95_ms']:>8.1f}"
+        )
+        for class_name, per_class in row["per_class"].items():
+            print(f"  {class_name:<14}recall50 {per_class['recall50']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+import os
+import sys
+
+sys.path.append(
+    os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", ".."))
+)
+
+import argparse
+import time
+
+import numpy as np
+
+from src.controls.gps.geolocation import EARTH_RADIUS_M, CameraGeometry
+from src.controls.mavlink.mission_types import get_camera_intrinsics
+
+
+def time_call(geometry, pixels, pose, repeats):
+    """Mean microseconds of one batched pixels_to_gps call"""
+    geometry.pixels_to_gps(pixels, *pose)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        geometry.pixels_to_gps(pixels, *pose)
+    return (time.perf_counter() - start) / repeats * 1e6
+
+
+def ground_offset_m(a, b):
+    """Ground distance in metres between rows of lat/lon coordinates"""
+    d_lat = np.deg2rad(a[:, 0] - b[:, 0])
+    d_lon = np.deg2rad(a[:, 1] - b[:, 1]) * np.cos(np.deg2rad(a[:, 0]))
+    return EARTH_RADIUS_M * np.hypot(d_lat, d_lon)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Cost and accuracy of lens distortion aware geolocation"
+    )
+    parser.add_argument("--section", default="camera", help="Section in default.yaml")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--altitude", type=float, default=30.0)
+    parser.add_argument("--repeats", type=int, default=2000)
+    args = parser.parse_args()
+
+    camera = get_camera_intrinsics(args.section)
+    K, distortion = camera["camera_intrinsics"], camera["distortion"]
+    if not np.any(distortion):
+        print(f"No distortion coefficients in the {args.section} section")
+        return
+
+    pinhole = CameraGeometry(K)
+    points = CameraGeometry(K, distortion)
+    start = time.perf_counter()
+    lut = CameraGeometry(K, distortion, image_size=(args.width, args.height))
+    print(
+        f"{args.width}x{args.height} lookup table built in "
+        f"{time.perf_counter() - start:.2f} s"
+    )
+
+    # Camera at the given height, rolled so its optical axis meets the ground
+    pose = ((47.0, 8.0, args.altitude), (np.pi, 0.0, 0.0), 0.0)
+    rng = np.random.default_rng(0)
+
+    print(f"{'pixels':>8}{'pinhole us':>12}{'points us':>11}{'table us':>10}")
+    for count in (1, 2, 10, 100, 1000):
+        pixels = rng.uniform((0, 0), (args.width - 1, args.height - 1), (count, 2))
+        repeats = max(args.repeats // count, 20)
+        row = [time_call(g, pixels, pose, repeats) for g in (pinhole, points, lut)]
+        print(f"{count:>8}{row[0]:>12.1f}{row[1]:>11.1f}{row[2]:>10.1f}")
+
+    # Position error of ignoring the distortion, by distance from the center
+    pixels = rng.uniform((0, 0), (args.width - 1, args.height - 1), (20000, 2))
+    reference = points.pixels_to_gps(pixels, *pose)
+    valid = ~np.isnan(reference[:, 0])
+    radius = np.hypot(*((pixels - K[:2, 2]) / K[[0, 1], [0, 1]]).T)
+    ignored = ground_offset_m(pinhole.pixels_to_gps(pixels, *pose), reference)
+    table = ground_offset_m(lut.pixels_to_gps(pixels, *pose), reference)
+
+    dropped = valid & np.isnan(table)
+    print(f"\nAt {args.altitude:.0f} m, {100 * (~valid).mean():.1f}% of pixels lie")
+    print("outside the distortion model and get no position, the table drops")
+    print(f"{100 * dropped.mean():.2f}% more within half a pixel of that region")
+    print(f"{'radius':>10}{'ignored m':>11}{'table m':>10}")
+    edges = np.quantile(radius[valid], np.linspace(0, 1, 6))
+    for low, high in zip(edges[:-1], edges[1:]):
+        ring = valid & (radius >= low) & (radius <= high)
+        print(
+            f"{low:>4.2f}-{high:<5.2f}{np.max(ignored[ring]):>11.2f}"
+            f"{np.nanmax(table[ring]):>10.4f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,7 @@
 import sys
 import traceback
 import warnings
+from collections import OrderedDict
 from typing import Optional
 
 import cv2
@@ -26,9 +27,15 @@ from qfluentwidgets import (
 from qfluentwidgets import PushButton as QPushButton
 from qfluentwidgets import RoundMenu as QMenu
 
+from src.mq.messages import DetectionsMessage
 from src.mq.zmq_client import ZMQClient
 from src.gcs.drone_client import DroneClient
 
+# Detections messages kept for the overlay, by capture seq
+OVERLAY_MESSAGES = 16
+# Older detections than this, in capture time, are not drawn on a frame
+OVERLAY_MAX_AGE_S = 1.0
+
 
 class CameraWidget(QWidget):
     """Custom camera widget matching the drone control app style"""
@@ -42,6 +49,14 @@ class CameraWidget(QWidget):
         self.recording_filename = None
         self.drone_client = drone_client
 
+        # Overlay drawn locally from the detections topic on every raw frame,
+        # the detections of its own capture seq or the newest older ones
+        self.overlay_enabled = False
+        self.overlay_detections: "OrderedDict[int, DetectionsMessage]" = OrderedDict()
+
+        # Topic on display, for the latency/dropped frames readout
+        self.display_topic = "video"
+
         self.setup_ui()
         self.setup_style()
 
@@ -103,6 +118,13 @@ class CameraWidget(QWidget):
                 triggered=lambda: self.connect_camera(_type="processed"),
             )
         )
+        self.overlay_connect_action = self.connect_menu.addAction(
+            Action(
+                FIF.CONNECT,
+                "Raw Video Feed + Overlay",
+                triggered=lambda: self.connect_camera(_type="overlay"),
+            )
+        )
         self.connect_btn.setMenu(self.connect_menu)
 
         self.disconnect_btn = QPushButton("Disconnect")
@@ -230,6 +252,13 @@ class CameraWidget(QWidget):
             with warnings.catch_warnings():
                 warnings.simplefilter("ignore", RuntimeWarning)
                 signal.disconnect(self.update_frame)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            thread.frame_meta_received.disconnect(self.update_overlay_frame)
+            thread.detections_received.disconnect(self.update_detections)
+            thread.stream_stats_updated.disconnect(self.update_stream_stats)
+        self.overlay_enabled = False
+        self.overlay_detections.clear()
 
     def connect_camera(self, _type: str = "raw"):
         """Connect to camera"""
@@ -240,12 +269,31 @@ class CameraWidget(QWidget):
             self.drone_client.zmq_client.start()
 
             self._disconnect_camera_signals()
+            self.display_topic = "processed_video" if _type == "processed" else "video"
+            self.drone_client.zmq_client.video_thread.stream_stats_updated.connect(
+                self.update_stream_stats
+            )
 
+            # Only subscribe to the stream on display so the server skips the other
             if _type == "raw":
+                self.drone_client.zmq_client.video_thread.set_topics(["video"])
                 self.drone_client.zmq_client.video_thread.frame_received.connect(
                     self.update_frame
                 )
+            elif _type == "overlay":
+                # Raw stream plus compact detections instead of a second video
+                self.drone_client.zmq_client.video_thread.set_topics(
+                    ["video", "detections"]
+                )
+                self.drone_client.zmq_client.video_thread.frame_meta_received.connect(
+                    self.update_overlay_frame
+                )
+                self.drone_client.zmq_client.video_thread.detections_received.connect(
+                    self.update_detections
+                )
+                self.overlay_enabled = True
             else:
+                self.drone_client.zmq_client.video_thread.set_topics(["processed_video"])
                 self.drone_client.zmq_client.video_thread.processed_frame_received.connect(
                     self.update_frame
                 )
@@ -264,6 +312,8 @@ class CameraWidget(QWidget):
         """Disconnect from camera"""
         # self.drone_client.zmq_client.video_thread.stop()
         self._disconnect_camera_signals()
+        if self.drone_client.zmq_client:
+            self.drone_client.zmq_client.video_thread.set_topics([])
         if self.is_recording:
             self.stop_recording()
 
@@ -277,6 +327,92 @@ class CameraWidget(QWidget):
         self.disconnect_btn.setEnabled(False)
         self.connect_btn.setEnabled(True)
 
+    @Slot(dict)
+    def update_stream_stats(self, stats: dict):
+        """Show glass-to-glass latency and dropped frames of the displayed stream"""
+        if not self.is_connected or self.is_recording:
+            return
+        topic_stats = stats.get(self.display_topic)
+        if not topic_stats:
+            return
+        text = "Camera Connected"
+        if topic_stats["latency_ms"] is not None:
+            text += f" | {topic_stats['latency_ms']:.0f} ms"
+        text += f" | {topic_stats['dropped']} dropped"
+        self.status_label.setText(text)
+
+    @Slot(np.ndarray, object)
+    def update_overlay_frame(self, frame: np.ndarray, meta):
+        """Show a raw frame right away with the closest detections drawn on it
+
+        Detections usually arrive an inference after their frame, so most
+        frames get the newest older message, drawn as stale.
+        """
+        if meta is None or not self.overlay_detections:
+            # Older server without frame metadata, or nothing detected yet
+            self.update_frame(frame)
+            return
+
+        message = self.overlay_detections.get(meta.seq)
+        stale = message is None
+        if stale:
+            older = [seq for seq in self.overlay_detections if seq < meta.seq]
+            if older:
+                message = self.overlay_detections[max(older)]
+        if message is None or meta.timestamp - message.timestamp > OVERLAY_MAX_AGE_S:
+            self.update_frame(frame)
+            return
+        self.update_frame(self.draw_overlay(frame, message, stale))
+
+    @Slot(object)
+    def update_detections(self, message: DetectionsMessage):
+        """Keep detections by capture seq, drawn on the next frames"""
+        self.overlay_detections[message.seq] = message
+        while len(self.overlay_detections) > OVERLAY_MESSAGES:
+            self.overlay_detections.popitem(last=False)
+
+    def draw_overlay(
+        self, frame: np.ndarray, message: DetectionsMessage, stale: bool = False
+    ) -> np.ndarray:
+        """Draw detections on a copy of the raw frame
+
+        `stale` detections belong to an earlier frame and are drawn in grey.
+        """
+        frame = frame.copy()
+        h, w = frame.shape[:2]
+        # The stream may be downscaled relative to the capture the boxes refer to
+        src_w, src_h = message.frame_size
+        sx, sy = (w / src_w, h / src_h) if src_w and src_h else (1.0, 1.0)
+
+        for detection in message.detections:
+            # Boxes propagated between detector runs are drawn thinner in amber
+            color = (0, 200, 255) if detection.predicted else (100, 255, 0)
+            thickness = 1 if detection.predicted else 2
+            if stale:
+                color, thickness = (160, 160, 160), 1
+            x1, y1, x2, y2 = detection.bbox
+            x1, x2 = int(x1 * sx), int(x2 * sx)
+            y1, y2 = int(y1 * sy), int(y2 * sy)
+            cv2.rectangle(frame, (x1, y1), (x2, y2), color, thickness)
+            cv2.circle(frame, ((x1 + x2) // 2, (y1 + y2) // 2), 6, (255, 0, 255), -1)
+
+            label = f"{detection.class_name}: {detection.confidence:.2f}"
+            if detection.track_id is not None:
+                label += f" (ID: {detection.track_id})"
+            if detection.gps is not None:
+                label += f" | ({detection.gps[0]:.6f}, {detection.gps[1]:.6f})"
+            cv2.putText(
+                frame,
+                label,
+                (x1, max(y1 - 10, 12)),
+                cv2.FONT_HERSHEY_SIMPLEX,
+                0.5,
+                color,
+                1,
+                cv2.LINE_AA,
+            )
+        return frame
+
     @Slot(np.ndarray)
     def update_frame(self, frame):
         """Update camera frame display"""
@@ -0,0 +1,170 @@
+import logging
+import threading
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("frame-ring")
+
+
+@dataclass(frozen=True)
+class SlotRef:
+    """Picklable address of a ring slot, lets another process map the frame"""
+
+    shm_name: str
+    index: int
+    shape: Tuple[int, ...]
+    dtype: str
+
+
+class FrameBuffer:
+    """Reference counted view into one slot of a FrameRing"""
+
+    __slots__ = ("ring", "index", "array")
+
+    def __init__(self, ring: Optional["FrameRing"], index: int, array: np.ndarray):
+        self.ring = ring
+        self.index = index
+        self.array = array
+
+    @classmethod
+    def detached(cls, array: np.ndarray) -> "FrameBuffer":
+        """Wrap a plain array that does not belong to any ring"""
+        return cls(None, -1, array)
+
+    def retain(self) -> "FrameBuffer":
+        """Take an extra reference for another pipeline stage"""
+        if self.ring is not None:
+            self.ring._retain(self.index)
+        return self
+
+    def release(self):
+        """Drop one reference, the slot is recycled once all stages released it"""
+        if self.ring is not None:
+            self.ring._release(self.index)
+
+    def ref(self) -> Optional[SlotRef]:
+        """Shared memory address of the slot, None for a detached buffer"""
+        if self.ring is None:
+            return None
+        return SlotRef(self.ring.name, self.index, self.ring.shape, self.ring.dtype.str)
+
+
+class FrameRing:
+    """Preallocated ring of frame buffers backed by a single shared memory block
+
+    Capture writes straight into a slot, and the same memory is then used for
+    inference, annotation and encoding. A slot only becomes writable again
+    once every stage holding it has called release().
+    """
+
+    def __init__(self, shape: Tuple[int, ...], slots: int = 8, dtype=np.uint8):
+        self.shape = tuple(shape)
+        self.slots = slots
+        self.dtype = np.dtype(dtype)
+
+        slot_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.shm = shared_memory.SharedMemory(create=True, size=slot_bytes * slots)
+        self.block = np.ndarray(
+            (slots, *self.shape), dtype=self.dtype, buffer=self.shm.buf
+        )
+
+        self.lock = threading.Lock()
+        self.refcounts: List[int] = [0] * slots
+        self.next_slot = 0
+
+        # Stats
+        self.acquired = 0
+        self.misses = 0
+
+        logger.info(
+            "Frame ring allocated: %d slots of %s (%.1f MB)",
+            slots,
+            self.shape,
+            slot_bytes * slots / 1e6,
+        )
+
+    @property
+    def name(self) -> str:
+        """Shared memory name, other processes can attach to the block with it"""
+        return self.shm.name
+
+    def acquire(self) -> Optional[FrameBuffer]:
+        """Get a free slot with a single reference, None if every slot is in use"""
+        with self.lock:
+            for i in range(self.slots):
+                index = (self.next_slot + i) % self.slots
+                if self.refcounts[index] == 0:
+                    self.refcounts[index] = 1
+                    self.next_slot = (index + 1) % self.slots
+                    self.acquired += 1
+                    return FrameBuffer(self, index, self.block[index])
+            self.misses += 1
+            return None
+
+    def _retain(self, index: int):
+        with self.lock:
+            if self.refcounts[index] <= 0:
+                raise RuntimeError(f"Retaining free frame slot {index}")
+            self.refcounts[index] += 1
+
+    def _release(self, index: int):
+        with self.lock:
+            if self.refcounts[index] <= 0:
+                logger.warning("Frame slot %d released more often than retained", index)
+                return
+            self.refcounts[index] -= 1
+
+    def get_stats(self) -> dict:
+        with self.lock:
+            return {
+                "slots": self.slots,
+                "in_use": sum(1 for count in self.refcounts if count > 0),
+                "acquired": self.acquired,
+                "misses": self.misses,
+            }
+
+    def close(self):
+        """Free the shared memory block"""
+        self.block = None
+        try:
+            self.shm.close()
+        except BufferError:
+            # Some stage still holds a view, the mapping goes away with it
+            logger.warning("Frame ring closed while buffers are still referenced")
+        finally:
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class RingAttachment:
+    """Maps slots of FrameRings owned by another process, one mapping per block"""
+
+    def __init__(self):
+        self.blocks: Dict[str, shared_memory.SharedMemory] = {}
+
+    def view(self, ref: SlotRef) -> np.ndarray:
+        """Writable array over the slot, shares memory with the owning process"""
+        shm = self.blocks.get(ref.shm_name)
+        if shm is None:
+            shm = shared_memory.SharedMemory(name=ref.shm_name)
+            self.blocks[ref.shm_name] = shm
+
+        dtype = np.dtype(ref.dtype)
+        slot_bytes = int(np.prod(ref.shape)) * dtype.itemsize
+        return np.ndarray(
+            ref.shape, dtype=dtype, buffer=shm.buf, offset=ref.index * slot_bytes
+        )
+
+    def close(self):
+        """Unmap the blocks, the owner stays responsible for unlinking them"""
+        for shm in self.blocks.values():
+            try:
+                shm.close()
+            except BufferError:
+                logger.warning("Frame ring mapping closed while still referenced")
+        self.blocks.clear()
@@ -0,0 +1,172 @@
+import logging
+import traceback
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.controls.detection import yolo
+from src.mq.frame_ring import RingAttachment, SlotRef
+
+logger = logging.getLogger("inference-worker")
+
+
+@dataclass
+class InferenceTask:
+    """One frame for a worker process, the pixels stay in the shared frame ring"""
+
+    seq: int
+    camera: str
+    slot: Optional[SlotRef]
+    frame: Optional[np.ndarray]  # only for frames outside the ring
+    drone_position: Tuple[float, float, float]
+    drone_attitude: Tuple[float, float, float]
+    ground_level: float
+    mode: str
+    annotate: bool
+    geolocate: bool = True
+    # Scheduler overrides, None keeps the worker's defaults
+    object_classes: Optional[List[str]] = None
+    tiled: Optional[bool] = None
+    propagate: bool = True
+
+
+@dataclass
+class InferenceResult:
+    """Detections of one frame, annotations are drawn into the ring slot"""
+
+    seq: int
+    camera: str
+    worker_id: int
+    detections: Dict[str, yolo.Detection] = field(default_factory=dict)
+    gps_coordinates: Dict[str, Tuple[float, float]] = field(default_factory=dict)
+    pixel_coordinates: Dict[str, Tuple[int, int]] = field(default_factory=dict)
+    frame: Optional[np.ndarray] = None  # annotated copy for frames outside the ring
+    error: Optional[str] = None
+    # Sent ahead of the result while the worker builds an undistortion table,
+    # the parent keeps the frame out of its result timeout
+    warming_up: bool = False
+
+
+def run_worker(
+    worker_id: int,
+    camera_kwargs: Dict[str, dict],
+    object_classes: List[str],
+    tasks,
+    results,
+):
+    """Worker process entry point, owns its own model and trackers
+
+    camera_kwargs holds the YoloObjectTracker arguments of each camera, the
+    cameras' trackers share one loaded model. Reads InferenceTasks until it
+    gets None and answers each with an InferenceResult carrying the same
+    camera and seq.
+    """
+    logging.basicConfig(
+        level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+    )
+    trackers: Dict[str, yolo.YoloObjectTracker] = {}
+    for camera, tracker_kwargs in camera_kwargs.items():
+        if trackers:
+            backend = next(iter(trackers.values())).backend
+            tracker_kwargs = {**tracker_kwargs, "backend": backend}
+        trackers[camera] = yolo.YoloObjectTracker(**tracker_kwargs)
+    attachment = RingAttachment()
+    logger.info("Inference worker %d ready", worker_id)
+
+    try:
+        while True:
+            task = tasks.get()
+            if task is None:
+                break
+            try:
+                tracker = trackers[task.camera]
+                if task.geolocate:
+                    _warm_up(worker_id, tracker, task, results)
+                result = _process(worker_id, tracker, attachment, object_classes, task)
+                results.put(result)
+            except Exception:
+                results.put(
+                    InferenceResult(
+                        seq=task.seq,
+                        camera=task.camera,
+                        worker_id=worker_id,
+                        error=traceback.format_exc(),
+                    )
+                )
+    except KeyboardInterrupt:
+        pass
+    finally:
+        attachment.close()
+        logger.info("Inference worker %d stopped", worker_id)
+
+
+def _warm_up(
+    worker_id: int, tracker: yolo.YoloObjectTracker, task: InferenceTask, results
+):
+    """Build the camera's undistortion table before its first geolocated frame
+
+    That takes about a second, longer than the parent's result timeout, so
+    the parent is told first to wait for this frame.
+    """
+    shape = task.frame.shape if task.slot is None else task.slot.shape
+    image_size = (shape[1], shape[0])
+    if not tracker.geometry.needs_lut(image_size):
+        return
+    results.put(
+        InferenceResult(
+            seq=task.seq, camera=task.camera, worker_id=worker_id, warming_up=True
+        )
+    )
+    tracker.geometry.use_lut(image_size)
+
+
+def _process(
+    worker_id: int,
+    tracker: yolo.YoloObjectTracker,
+    attachment: RingAttachment,
+    object_classes: List[str],
+    task: InferenceTask,
+) -> InferenceResult:
+    frame = task.frame if task.slot is None else attachment.view(task.slot)
+    object_classes = task.object_classes or object_classes
+
+    if task.propagate:
+        detections = tracker.track(
+            frame, object_classes=object_classes, tiled=task.tiled
+        )
+    else:
+        detections = tracker.detect(
+            frame, object_classes=object_classes, tiled=task.tiled
+        )
+    gps_coords, pixel_coords = {}, {}
+    if task.geolocate:
+        gps_coords, pixel_coords = tracker.geolocate_detections(
+            detections,
+            drone_gps=task.drone_position,
+            drone_attitude=task.drone_attitude,
+            ground_level_masl=task.ground_level,
+            image_size=frame.shape[1::-1],
+        )
+
+    if task.annotate:
+        # Drawn in place, for ring slots the parent sees it without a copy
+        tracker.draw_detections(frame, detections)
+        tracker.write_on_frame(
+            frame=frame,
+            curr_gps=task.drone_position,
+            gps_coords=gps_coords,
+            pixel_coords=pixel_coords,
+            mode=task.mode,
+            object_classes=object_classes,
+        )
+
+    return InferenceResult(
+        seq=task.seq,
+        camera=task.camera,
+        worker_id=worker_id,
+        detections=detections,
+        gps_coordinates=gps_coords,
+        pixel_coordinates=pixel_coords,
+        frame=frame if task.slot is None and task.annotate else None,
+    )
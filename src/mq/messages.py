@@ -1,4 +1,8 @@
+import math
+import struct
+from dataclasses import dataclass, field
 from enum import Enum
+from typing import List, Optional, Tuple
 
 
 class Message:
@@ -10,6 +14,166 @@ class GPS_Pose(Message):
     long: int
 
 
+@dataclass
+class FrameMeta(Message):
+    """Envelope part of video messages, sent as [topic, codec, meta, payload]"""
+
+    STRUCT = struct.Struct("<QQd")
+
+    seq: int  # capture sequence number
+    stream_seq: int  # per-topic counter, gaps are frames lost on the way
+    timestamp: float  # capture time, seconds since the epoch
+
+    def pack(self) -> bytes:
+        return self.STRUCT.pack(self.seq, self.stream_seq, self.timestamp)
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "FrameMeta":
+        return cls(*cls.STRUCT.unpack(data))
+
+
+@dataclass
+class TargetDetection(Message):
+    """One detected object in a DetectionsMessage"""
+
+    class_name: str
+    class_id: int
+    confidence: float
+    bbox: Tuple[int, int, int, int]  # (x1, y1, x2, y2) in capture pixels
+    track_id: Optional[int] = None
+    gps: Optional[Tuple[float, float]] = None  # estimated (lat, lon)
+    predicted: bool = False  # propagated by the tracker, not detected
+
+    # flags
+    HAS_GPS = 0x01
+    PREDICTED = 0x02
+
+
+@dataclass
+class DetectionsMessage(Message):
+    """Compact binary detections topic, lets the GCS draw overlays on the raw stream
+
+    Layout (little endian):
+        header: version u8, seq u64, timestamp f64, frame w/h u16,
+                drone lat/lon/alt f64, roll/pitch/yaw f32, count u8
+        detection: class id u16, confidence f32, track id i64 (-1 = none),
+                   x1/y1/x2/y2 i32, lat/lon f64 (NaN = none), flags u8,
+                   name length u8, utf-8 name
+
+    Boxes are sent as they are, partly outside the frame included.
+    """
+
+    VERSION = 2
+    HEADER = struct.Struct("<BQdHHdddfffB")
+    DETECTION = struct.Struct("<HfqiiiiddBB")
+
+    seq: int
+    timestamp: float
+    frame_size: Tuple[int, int]  # (width, height) the boxes refer to
+    drone_position: Tuple[float, float, float]
+    drone_attitude: Tuple[float, float, float]
+    detections: List[TargetDetection] = field(default_factory=list)
+
+    def pack(self) -> bytes:
+        parts = [
+            self.HEADER.pack(
+                self.VERSION,
+                self.seq,
+                self.timestamp,
+                *self.frame_size,
+                *self.drone_position,
+                *self.drone_attitude,
+                len(self.detections),
+            )
+        ]
+        for detection in self.detections:
+            name = detection.class_name.encode()[:255]
+            flags = 0
+            lat, lon = math.nan, math.nan
+            if detection.gps is not None:
+                flags |= TargetDetection.HAS_GPS
+                lat, lon = detection.gps
+            if detection.predicted:
+                flags |= TargetDetection.PREDICTED
+            parts.append(
+                self.DETECTION.pack(
+                    detection.class_id,
+                    detection.confidence,
+                    -1 if detection.track_id is None else detection.track_id,
+                    *(int(v) for v in detection.bbox),
+                    lat,
+                    lon,
+                    flags,
+                    len(name),
+                )
+            )
+            parts.append(name)
+        return b"".join(parts)
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "DetectionsMessage":
+        (
+            version,
+            seq,
+            timestamp,
+            width,
+            height,
+            lat,
+            lon,
+            alt,
+            roll,
+            pitch,
+            yaw,
+            count,
+        ) = cls.HEADER.unpack_from(data)
+        if version != cls.VERSION:
+            raise ValueError(f"Unsupported detections message version {version}")
+
+        offset = cls.HEADER.size
+        detections = []
+        for _ in range(count):
+            (
+                class_id,
+                confidence,
+                track_id,
+                x1,
+                y1,
+                x2,
+                y2,
+                target_lat,
+                target_lon,
+                flags,
+                name_length,
+            ) = cls.DETECTION.unpack_from(data, offset)
+            offset += cls.DETECTION.size
+            name = data[offset : offset + name_length].decode()
+            offset += name_length
+            detections.append(
+                TargetDetection(
+                    class_name=name,
+                    class_id=class_id,
+                    confidence=confidence,
+                    bbox=(x1, y1, x2, y2),
+                    track_id=None if track_id < 0 else track_id,
+                    gps=(
+                        (target_lat, target_lon)
+                        if flags & TargetDetection.HAS_GPS
+                        else None
+                    ),
+                    predicted=bool(flags & TargetDetection.PREDICTED),
+                )
+            )
+
+        return cls(
+            seq=seq,
+            timestamp=timestamp,
+            frame_size=(width, height),
+            drone_position=(lat, lon, alt),
+            drone_attitude=(roll, pitch, yaw),
+            detections=detections,
+        )
+
+
 class ZMQTopics(Enum):
     """Enum for ZMQ topics"""
 
@@ -22,6 +186,8 @@ class ZMQTopics(Enum):
     PROCESSED_VIDEO = 7
     HELIPAD_GPS = 8
     TANK_GPS = 9
+    REQUEST_KEYFRAME = 10
+    CLIENT_STATS = 11
 
 
 class VincFuncs:
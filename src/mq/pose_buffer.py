@@ -0,0 +1,200 @@
+import logging
+import threading
+import time
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger("pose-buffer")
+
+# (lat, lon, alt_amsl), (roll, pitch, yaw), ground_level
+Pose = Tuple[Tuple[float, float, float], Tuple[float, float, float], float]
+
+
+class TimedRing:
+    """Fixed-size ring of timestamped sample rows, oldest overwritten first
+
+    Timestamps only increase, so the ring is two sorted runs and a lookup is
+    a binary search in one of them.
+    """
+
+    def __init__(self, capacity: int, width: int):
+        self.times = np.zeros(capacity)
+        self.values = np.zeros((capacity, width))
+        self.capacity = capacity
+        self.head = 0  # next slot to write
+        self.count = 0
+
+    def clear(self):
+        self.head = 0
+        self.count = 0
+
+    @property
+    def newest(self) -> Optional[float]:
+        if self.count == 0:
+            return None
+        return float(self.times[(self.head - 1) % self.capacity])
+
+    def append(self, timestamp: float, values: Sequence[float]) -> bool:
+        """Store a sample, False for one that is not newer than the last"""
+        newest = self.newest
+        if newest is not None and timestamp <= newest:
+            return False
+        self.times[self.head] = timestamp
+        self.values[self.head] = values
+        self.head = (self.head + 1) % self.capacity
+        self.count = min(self.count + 1, self.capacity)
+        return True
+
+    def _bracket(self, timestamp: float) -> Tuple[int, int]:
+        """Slots of the samples at or before and after `timestamp`"""
+        if self.count < self.capacity or timestamp >= self.times[0]:
+            # Newer run [0, head), or the only run while the ring fills up
+            start, stop = 0, self.head if self.head else self.capacity
+        else:
+            start, stop = self.head, self.capacity
+        after = start + int(
+            np.searchsorted(self.times[start:stop], timestamp, side="right")
+        )
+        before = (after - 1) % self.capacity
+        return before, after % self.capacity
+
+    def interpolate(
+        self, timestamp: float, max_gap: float, angles: Sequence[int] = ()
+    ) -> Optional[np.ndarray]:
+        """Sample row at `timestamp`, linear between neighbours
+
+        Columns in `angles` are interpolated along the shorter arc. Beyond the
+        ends the first or last row is held, None when the nearest sample is
+        more than `max_gap` away or the ring is empty.
+        """
+        if self.count == 0:
+            return None
+        first = self.head if self.count == self.capacity else 0
+        last = (self.head - 1) % self.capacity
+        if timestamp <= self.times[first] or timestamp >= self.times[last]:
+            index = first if timestamp <= self.times[first] else last
+            if abs(timestamp - self.times[index]) > max_gap:
+                return None
+            return self.values[index].copy()
+
+        before, after = self._bracket(timestamp)
+        t0, t1 = self.times[before], self.times[after]
+        if min(timestamp - t0, t1 - timestamp) > max_gap:
+            return None
+        weight = (timestamp - t0) / (t1 - t0)
+        delta = self.values[after] - self.values[before]
+        for column in angles:
+            delta[column] = (delta[column] + np.pi) % (2 * np.pi) - np.pi
+        return self.values[before] + weight * delta
+
+
+class PoseBuffer:
+    """Recent drone poses on the autopilot's clock, looked up at capture times
+
+    GLOBAL_POSITION_INT and ATTITUDE samples are stored by their time_boot_ms.
+    Local capture timestamps are mapped onto that clock with the smallest
+    receive-time offset seen, slowly relaxed upwards to follow drift between
+    the clocks. That offset includes the fastest telemetry delivery, so
+    lookups land that much early, a few ms over serial. Position and attitude
+    are interpolated separately, yaw across the 0/2pi wrap.
+    """
+
+    # Upward relaxation of the clock offset per sample, follows clock drift
+    OFFSET_RELAXATION = 0.002
+    # A time_boot_ms this far behind the newest sample means a reboot
+    REBOOT_JUMP_S = 1.0
+
+    def __init__(self, capacity: int = 256, max_gap: float = 0.5):
+        self.max_gap = max_gap
+        # lat, lon, alt_amsl, ground_level
+        self.positions = TimedRing(capacity, 4)
+        # roll, pitch, yaw
+        self.attitudes = TimedRing(capacity, 3)
+        self.lock = threading.Lock()
+        # Local time minus autopilot boot time, None until the first sample
+        self.clock_offset: Optional[float] = None
+
+        # Stats
+        self.lookups = 0
+        self.misses = 0
+        self.resets = 0
+
+    def _add(
+        self,
+        ring: TimedRing,
+        time_boot_ms: int,
+        values: Sequence[float],
+        received: Optional[float],
+    ):
+        boot_time = time_boot_ms / 1000.0
+        offset = (time.time() if received is None else received) - boot_time
+        with self.lock:
+            newest = [r.newest for r in (self.positions, self.attitudes) if r.count]
+            if newest and boot_time < max(newest) - self.REBOOT_JUMP_S:
+                logger.warning("Autopilot clock went backwards, clearing poses")
+                self.positions.clear()
+                self.attitudes.clear()
+                self.clock_offset = None
+                self.resets += 1
+
+            if self.clock_offset is None or offset < self.clock_offset:
+                self.clock_offset = offset
+            else:
+                drift = offset - self.clock_offset
+                self.clock_offset += drift * self.OFFSET_RELAXATION
+            ring.append(boot_time, values)
+
+    def add_position(
+        self,
+        time_boot_ms: int,
+        position: Tuple[float, float, float],
+        ground_level: float,
+        received: Optional[float] = None,
+    ):
+        """Store a (lat, lon, alt_amsl) fix received at local time `received`"""
+        self._add(self.positions, time_boot_ms, (*position, ground_level), received)
+
+    def add_attitude(
+        self,
+        time_boot_ms: int,
+        attitude: Tuple[float, float, float],
+        received: Optional[float] = None,
+    ):
+        """Store a (roll, pitch, yaw) sample received at local time `received`"""
+        self._add(self.attitudes, time_boot_ms, attitude, received)
+
+    def lookup(self, timestamp: float) -> Optional[Pose]:
+        """Pose at a local `time.time()` timestamp
+
+        None when either series has no sample within max_gap of the time.
+        """
+        with self.lock:
+            self.lookups += 1
+            if self.clock_offset is None:
+                self.misses += 1
+                return None
+            boot_time = timestamp - self.clock_offset
+            position = self.positions.interpolate(boot_time, self.max_gap)
+            attitude = self.attitudes.interpolate(
+                boot_time, self.max_gap, angles=(0, 1, 2)
+            )
+            if position is None or attitude is None:
+                self.misses += 1
+                return None
+
+        # Keep yaw in [0, 2pi) like MAVLinkProxy.fetch_drone_data()
+        roll, pitch, yaw = (float(v) for v in attitude)
+        lat, lon, alt, ground_level = (float(v) for v in position)
+        return (lat, lon, alt), (roll, pitch, yaw % (2 * np.pi)), ground_level
+
+    def get_stats(self) -> Dict[str, float]:
+        with self.lock:
+            return {
+                "positions": self.positions.count,
+                "attitudes": self.attitudes.count,
+                "clock_offset": self.clock_offset,
+                "lookups": self.lookups,
+                "misses": self.misses,
+                "resets": self.resets,
+            }
@@ -0,0 +1,130 @@
+import collections
+import logging
+import threading
+import time
+from typing import Any, Callable, Deque, Optional, Tuple
+
+logger = logging.getLogger("stage-queue")
+
+
+class StageQueue:
+    """Bounded FIFO between two pipeline stages with backpressure metrics
+
+    A full queue either blocks the producer (backpressure) or, with
+    `drop_oldest`, evicts the oldest item so consumers always see fresh data.
+    Evicted and drained items are handed to `on_drop`, e.g. to release their
+    frame buffer.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        maxsize: int,
+        drop_oldest: bool = False,
+        on_drop: Optional[Callable[[Any], None]] = None,
+    ):
+        self.name = name
+        self.maxsize = maxsize
+        self.drop_oldest = drop_oldest
+        self.on_drop = on_drop
+
+        self.items: Deque[Tuple[Any, float]] = collections.deque()
+        self.condition = threading.Condition()
+        self.closed = False
+
+        # Stats since the last get_stats(reset=True)
+        self.puts = 0
+        self.drops = 0
+        self.max_depth = 0
+        self.queue_wait = 0.0  # total time items spent queued
+        self.blocked = 0.0  # total time producers waited for space
+
+    def put(self, item: Any, timeout: Optional[float] = None) -> bool:
+        """Add an item, blocking up to `timeout` for space unless dropping oldest
+
+        Returns False if the item was not queued, the caller keeps ownership of
+        it then. Only evicted older items are passed to on_drop.
+        """
+        evicted = None
+        with self.condition:
+            if not self.drop_oldest and len(self.items) >= self.maxsize:
+                start = time.monotonic()
+                self.condition.wait_for(
+                    lambda: len(self.items) < self.maxsize or self.closed, timeout
+                )
+                self.blocked += time.monotonic() - start
+            if self.closed:
+                return False
+            if len(self.items) >= self.maxsize:
+                self.drops += 1
+                if not self.drop_oldest:
+                    return False
+                evicted, _ = self.items.popleft()
+
+            self.items.append((item, time.monotonic()))
+            self.puts += 1
+            self.max_depth = max(self.max_depth, len(self.items))
+            self.condition.notify_all()
+
+        if evicted is not None and self.on_drop is not None:
+            self.on_drop(evicted)
+        return True
+
+    def put_nowait(self, item: Any) -> bool:
+        """Add an item without blocking, a full queue counts as a drop"""
+        return self.put(item, timeout=0)
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Any]:
+        """Oldest item, None on timeout or once closed and empty"""
+        with self.condition:
+            if not self.condition.wait_for(
+                lambda: self.items or self.closed, timeout
+            ):
+                return None
+            if not self.items:
+                return None
+            item, queued_at = self.items.popleft()
+            self.queue_wait += time.monotonic() - queued_at
+            self.condition.notify_all()
+            return item
+
+    def get_nowait(self) -> Optional[Any]:
+        return self.get(timeout=0)
+
+    def __len__(self) -> int:
+        with self.condition:
+            return len(self.items)
+
+    def close(self):
+        """Wake up every waiting producer and consumer"""
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def drain(self):
+        """Remove every queued item, passing each to on_drop"""
+        with self.condition:
+            items = [item for item, _ in self.items]
+            self.items.clear()
+            self.condition.notify_all()
+        if self.on_drop is not None:
+            for item in items:
+                self.on_drop(item)
+
+    def get_stats(self, reset: bool = False) -> dict:
+        with self.condition:
+            dequeued = max(self.puts - len(self.items), 1)
+            stats = {
+                "depth": len(self.items),
+                "max_depth": self.max_depth,
+                "drops": self.drops,
+                "wait_ms": round(self.queue_wait / dequeued * 1000, 2),
+                "blocked_ms": round(self.blocked * 1000, 1),
+            }
+            if reset:
+                self.puts = len(self.items)
+                self.drops = 0
+                self.max_depth = len(self.items)
+                self.queue_wait = 0.0
+                self.blocked = 0.0
+            return stats
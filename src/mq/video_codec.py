@@ -0,0 +1,122 @@
+import fractions
+import logging
+from typing import List, Optional
+
+import numpy as np
+
+try:
+    import av
+except ImportError:  # PyAV is only needed for the inter-frame transports
+    av = None
+
+logger = logging.getLogger("video-codec")
+
+# Transport modes for the video topics, "jpeg" is one image per message
+TRANSPORTS = ("jpeg", "h264", "vp8")
+
+_ENCODERS = {"h264": "libx264", "vp8": "libvpx"}
+_DECODERS = {"h264": "h264", "vp8": "vp8"}
+
+
+def _require_av():
+    if av is None:
+        raise RuntimeError(
+            "PyAV is required for h264/vp8 video transport, install it with `pip install av`"
+        )
+
+
+def _intra_picture_type():
+    """PictureType.I on recent PyAV, the plain string on older releases"""
+    picture_type = getattr(av.video.frame, "PictureType", None)
+    return picture_type.I if picture_type is not None else "I"
+
+
+class VideoEncoder:
+    """Stateful software H.264/VP8 encoder for a single video topic"""
+
+    def __init__(
+        self,
+        codec: str = "h264",
+        fps: int = 30,
+        gop_size: int = 60,
+        bit_rate: Optional[int] = None,
+    ):
+        _require_av()
+        if codec not in _ENCODERS:
+            raise ValueError(f"Unsupported codec '{codec}', use one of {list(_ENCODERS)}")
+
+        self.codec = codec
+        self.fps = fps
+        self.gop_size = gop_size
+        self.bit_rate = bit_rate
+
+        self.context = None
+        self.frame_size = None
+        self.pts = 0
+        self.force_keyframe = True
+
+    def _open(self, width: int, height: int):
+        context = av.CodecContext.create(_ENCODERS[self.codec], "w")
+        context.width = width
+        context.height = height
+        context.pix_fmt = "yuv420p"
+        context.time_base = fractions.Fraction(1, self.fps)
+        context.framerate = self.fps
+        context.gop_size = self.gop_size
+        context.max_b_frames = 0  # B-frames add a frame of latency
+        if self.bit_rate:
+            context.bit_rate = self.bit_rate
+        if self.codec == "h264":
+            context.options = {"preset": "ultrafast", "tune": "zerolatency"}
+        else:
+            context.options = {"deadline": "realtime", "cpu-used": "8", "lag-in-frames": "0"}
+
+        self.context = context
+        self.frame_size = (width, height)
+        self.force_keyframe = True
+        logger.info("Opened %s encoder at %dx%d", self.codec, width, height)
+
+    def request_keyframe(self):
+        """Make the next encoded frame a keyframe, e.g. when a client subscribes"""
+        self.force_keyframe = True
+
+    def encode(self, frame: np.ndarray) -> List[bytes]:
+        """Encode a BGR frame, returns zero or more compressed packets"""
+        height, width = frame.shape[:2]
+        if self.context is None or self.frame_size != (width, height):
+            self._open(width, height)
+
+        video_frame = av.VideoFrame.from_ndarray(frame, format="bgr24")
+        video_frame.pts = self.pts
+        self.pts += 1
+        if self.force_keyframe:
+            video_frame.pict_type = _intra_picture_type()
+            self.force_keyframe = False
+
+        return [bytes(packet) for packet in self.context.encode(video_frame)]
+
+
+class VideoDecoder:
+    """Decoder matching VideoEncoder, drops packets until it sees a keyframe"""
+
+    def __init__(self, codec: str = "h264"):
+        _require_av()
+        if codec not in _DECODERS:
+            raise ValueError(f"Unsupported codec '{codec}', use one of {list(_DECODERS)}")
+        self.codec = codec
+        self.context = av.CodecContext.create(_DECODERS[codec], "r")
+        self.synced = False
+
+    def decode(self, payload: bytes) -> List[np.ndarray]:
+        """Decode one packet into BGR frames"""
+        try:
+            frames = self.context.decode(av.Packet(payload))
+        except av.error.InvalidDataError:
+            if self.synced:
+                logger.warning("Failed to decode %s packet", self.codec)
+            # Before the first keyframe the decoder has no reference picture
+            return []
+
+        if frames:
+            self.synced = True
+        return [frame.to_ndarray(format="bgr24") for frame in frames]
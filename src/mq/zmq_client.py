@@ -1,4 +1,5 @@
 import logging
+import threading
 import time
 
 import cv2
@@ -10,37 +11,70 @@ from PySide6.QtGui import QImage, QPixmap
 # Usage example in a PySide6 application:
 from PySide6.QtWidgets import QApplication, QLabel, QMainWindow
 
+from src.mq.messages import DetectionsMessage, FrameMeta, ZMQTopics
+from src.mq.video_codec import VideoDecoder
+
 logger = logging.getLogger(__name__)
 
 
 class ZMQVideoThread(QThread):
     """QThread for receiving ZMQ video frames"""
 
+    # Seconds between keyframe requests while inter-frame streams lose packets
+    KEYFRAME_REQUEST_INTERVAL = 1.0
+
     # Signals for communicating with the main thread
     frame_received = Signal(np.ndarray)  # Raw video frame
+    frame_meta_received = Signal(np.ndarray, object)  # Raw frame, FrameMeta or None
     processed_frame_received = Signal(np.ndarray)  # Processed frame
+    detections_received = Signal(object)  # DetectionsMessage
     fps_updated = Signal(float)  # FPS information
+    topic_fps_updated = Signal(dict)  # Receive FPS per topic
+    stream_stats_updated = Signal(dict)  # Latency and dropped frames per topic
+    keyframe_requested = Signal()  # An inter-frame stream lost packets
     error_occurred = Signal(str)  # Error messages
 
-    def __init__(self, server_ip="localhost", video_port=5555, parent=None):
+    def __init__(
+        self,
+        server_ip="localhost",
+        video_port=5555,
+        topics=("video", "processed_video"),
+        live=True,
+        parent=None,
+    ):
         super().__init__(parent)
         self.server_ip = server_ip
         self.video_port = video_port
         self.running = False
 
+        # Live mode: small receive queue and only the newest frame per topic
+        # is shown, so the display never lags behind catching up
+        self.live = live
+        self.stream_stats = {}
+
+        # The server only encodes topics that have subscribers
+        self.topics = set(topics)
+        self.pending_topics = None
+        self.topics_lock = threading.Lock()
+
         # ZMQ setup
         self.context = None
         self.video_socket = None
 
+        # Inter-frame decoders, one per (topic, codec) stream
+        self.decoders = {}
+        self.last_keyframe_request = 0.0
+
     def setup_zmq(self):
         """Initialize ZMQ connection"""
         try:
             self.context = zmq.Context()
             self.video_socket = self.context.socket(zmq.SUB)
+            if self.live:
+                self.video_socket.setsockopt(zmq.RCVHWM, 2)
             self.video_socket.connect(f"tcp://{self.server_ip}:{self.video_port}")
-            self.video_socket.setsockopt_string(
-                zmq.SUBSCRIBE, ""
-            )  # Subscribe to all topics
+            for topic in self.topics:
+                self.video_socket.setsockopt_string(zmq.SUBSCRIBE, topic)
             logger.info(
                 f"Connected to video stream at {self.server_ip}:{self.video_port}"
             )
@@ -56,37 +90,59 @@ class ZMQVideoThread(QThread):
 
             fps_count = 0
             fps_timer = time.time()
+            stats_timer = time.time()
+            topic_counts = {}
 
             logger.info("Video receiver thread started")
 
             while self.running:
                 try:
+                    self._apply_pending_topics()
+
                     # Poll with timeout to make loop interruptible
                     if self.video_socket.poll(timeout=100) != 0:  # 100ms timeout
-                        # Receive frame data
-                        topic, frame_data = self.video_socket.recv_multipart()
+                        for topic, codec, meta, frame_data in self._receive_latest():
+                            if topic == b"detections":
+                                self.detections_received.emit(
+                                    DetectionsMessage.unpack(frame_data)
+                                )
+                                continue
+
+                            frame = self._decode_frame(topic, codec, frame_data)
+                            if frame is None:
+                                continue
+                            topic_counts[topic] = topic_counts.get(topic, 0) + 1
+                            fps_count += 1
+                            if meta is not None:
+                                self._record_latency(topic, meta)
 
-                        # Decode frame
-                        jpg_buffer = np.frombuffer(frame_data, dtype=np.uint8)
-                        frame = cv2.imdecode(jpg_buffer, cv2.IMREAD_COLOR)
-
-                        if frame is not None:
                             # Emit appropriate signal based on topic
                             if topic == b"processed_video":
                                 self.processed_frame_received.emit(frame)
                             elif topic == b"video":
                                 self.frame_received.emit(frame)
+                                self.frame_meta_received.emit(frame, meta)
                             else:
                                 logger.warning(f"Unknown topic received: {topic}")
 
-                        # FPS calculation
-                        fps_count += 1
-                        curr_time = time.time()
-                        if curr_time - fps_timer > 10:  # Update FPS every 10 seconds
-                            fps = fps_count / 10
-                            self.fps_updated.emit(fps)
-                            fps_count = 0
-                            fps_timer = curr_time
+                    curr_time = time.time()
+                    if curr_time - stats_timer > 1:
+                        self.stream_stats_updated.emit(self._take_stream_stats())
+                        stats_timer = curr_time
+
+                    # FPS calculation
+                    if curr_time - fps_timer > 10:  # Update FPS every 10 seconds
+                        fps = fps_count / 10
+                        self.fps_updated.emit(fps)
+                        self.topic_fps_updated.emit(
+                            {
+                                topic.decode(): count / 10
+                                for topic, count in topic_counts.items()
+                            }
+                        )
+                        fps_count = 0
+                        fps_timer = curr_time
+                        topic_counts = {}
 
                 except zmq.ZMQError as e:
                     if self.running:  # Only log if we're still supposed to be running
@@ -103,6 +159,135 @@ class ZMQVideoThread(QThread):
             self.cleanup_zmq()
             logger.info("Video receiver thread stopped")
 
+    def _receive_latest(self):
+        """Receive queued messages as (topic, codec, meta, payload) tuples
+
+        Messages are [topic, codec, meta, payload], [topic, codec, payload] or a
+        plain [topic, jpeg] from older servers. In live mode everything queued
+        is drained and only the newest JPEG/detections message per topic is
+        kept. Inter-frame packets can not be skipped, they all reach the
+        decoder and the newest decoded frame wins.
+        """
+        messages = [self.video_socket.recv_multipart()]
+        if self.live:
+            while len(messages) < 100:
+                try:
+                    messages.append(self.video_socket.recv_multipart(zmq.NOBLOCK))
+                except zmq.Again:
+                    break
+
+        parsed = []
+        for parts in messages:
+            topic, payload = parts[0], parts[-1]
+            codec = parts[1] if len(parts) > 2 else b"jpeg"
+            meta = FrameMeta.unpack(parts[2]) if len(parts) > 3 else None
+            if meta is not None:
+                self._record_sequence(topic, codec, meta)
+            parsed.append((topic, codec, meta, payload))
+
+        if not self.live:
+            return parsed
+
+        latest = {}
+        for message in parsed:
+            topic, codec = message[0], message[1]
+            if codec in (b"jpeg", b"detections") and topic in latest:
+                # Superseded before it was shown
+                self._topic_stats(topic)["dropped"] += 1
+            latest[topic] = message
+        return [
+            message
+            for message in parsed
+            if message[1] not in (b"jpeg", b"detections")
+            or latest[message[0]] is message
+        ]
+
+    def _topic_stats(self, topic: bytes) -> dict:
+        stats = self.stream_stats.get(topic)
+        if stats is None:
+            stats = {"stream_seq": None, "dropped": 0, "latency": 0.0, "frames": 0}
+            self.stream_stats[topic] = stats
+        return stats
+
+    def _record_sequence(self, topic: bytes, codec: bytes, meta: FrameMeta):
+        """Gaps in the per-topic stream counter are frames lost before arrival"""
+        stats = self._topic_stats(topic)
+        previous = stats["stream_seq"]
+        if previous is not None and meta.stream_seq > previous + 1:
+            stats["dropped"] += meta.stream_seq - previous - 1
+            if codec not in (b"jpeg", b"detections"):
+                self._resync(topic, codec)
+        if previous is None or meta.stream_seq > previous:
+            stats["stream_seq"] = meta.stream_seq
+
+    def _record_latency(self, topic: bytes, meta: FrameMeta):
+        """Capture to display latency, assumes drone and GCS clocks are synced"""
+        stats = self._topic_stats(topic)
+        stats["latency"] += time.time() - meta.timestamp
+        stats["frames"] += 1
+
+    def _resync(self, topic: bytes, codec: bytes):
+        """Restart an inter-frame stream that lost packets at its next keyframe
+
+        Decoding on from a gap shows a corrupted picture until the next GOP,
+        so the decoder is dropped and a keyframe requested, rate limited.
+        """
+        self.decoders.pop((topic, codec), None)
+        now = time.time()
+        if now - self.last_keyframe_request >= self.KEYFRAME_REQUEST_INTERVAL:
+            self.last_keyframe_request = now
+            self.keyframe_requested.emit()
+
+    def _take_stream_stats(self) -> dict:
+        """Per-topic latency and dropped frames since the last call"""
+        report = {}
+        for topic, stats in self.stream_stats.items():
+            frames = stats["frames"]
+            report[topic.decode()] = {
+                "latency_ms": stats["latency"] / frames * 1000 if frames else None,
+                "dropped": stats["dropped"],
+            }
+            stats.update(dropped=0, latency=0.0, frames=0)
+        return report
+
+    def set_topics(self, topics):
+        """Change the subscribed video topics, applied by the receiver thread"""
+        with self.topics_lock:
+            self.pending_topics = set(topics)
+
+    def _apply_pending_topics(self):
+        """(Un)subscribe from the receiver thread, ZMQ sockets are not thread safe"""
+        with self.topics_lock:
+            pending, self.pending_topics = self.pending_topics, None
+        if pending is None or self.video_socket is None:
+            return
+
+        for topic in self.topics - pending:
+            self.video_socket.setsockopt_string(zmq.UNSUBSCRIBE, topic)
+            # An inter-frame stream has to resync at a keyframe after a gap
+            for key in [key for key in self.decoders if key[0] == topic.encode()]:
+                del self.decoders[key]
+            self.stream_stats.pop(topic.encode(), None)
+        for topic in pending - self.topics:
+            self.video_socket.setsockopt_string(zmq.SUBSCRIBE, topic)
+        self.topics = pending
+        logger.info(f"Subscribed video topics: {sorted(self.topics)}")
+
+    def _decode_frame(self, topic: bytes, codec: bytes, payload: bytes):
+        """Decode a video payload, None while an inter-frame stream is not synced"""
+        if codec == b"jpeg":
+            jpg_buffer = np.frombuffer(payload, dtype=np.uint8)
+            return cv2.imdecode(jpg_buffer, cv2.IMREAD_COLOR)
+
+        key = (topic, codec)
+        decoder = self.decoders.get(key)
+        if decoder is None:
+            decoder = VideoDecoder(codec.decode())
+            self.decoders[key] = decoder
+
+        frames = decoder.decode(payload)
+        return frames[-1] if frames else None
+
     def stop(self):
         """Stop the video receiving thread"""
         self.running = False
@@ -126,7 +311,9 @@ class ZMQClient:
         # Video thread
         self.video_thread = ZMQVideoThread(server_ip, video_port)
 
-        # Control socket setup
+        # Control socket setup, shared by the GUI and the video thread's stats
+        # reports so access is serialized
+        self.control_lock = threading.Lock()
         self.context = zmq.Context()
         self.control_socket = self.context.socket(zmq.REQ)
         self.control_socket.connect(f"tcp://{server_ip}:{control_port}")
@@ -142,6 +329,8 @@ class ZMQClient:
             self._on_processed_frame_received
         )
         self.video_thread.fps_updated.connect(self._on_fps_updated)
+        self.video_thread.topic_fps_updated.connect(self._on_topic_fps_updated)
+        self.video_thread.keyframe_requested.connect(self._on_keyframe_requested)
         self.video_thread.error_occurred.connect(self._on_error)
 
         logger.info(f"ZMQ Video Client initialized for {server_ip}")
@@ -158,6 +347,17 @@ class ZMQClient:
         """Handle FPS updates"""
         logger.info(f"Video FPS: {fps:.2f}")
 
+    def _on_topic_fps_updated(self, topic_fps):
+        """Report receive FPS so the server can adapt the stream quality"""
+        if not topic_fps:
+            return
+        stats = ";".join(f"{topic}={fps:.2f}" for topic, fps in topic_fps.items())
+        self.send_command(f"{ZMQTopics.CLIENT_STATS.name} {stats}")
+
+    def _on_keyframe_requested(self):
+        """Resync inter-frame streams after lost packets"""
+        self.send_command(ZMQTopics.REQUEST_KEYFRAME)
+
     def _on_error(self, error_msg):
         """Handle errors from video thread"""
         logger.error(f"Video thread error: {error_msg}")
@@ -167,6 +367,8 @@ class ZMQClient:
         if not self.video_thread.isRunning():
             self.video_thread.start()
             logger.info("Video client started")
+            # H.264/VP8 streams can only be joined at a keyframe
+            self.send_command(ZMQTopics.REQUEST_KEYFRAME)
 
     def stop(self):
         """Stop video reception and cleanup"""
@@ -188,10 +390,11 @@ class ZMQClient:
             return None
         try:
             logger.info(f"Sending command: {command}")
-            self.control_socket.send_string(
-                command.name if hasattr(command, "name") else str(command)
-            )
-            response = self.control_socket.recv_string()
+            with self.control_lock:
+                self.control_socket.send_string(
+                    command.name if hasattr(command, "name") else str(command)
+                )
+                response = self.control_socket.recv_string()
             logger.info(f"Received response: {response}")
             return response
         except zmq.ZMQError as e:
@@ -2,26 +2,43 @@
 import argparse
 import asyncio
 import logging
+import multiprocessing
 import queue
 import socket
 import threading
 import time
 import traceback
 from concurrent.futures import ThreadPoolExecutor
-from dataclasses import dataclass
-from typing import Any, Dict, Optional, Tuple
+from dataclasses import dataclass, field, replace
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
 import cv2
 import numpy as np
 import zmq
 import zmq.asyncio
+from pymavlink import mavutil
 
 from src.controls.detection import yolo
+from src.controls.detection.backends import BACKENDS
+from src.controls.gps.dem import ElevationModel
+from src.controls.gps.filter_bank import TargetFilterBank
 from src.controls.mavlink import ardupilot, gz, mission_types
-from src.mq.messages import ZMQTopics
+from src.mq import inference_worker
+from src.mq.frame_ring import FrameBuffer, FrameRing
+from src.mq.messages import (
+    DetectionsMessage,
+    FrameMeta,
+    TargetDetection,
+    ZMQTopics,
+)
+from src.mq.pose_buffer import PoseBuffer
+from src.mq.stage_queue import StageQueue
+from src.mq.video_codec import TRANSPORTS, VideoEncoder
 
-IMAGE_QUALITY = 50  # JPEG quality for video frames
-CPU_BURNOUT = 0.03  # CPU burn rate for async tasks, adjust as needed
+IMAGE_QUALITY = 50  # Initial JPEG quality for video frames
+TARGET_BITRATE = 4_000_000  # Default per-topic bitrate target, bits/s
+DEFAULT_FPS = 30.0  # Video loop rate when the camera does not report one
+DEFAULT_CAMERA = "main"  # Name of the camera of a single camera setup
 
 
 # Configure logging
@@ -34,6 +51,40 @@ logging.basicConfig(
 logger = logging.getLogger("zmq-server")
 logger.setLevel(logging.DEBUG)  # Ensure logger level is set
 
+@dataclass
+class CameraConfig:
+    """One capture source with its intrinsics and published topics
+
+    The first camera publishes on the plain video, processed_video and
+    detections topics, every other camera prefixes them with its name, e.g.
+    forward_video, processed_forward_video and forward_detections.
+    """
+
+    name: str = DEFAULT_CAMERA
+    source: Any = 0  # device index or path, the UDP port in simulation
+    K: Optional[np.ndarray] = None  # looked up in the config when None
+    distortion: Optional[np.ndarray] = None  # looked up together with K
+    # Seconds from exposure to the capture timestamp, the drone pose is
+    # looked up at the exposure time
+    latency: float = 0.0
+    # The ground intersection assumes a camera looking along the body z axis,
+    # off-nadir cameras only publish detections
+    geolocate: bool = True
+    topic_prefix: str = ""
+
+    @property
+    def video_topic(self) -> bytes:
+        return f"{self.topic_prefix}video".encode()
+
+    @property
+    def processed_topic(self) -> bytes:
+        return f"processed_{self.topic_prefix}video".encode()
+
+    @property
+    def detections_topic(self) -> bytes:
+        return f"{self.topic_prefix}detections".encode()
+
+
 @dataclass
 class FrameData:
     """Data structure for frame processing"""
@@ -44,6 +95,174 @@ class FrameData:
     drone_position: Tuple[float, float, float]
     drone_attitude: Any
     ground_level: float
+    seq: int = 0  # capture sequence number
+    buffer: Optional[FrameBuffer] = None  # ring slot backing `frame`, if any
+    annotate: bool = True  # draw the annotated frame for the processed stream
+    camera: str = DEFAULT_CAMERA
+    geolocate: bool = True  # estimate target GPS from this camera's frames
+    # Inference plan of the scheduler, None keeps the processor's defaults
+    object_classes: Optional[List[str]] = None
+    tiled: Optional[bool] = None
+    propagate: bool = True  # allow optical flow instead of a detector run
+    quality: float = 1.0  # weight from the frame quality gate
+
+
+@dataclass
+class CapturedFrame:
+    """Frame grabbed by the capture thread"""
+
+    buffer: FrameBuffer
+    seq: int
+    timestamp: float
+
+    @property
+    def frame(self) -> np.ndarray:
+        return self.buffer.array
+
+
+class CaptureThread:
+    """Dedicated thread that owns the video capture and keeps only the latest frame"""
+
+    def __init__(self, cap, ring_slots: int = 8):
+        self.cap = cap
+        self.running = False
+        self.stopped = False
+        self.thread = None
+        self.lock = threading.Lock()
+
+        # Allocated lazily once the first frame tells us the resolution
+        self.ring: Optional[FrameRing] = None
+        self.ring_slots = ring_slots
+
+        # Single "latest frame" slot, older unread frames are overwritten
+        self.latest: Optional[CapturedFrame] = None
+        self.seq = 0
+        self.consumed_seq = 0
+
+        # Stats
+        self.frames_dropped = 0
+        self.read_failures = 0
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._new_frame: Optional[asyncio.Event] = None
+
+    def start(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._new_frame = asyncio.Event()
+        self.running = True
+        self.thread = threading.Thread(target=self._capture_loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop capturing and release the capture, later calls do nothing
+
+        Joins the capture thread, call it off the event loop.
+        """
+        with self.lock:
+            if self.stopped:
+                return
+            self.stopped = True
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=2.0)
+        if self.cap:
+            self.cap.release()
+        with self.lock:
+            if self.latest is not None and self.latest.seq > self.consumed_seq:
+                self.latest.buffer.release()
+            self.latest = None
+        if self.ring:
+            self.ring.close()
+            self.ring = None
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self.lock:
+            stats = {
+                "captured": self.seq,
+                "consumed": self.consumed_seq,
+                "dropped": self.frames_dropped,
+                "read_failures": self.read_failures,
+            }
+        if self.ring:
+            stats["ring"] = self.ring.get_stats()
+        return stats
+
+    def _read_frame(self) -> Optional[FrameBuffer]:
+        """Read the next frame into a free ring slot"""
+        buffer = self.ring.acquire() if self.ring else None
+        if buffer is None:
+            # No ring yet, or every slot is still held by a pipeline stage
+            ret, frame = self.cap.read()
+            if not ret:
+                return None
+            if self.ring is None:
+                self.ring = FrameRing(frame.shape, slots=self.ring_slots)
+            return FrameBuffer.detached(frame)
+
+        ret, frame = self.cap.read(buffer.array)
+        if not ret:
+            buffer.release()
+            return None
+        if frame is not buffer.array:
+            # The backend reallocated the output, e.g. on a resolution change
+            buffer.release()
+            return FrameBuffer.detached(frame)
+        return buffer
+
+    def _capture_loop(self):
+        """Blocking reads happen here, never on the event loop"""
+        while self.running:
+            try:
+                buffer = self._read_frame()
+            except Exception as e:
+                logger.error("Error reading from video capture: %s", e)
+                buffer = None
+
+            if buffer is None:
+                with self.lock:
+                    self.read_failures += 1
+                logger.warning("Failed to capture frame")
+                time.sleep(0.1)
+                continue
+
+            timestamp = time.time()
+            with self.lock:
+                self.seq += 1
+                if self.latest is not None and self.latest.seq > self.consumed_seq:
+                    # Nobody picked the previous frame up, recycle its slot
+                    self.latest.buffer.release()
+                    self.frames_dropped += 1
+                self.latest = CapturedFrame(
+                    buffer=buffer, seq=self.seq, timestamp=timestamp
+                )
+
+            try:
+                self._loop.call_soon_threadsafe(self._new_frame.set)
+            except RuntimeError:
+                # Event loop is closed, nobody is waiting for frames anymore
+                break
+
+    async def next_frame(self, timeout: float = 1.0) -> Optional[CapturedFrame]:
+        """Wait for a frame newer than the last consumed one, None on timeout"""
+        deadline = time.monotonic() + timeout
+        while self.running:
+            with self.lock:
+                captured = self.latest
+                if captured is not None and captured.seq > self.consumed_seq:
+                    self.consumed_seq = captured.seq
+                    return captured
+            # set() is scheduled on the loop thread as well, so clearing here
+            # can not lose a notification for a frame published after the check
+            self._new_frame.clear()
+
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            try:
+                await asyncio.wait_for(self._new_frame.wait(), remaining)
+            except asyncio.TimeoutError:
+                return None
+        return None
 
 
 @dataclass
@@ -54,114 +273,1002 @@ class ProcessedResult:
     gps_coordinates: Dict[str, Tuple[float, float]]
     pixel_coordinates: Dict[str, Tuple[int, int]]
     timestamp: float
+    buffer: Optional[FrameBuffer] = None  # ring slot backing `processed_frame`
+    seq: int = 0
+    detections: Dict[str, yolo.Detection] = field(default_factory=dict)
+    drone_position: Tuple[float, float, float] = (0.0, 0.0, 0.0)
+    drone_attitude: Tuple[float, float, float] = (0.0, 0.0, 0.0)
+    annotated: bool = True  # False when processed_frame is the plain capture
+    quality: float = 1.0  # frame quality weight, see FrameQualityGate
+    camera: str = DEFAULT_CAMERA
+
+    def release(self):
+        if self.buffer is not None:
+            self.buffer.release()
+            self.buffer = None
+
+    def detections_message(self) -> DetectionsMessage:
+        """Compact metadata of this result for the detections topic"""
+        height, width = self.processed_frame.shape[:2]
+        return DetectionsMessage(
+            seq=self.seq,
+            timestamp=self.timestamp,
+            frame_size=(width, height),
+            drone_position=tuple(self.drone_position),
+            drone_attitude=tuple(self.drone_attitude),
+            detections=[
+                TargetDetection(
+                    class_name=class_name,
+                    class_id=detection.class_id,
+                    confidence=detection.confidence,
+                    bbox=detection.bbox,
+                    track_id=(
+                        None if detection.track_id is None else int(detection.track_id)
+                    ),
+                    gps=self.gps_coordinates.get(class_name),
+                    predicted=detection.predicted,
+                )
+                for class_name, detection in self.detections.items()
+            ],
+        )
 
 
 class AsyncFrameProcessor:
-    """Asynchronous frame processor that doesn't block the main video loop"""
+    """Asynchronous frame processor that doesn't block the main video loop
+
+    Frames flow through three threads connected by bounded StageQueues:
+    preprocess (detector cadence, window planning and letterboxing), infer
+    (the model forward pass) and postprocess (decoding, optical flow
+    propagation in frame order, tracking, geolocation and annotation). Letterboxing frame N+1 overlaps inference on
+    frame N and annotation of frame N-1. A slow stage blocks the one before
+    it, so backpressure ends at the input queue where frames are rejected.
+
+    Every camera has its own tracker, all sharing one model. The infer stage
+    takes up to one waiting frame per camera and runs them in one model call.
+    """
 
-    def __init__(self, tracker: yolo.YoloObjectTracker, object_classes, max_workers=2):
-        self.tracker = tracker
+    def __init__(
+        self,
+        trackers: Dict[str, yolo.YoloObjectTracker],
+        object_classes,
+        queue_depth: int = 2,
+    ):
+        self.trackers = trackers
         self.object_classes = object_classes
-        self.executor = ThreadPoolExecutor(max_workers=max_workers)
-        self.processing_queue = queue.Queue(
-            maxsize=3
-        )  # Small buffer to prevent memory issues
-        self.results_queue = queue.Queue(maxsize=10)
+
+        release = self._release_item
+        self.input_queue = StageQueue(
+            "input", maxsize=3 * len(trackers), on_drop=release
+        )
+        self.infer_queue = StageQueue(
+            "infer", maxsize=queue_depth * len(trackers), on_drop=release
+        )
+        self.postprocess_queue = StageQueue(
+            "postprocess", maxsize=queue_depth * len(trackers), on_drop=release
+        )
+        # The publisher of each camera only wants its newest result, a deeper
+        # queue would hand it stale results and hold ring slots for them
+        self.results_queues = {
+            camera: StageQueue(
+                f"results_{camera}", maxsize=1, drop_oldest=True, on_drop=release
+            )
+            for camera in trackers
+        }
+        self.queues = [
+            self.input_queue,
+            self.infer_queue,
+            self.postprocess_queue,
+            *self.results_queues.values(),
+        ]
+
+        self.stage_timings = StageTimings()
         self.running = False
-        self.worker_thread = None
+        self.threads: List[threading.Thread] = []
 
     def start(self):
         self.running = True
-        self.worker_thread = threading.Thread(target=self._worker_loop, daemon=True)
-        self.worker_thread.start()
+        stages = [
+            ("preprocess", self.input_queue, self.infer_queue.put, self._preprocess, 1),
+            (
+                "infer",
+                self.infer_queue,
+                self.postprocess_queue.put,
+                self._infer,
+                len(self.trackers),
+            ),
+            (
+                "postprocess",
+                self.postprocess_queue,
+                self._put_result,
+                self._postprocess,
+                1,
+            ),
+        ]
+        for name, source, sink, work, max_batch in stages:
+            thread = threading.Thread(
+                target=self._stage_loop,
+                args=(name, source, sink, work, max_batch),
+                name=f"frame-{name}",
+                daemon=True,
+            )
+            thread.start()
+            self.threads.append(thread)
 
     def stop(self):
         self.running = False
-        if self.worker_thread:
-            self.worker_thread.join(timeout=2.0)
-        self.executor.shutdown(wait=True)
+        for stage_queue in self.queues:
+            stage_queue.close()
+        for thread in self.threads:
+            thread.join(timeout=2.0)
+
+        # Hand ring slots of anything still queued back to the capture thread
+        for stage_queue in self.queues:
+            stage_queue.drain()
 
     def submit_frame(self, frame_data: FrameData) -> bool:
         """Submit a frame for processing. Returns False if queue is full."""
+        if self.input_queue.put_nowait(frame_data):
+            return True
+        logger.warning("Processing queue is full, dropping frame")
+        return False
+
+    def get_result(self, camera: str = DEFAULT_CAMERA) -> Optional[ProcessedResult]:
+        """Get the latest processed result of a camera, non-blocking."""
+        return self.results_queues[camera].get_nowait()
+
+    def get_stats(self, reset: bool = True) -> Dict[str, Any]:
+        """Queue depth, wait and drop counters plus per-stage durations"""
+        stats: Dict[str, Any] = {
+            stage_queue.name: stage_queue.get_stats(reset)
+            for stage_queue in self.queues
+        }
+        stats["stages"] = self.stage_timings.summary(reset)
+        return stats
+
+    def _stage_loop(
+        self,
+        name: str,
+        source: StageQueue,
+        sink: Callable[[Any], bool],
+        work: Callable[[List[Any]], List[Any]],
+        max_batch: int = 1,
+    ):
+        """Runs one pipeline stage until the processor stops
+
+        `work` maps a list of items to a list of outputs, it gets the next
+        item plus up to max_batch - 1 more that are already waiting.
+        """
+        while self.running:
+            item = source.get(timeout=0.1)
+            if item is None:
+                continue
+            items = [item]
+            while len(items) < max_batch:
+                waiting = source.get_nowait()
+                if waiting is None:
+                    break
+                items.append(waiting)
+
+            start = time.perf_counter()
+            try:
+                outputs = work(items)
+            except Exception:
+                logger.warning("Frame %s failed: %s", name, traceback.format_exc())
+                for item in items:
+                    self._release_item(item)
+                continue
+            self.stage_timings.record(name, time.perf_counter() - start)
+
+            # Blocks while the next stage is busy, only fails once stopped
+            for output in outputs:
+                if not sink(output):
+                    self._release_item(output)
+
+    def _put_result(self, result: ProcessedResult) -> bool:
+        return self.results_queues[result.camera].put(result)
+
+    @staticmethod
+    def _release_item(item):
+        """Recycle the ring slot of a frame at any point in the pipeline"""
+        if isinstance(item, tuple):
+            item = item[0]
+        if isinstance(item, ProcessedResult):
+            item.release()
+        elif item.buffer is not None:
+            item.buffer.release()
+
+    def _preprocess(
+        self, frames: List[FrameData]
+    ) -> List[Tuple[FrameData, yolo.DetectionJob]]:
+        items = []
+        for frame_data in frames:
+            job = self.trackers[frame_data.camera].prepare_detection(
+                frame_data.frame,
+                object_classes=frame_data.object_classes or self.object_classes,
+                propagate=frame_data.propagate,
+                tiled=frame_data.tiled,
+            )
+            items.append((frame_data, job))
+        return items
+
+    def _infer(
+        self, items: List[Tuple[FrameData, yolo.DetectionJob]]
+    ) -> List[Tuple[FrameData, yolo.DetectionJob]]:
+        # The trackers share one backend, any of them can run the whole batch
+        tracker = self.trackers[items[0][0].camera]
+        tracker.run_detections([job for _, job in items])
+        return items
+
+    def _postprocess(
+        self, items: List[Tuple[FrameData, yolo.DetectionJob]]
+    ) -> List[ProcessedResult]:
+        return [self._finish(frame_data, job) for frame_data, job in items]
+
+    def _finish(self, frame_data: FrameData, job: yolo.DetectionJob) -> ProcessedResult:
+        """Finish detection and annotate in place on the captured buffer"""
+        tracker = self.trackers[frame_data.camera]
+        detections = tracker.finish_detection(job)
+        gps_coords, pixel_coords = {}, {}
+        if frame_data.geolocate:
+            gps_coords, pixel_coords = tracker.geolocate_detections(
+                detections,
+                drone_gps=frame_data.drone_position,
+                drone_attitude=frame_data.drone_attitude,
+                ground_level_masl=frame_data.ground_level,
+                image_size=frame_data.frame.shape[1::-1],
+            )
+
+        processed_frame = frame_data.frame
+        if frame_data.annotate:
+            # Only needed when somebody watches the annotated stream, the
+            # detections topic carries the same information
+            try:
+                tracker.draw_detections(processed_frame, detections)
+                processed_frame = tracker.write_on_frame(
+                    frame=processed_frame,
+                    curr_gps=frame_data.drone_position,
+                    gps_coords=gps_coords,
+                    pixel_coords=pixel_coords,
+                    mode=frame_data.mode,
+                    object_classes=job.object_classes,
+                )
+            except Exception:
+                logger.error(
+                    "Error writing on frame in _postprocess: %s",
+                    traceback.format_exc(),
+                )
+                processed_frame = frame_data.frame
+
+        # Ownership of the ring slot moves on to the result
+        return ProcessedResult(
+            processed_frame=processed_frame,
+            gps_coordinates=gps_coords,
+            pixel_coordinates=pixel_coords,
+            timestamp=frame_data.timestamp,
+            buffer=frame_data.buffer,
+            seq=frame_data.seq,
+            detections=detections,
+            drone_position=frame_data.drone_position,
+            drone_attitude=frame_data.drone_attitude,
+            annotated=frame_data.annotate,
+            quality=frame_data.quality,
+            camera=frame_data.camera,
+        )
+
+
+class ProcessFrameProcessor:
+    """Frame processor running inference in worker processes
+
+    Every worker owns its own YoloObjectTracker, so detection, tracking,
+    drawing and geolocation run outside this process' GIL. Frames are passed
+    as slots of the capture FrameRing and annotated in place, only the
+    detections travel through the result queue. Results are handed out in
+    frame sequence order per camera. A worker about to build a camera's
+    undistortion table says so first, that frame then gets WARM_UP_S longer
+    and the frames queued behind it restart their timeout.
+
+    Note that each worker keeps its own SORT state, with several workers a
+    target's track ID is only stable within one worker's share of frames.
+    Workers hold a tracker per camera sharing one model, but run one frame
+    per inference call.
+    """
+
+    # Extra result time of a frame the worker builds a lookup table for
+    WARM_UP_S = 10.0
+
+    def __init__(
+        self,
+        camera_kwargs: Dict[str, dict],
+        object_classes,
+        workers: int = 2,
+        result_timeout: float = 0.5,
+    ):
+        self.object_classes = object_classes
+        self.result_timeout = result_timeout
+
+        context = multiprocessing.get_context("spawn")
+        self.tasks = context.Queue(maxsize=workers + 1)
+        self.worker_results = context.Queue()
+        self.processes = [
+            context.Process(
+                target=inference_worker.run_worker,
+                args=(
+                    i,
+                    camera_kwargs,
+                    object_classes,
+                    self.tasks,
+                    self.worker_results,
+                ),
+                name=f"inference-{i}",
+                daemon=True,
+            )
+            for i in range(workers)
+        ]
+
+        # (camera, seq) -> (frame, submit time) of frames owned by a worker
+        self.lock = threading.Lock()
+        self.in_flight: Dict[Tuple[str, int], Tuple[FrameData, float]] = {}
+        self.completed: Dict[Tuple[str, int], inference_worker.InferenceResult] = {}
+        # Timed out frames, their slots are recycled once the worker answers
+        self.abandoned: Dict[Tuple[str, int], FrameData] = {}
+        # Frames a worker builds an undistortion table for, they get WARM_UP_S
+        # on top of the timeout
+        self.warming: Set[Tuple[str, int]] = set()
+
+        # Only the newest result per camera, older ones are released
+        self.results_queues = {
+            camera: queue.Queue(maxsize=1) for camera in camera_kwargs
+        }
+        self.running = False
+        self.collector_thread = None
+
+    def start(self):
+        self.running = True
+        for process in self.processes:
+            process.start()
+        self.collector_thread = threading.Thread(
+            target=self._collector_loop, daemon=True
+        )
+        self.collector_thread.start()
+
+    def stop(self):
+        self.running = False
+        for _ in self.processes:
+            try:
+                self.tasks.put(None, timeout=0.5)
+            except queue.Full:
+                break
+        for process in self.processes:
+            process.join(timeout=2.0)
+            if process.is_alive():
+                process.terminate()
+        if self.collector_thread:
+            self.collector_thread.join(timeout=2.0)
+
+        # Workers are gone, every slot they held can be recycled
+        with self.lock:
+            pending = [frame for frame, _ in self.in_flight.values()]
+            pending += list(self.abandoned.values())
+            self.in_flight.clear()
+            self.completed.clear()
+            self.abandoned.clear()
+            self.warming.clear()
+        for frame_data in pending:
+            if frame_data.buffer is not None:
+                frame_data.buffer.release()
+        for results_queue in self.results_queues.values():
+            while not results_queue.empty():
+                results_queue.get_nowait().release()
+
+        self.tasks.cancel_join_thread()
+        self.worker_results.cancel_join_thread()
+
+    def submit_frame(self, frame_data: FrameData) -> bool:
+        """Submit a frame for processing. Returns False if every worker is busy."""
+        slot = frame_data.buffer.ref() if frame_data.buffer is not None else None
+        task = inference_worker.InferenceTask(
+            seq=frame_data.seq,
+            camera=frame_data.camera,
+            slot=slot,
+            frame=frame_data.frame if slot is None else None,
+            drone_position=tuple(frame_data.drone_position),
+            drone_attitude=tuple(frame_data.drone_attitude),
+            ground_level=frame_data.ground_level,
+            mode=frame_data.mode,
+            annotate=frame_data.annotate,
+            geolocate=frame_data.geolocate,
+            object_classes=frame_data.object_classes,
+            tiled=frame_data.tiled,
+            propagate=frame_data.propagate,
+        )
+
+        key = (frame_data.camera, frame_data.seq)
+        with self.lock:
+            self.in_flight[key] = (frame_data, time.monotonic())
         try:
-            self.processing_queue.put_nowait(frame_data)
+            self.tasks.put_nowait(task)
             return True
         except queue.Full:
-            logger.warning("Processing queue is full, dropping oldest frame")
+            with self.lock:
+                del self.in_flight[key]
+            logger.warning("Inference workers are busy, dropping frame")
             return False
 
-    def get_result(self) -> Optional[ProcessedResult]:
-        """Get the latest processed result, non-blocking."""
+    def get_result(self, camera: str = DEFAULT_CAMERA) -> Optional[ProcessedResult]:
+        """Get the newest in-order result of a camera, non-blocking."""
         try:
-            return self.results_queue.get_nowait()
+            return self.results_queues[camera].get_nowait()
         except queue.Empty:
             return None
 
-    def _worker_loop(self):
-        """Worker thread that processes frames asynchronously"""
+    def get_stats(self, reset: bool = True) -> Dict[str, Any]:
+        with self.lock:
+            return {
+                "in_flight": len(self.in_flight),
+                "abandoned": len(self.abandoned),
+                "results": {
+                    camera: results_queue.qsize()
+                    for camera, results_queue in self.results_queues.items()
+                },
+            }
+
+    def _collector_loop(self):
+        """Collects worker results and releases them in sequence order"""
         while self.running:
             try:
-                # Get frame data with timeout
-                frame_data = self.processing_queue.get(timeout=0.1)
-
-                # Process in thread pool to avoid blocking
-                future = self.executor.submit(self._process_frame, frame_data)
+                result = self.worker_results.get(timeout=0.1)
+            except queue.Empty:
+                result = None
+            except (EOFError, OSError):
+                break
+
+            late = None
+            with self.lock:
+                if result is not None:
+                    key = (result.camera, result.seq)
+                    if result.warming_up:
+                        if key in self.in_flight:
+                            self.warming.add(key)
+                    elif key in self.abandoned:
+                        late = self.abandoned.pop(key)
+                    elif key in self.in_flight:
+                        self.completed[key] = result
+                        if key in self.warming:
+                            self._restart_timeouts(time.monotonic())
+                ready = self._pop_ready(time.monotonic())
+
+            if late is not None and late.buffer is not None:
+                late.buffer.release()
+            for frame_data, worker_result in ready:
+                self._publish(frame_data, worker_result)
+
+    def _restart_timeouts(self, now: float):
+        """Frames queued behind a worker's warm-up wait from now on"""
+        for key, (frame_data, submitted) in self.in_flight.items():
+            self.in_flight[key] = (frame_data, max(submitted, now))
+
+    def _pop_ready(self, now: float):
+        """Completed frames at the head of each camera's sequence
+
+        Timed out frames are skipped so they do not hold back newer ones.
+        """
+        ready = []
+        waiting = set()  # cameras whose oldest frame is still being processed
+        for key in sorted(self.in_flight):
+            camera, seq = key
+            if camera in waiting:
+                continue
+            frame_data, submitted = self.in_flight[key]
+            if key in self.completed:
+                del self.in_flight[key]
+                self.warming.discard(key)
+                ready.append((frame_data, self.completed.pop(key)))
+            elif now - submitted > self.result_timeout + (
+                self.WARM_UP_S if key in self.warming else 0.0
+            ):
+                # The worker may still be writing into the slot, so it is only
+                # released on its answer
+                logger.warning("Frame %d of %s timed out, dropping result", seq, camera)
+                del self.in_flight[key]
+                self.warming.discard(key)
+                self.abandoned[key] = frame_data
+            else:
+                waiting.add(camera)
+        return ready
 
-                # Wait for result with timeout
-                try:
-                    result = future.result(timeout=0.5)  # 500ms timeout for processing
-
-                    # Put result in results queue, drop oldest if full
-                    try:
-                        self.results_queue.put_nowait(result)
-                    except queue.Full:
-                        # Drop oldest result
-                        try:
-                            self.results_queue.get_nowait()
-                            self.results_queue.put_nowait(result)
-                        except queue.Empty:
-                          continue
+    def _publish(
+        self, frame_data: FrameData, worker_result: inference_worker.InferenceResult
+    ):
+        if worker_result.error is not None:
+            logger.warning("Frame processing failed: %s", worker_result.error)
+            if frame_data.buffer is not None:
+                frame_data.buffer.release()
+            return
 
-                except Exception as e:
-                    logger.warning("Frame processing failed: %s", e)
+        processed_frame = frame_data.frame
+        if worker_result.frame is not None:
+            processed_frame = worker_result.frame  # annotated copy of a detached frame
 
+        # Ownership of the ring slot moves on to the result
+        result = ProcessedResult(
+            processed_frame=processed_frame,
+            gps_coordinates=worker_result.gps_coordinates,
+            pixel_coordinates=worker_result.pixel_coordinates,
+            timestamp=frame_data.timestamp,
+            buffer=frame_data.buffer,
+            seq=frame_data.seq,
+            detections=worker_result.detections,
+            drone_position=frame_data.drone_position,
+            drone_attitude=frame_data.drone_attitude,
+            annotated=frame_data.annotate,
+            quality=frame_data.quality,
+            camera=frame_data.camera,
+        )
+        results_queue = self.results_queues[result.camera]
+        try:
+            results_queue.put_nowait(result)
+        except queue.Full:
+            # Drop oldest result
+            try:
+                results_queue.get_nowait().release()
             except queue.Empty:
-                continue
-            except Exception as e:
-                logger.error("Error in frame processor worker: %s", e)
-                time.sleep(0.1)
+                pass
+            results_queue.put_nowait(result)
 
-    def _process_frame(self, frame_data: FrameData) -> ProcessedResult:
-        """Process a single frame"""
-        processed_frame, gps_coords, pixel_coords = self.tracker.process_frame(
-            frame=frame_data.frame,
-            drone_gps=frame_data.drone_position,
-            drone_attitude=frame_data.drone_attitude,
-            ground_level_masl=frame_data.ground_level,
-            object_classes=self.object_classes,
+
+@dataclass
+class StreamSettings:
+    """Encoding settings chosen by the adaptive controller for one topic"""
+
+    quality: int = IMAGE_QUALITY  # JPEG quality
+    scale: float = 1.0  # output resolution relative to the capture
+    max_fps: float = 30.0
+
+
+class AdaptiveStreamController:
+    """Closed-loop quality, resolution and frame rate control for one video topic
+
+    Every `interval` seconds the published bitrate and the receive FPS
+    reported by the client are compared against the targets. Congestion steps quality down first, then resolution, then frame
+    rate; headroom restores them in the reverse order.
+    """
+
+    QUALITY_RANGE = (20, 90)
+    SCALE_RANGE = (0.25, 1.0)
+    FPS_RANGE = (5.0, 30.0)
+
+    def __init__(
+        self,
+        target_bitrate: float = TARGET_BITRATE,
+        max_fps: float = 30.0,
+        interval: float = 1.0,
+    ):
+        self.target_bitrate = target_bitrate
+        self.interval = interval
+        self.settings = StreamSettings(max_fps=max_fps)
+        self.fps_range = (self.FPS_RANGE[0], max_fps)
+
+        # Measurements for the current window
+        self.window_start = time.time()
+        self.bytes_sent = 0
+        self.frames_sent = 0
+        self.client_fps: Optional[float] = None
+        self.client_fps_time = 0.0
+
+        self.last_sent = 0.0
+        self.bitrate = 0.0
+
+    def should_send(self, now: float) -> bool:
+        """Frame rate limiter, call once per candidate frame"""
+        # 10% slack so capture jitter does not halve a rate matching the camera
+        if now - self.last_sent < 0.9 / self.settings.max_fps:
+            return False
+        self.last_sent = now
+        return True
+
+    def record_sent(self, nbytes: int):
+        self.bytes_sent += nbytes
+        self.frames_sent += 1
+
+    def record_client_fps(self, fps: float):
+        self.client_fps = fps
+        self.client_fps_time = time.time()
+
+    def update(self, now: float) -> bool:
+        """Re-evaluate the settings at the end of a window, True if they changed"""
+        elapsed = now - self.window_start
+        if elapsed < self.interval:
+            return False
+
+        self.bitrate = self.bytes_sent * 8 / elapsed
+        sent_fps = self.frames_sent / elapsed
+        client_lagging = (
+            self.client_fps is not None
+            and now - self.client_fps_time < 15.0
+            and self.client_fps < 0.8 * sent_fps
+        )
+        congested = self.bitrate > 1.1 * self.target_bitrate or client_lagging
+        headroom = (
+            not congested
+            and self.frames_sent > 0
+            and self.bitrate < 0.7 * self.target_bitrate
         )
 
-        try:
-            processed_frame = self.tracker.write_on_frame(
-                frame=processed_frame,
-                curr_gps=frame_data.drone_position,
-                gps_coords=gps_coords,
-                pixel_coords=pixel_coords,
-                mode=frame_data.mode,
-                object_classes=self.object_classes,
-            )
-        except Exception:
-            logger.error(
-                "Error writing on frame in _process_frame: %s", traceback.format_exc()
+        previous = (self.settings.quality, self.settings.scale, self.settings.max_fps)
+        if congested:
+            self._step_down()
+        elif headroom:
+            self._step_up()
+
+        self.window_start = now
+        self.bytes_sent = 0
+        self.frames_sent = 0
+
+        current = (self.settings.quality, self.settings.scale, self.settings.max_fps)
+        return current != previous
+
+    def _step_down(self):
+        settings = self.settings
+        if settings.quality > self.QUALITY_RANGE[0]:
+            settings.quality = max(self.QUALITY_RANGE[0], settings.quality - 10)
+        elif settings.scale > self.SCALE_RANGE[0]:
+            settings.scale = max(self.SCALE_RANGE[0], settings.scale - 0.25)
+        else:
+            settings.max_fps = max(self.fps_range[0], settings.max_fps * 0.75)
+
+    def _step_up(self):
+        settings = self.settings
+        if settings.max_fps < self.fps_range[1]:
+            settings.max_fps = min(self.fps_range[1], settings.max_fps * 1.25)
+        elif settings.scale < self.SCALE_RANGE[1]:
+            settings.scale = min(self.SCALE_RANGE[1], settings.scale + 0.25)
+        else:
+            settings.quality = min(self.QUALITY_RANGE[1], settings.quality + 5)
+
+
+class FramePacer:
+    """Deadline based pacing for the video loop
+
+    Sleeps only for what is left of the frame budget after the work is done.
+    When an iteration overruns, the schedule restarts from now instead of
+    bursting to catch up, and frames older than `max_frame_age` periods are
+    reported as stale so the loop can skip them.
+    """
+
+    def __init__(self, fps: float = DEFAULT_FPS, max_frame_age: float = 2.0):
+        self.fps = fps
+        self.period = 1.0 / fps
+        self.max_frame_age = max_frame_age * self.period
+        self.next_deadline: Optional[float] = None
+
+        # Stats
+        self.ticks = 0
+        self.missed_deadlines = 0
+        self.stale_frames = 0
+        self.lateness_total = 0.0
+        self.lateness_max = 0.0
+
+    def is_stale(self, capture_timestamp: float) -> bool:
+        if time.time() - capture_timestamp > self.max_frame_age:
+            self.stale_frames += 1
+            return True
+        return False
+
+    async def wait(self):
+        """Sleep until the next frame deadline"""
+        now = time.monotonic()
+        if self.next_deadline is None:
+            self.next_deadline = now + self.period
+            return
+
+        remaining = self.next_deadline - now
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+            # Oversleeping past the deadline is the scheduling jitter
+            lateness = time.monotonic() - self.next_deadline
+            self.next_deadline += self.period
+        else:
+            self.missed_deadlines += 1
+            lateness = -remaining
+            self.next_deadline = now + self.period
+
+        self.ticks += 1
+        self.lateness_total += lateness
+        self.lateness_max = max(self.lateness_max, lateness)
+
+    def get_stats(self, reset: bool = True) -> Dict[str, Any]:
+        jitter = self.lateness_total / self.ticks if self.ticks else 0.0
+        stats = {
+            "target_fps": self.fps,
+            "missed_deadlines": self.missed_deadlines,
+            "stale_frames": self.stale_frames,
+            "jitter_ms": jitter * 1000,
+            "max_lateness_ms": self.lateness_max * 1000,
+        }
+        if reset:
+            self.ticks = 0
+            self.missed_deadlines = 0
+            self.stale_frames = 0
+            self.lateness_total = 0.0
+            self.lateness_max = 0.0
+        return stats
+
+
+class StageTimings:
+    """Accumulates per-stage durations of the video pipeline between reports"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats: Dict[str, List[float]] = {}  # stage -> [count, total, max]
+
+    def record(self, stage: str, seconds: float):
+        with self.lock:
+            entry = self.stats.setdefault(stage, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
+
+    def summary(self, reset: bool = True) -> Dict[str, str]:
+        """Average and worst duration per stage in milliseconds"""
+        with self.lock:
+            summary = {
+                stage: f"avg {total / count * 1e3:.1f} ms, max {worst * 1e3:.1f} ms"
+                for stage, (count, total, worst) in self.stats.items()
+                if count
+            }
+            if reset:
+                self.stats = {}
+        return summary
+
+
+@dataclass
+class FlightState:
+    """Vehicle state the inference scheduler decides on, None when not received"""
+
+    mode: str = "UNKNOWN"
+    armed: Optional[bool] = None
+    relative_alt: Optional[float] = None  # metres above home
+    ground_speed: Optional[float] = None  # m/s
+    climb_rate: Optional[float] = None  # m/s, positive up
+    angular_rate: Optional[float] = None  # rad/s, norm of the body rates
+
+
+@dataclass
+class InferencePlan:
+    """Detection workload of one flight phase"""
+
+    rate: Optional[float]  # detector runs per second, None for every frame, 0 pauses
+    object_classes: Optional[List[str]] = None  # None for every configured class
+    tiled: Optional[bool] = None  # None keeps the tracker's setting
+    propagate: bool = True  # allow optical flow between detector runs
+
+
+class InferenceScheduler:
+    """Picks the detection workload from the flight mode and mission state
+
+    The helipad only matters while approaching or holding over it, so those
+    phases get every frame at native resolution (tiled) without optical flow
+    shortcuts. Disarmed, on the ground or cruising between waypoints the
+    detector is paused or throttled to leave CPU and thermal headroom.
+    Without telemetry the server searches at full rate as before.
+    """
+
+    HOVER_MODES = ("LOITER", "POSHOLD", "BRAKE", "GUIDED")
+    MISSION_MODES = ("AUTO", "GUIDED", "RTL")
+
+    def __init__(
+        self,
+        focus_classes: Optional[List[str]] = None,
+        ground_altitude: float = 1.0,
+        approach_altitude: float = 30.0,
+        hover_speed: float = 1.5,
+        cruise_speed: float = 4.0,
+        hold_time: float = 1.0,
+    ):
+        focus_classes = focus_classes or ["helipad"]
+        self.plans: Dict[str, InferencePlan] = {
+            "disarmed": InferencePlan(rate=0.0),
+            "ground": InferencePlan(rate=0.5),
+            "cruise": InferencePlan(rate=2.0),
+            "search": InferencePlan(rate=None),
+            "stabilise": InferencePlan(rate=None, tiled=True),
+            "approach": InferencePlan(
+                rate=None, object_classes=focus_classes, tiled=True, propagate=False
+            ),
+        }
+        self.ground_altitude = ground_altitude
+        self.approach_altitude = approach_altitude
+        self.hover_speed = hover_speed
+        self.cruise_speed = cruise_speed
+        # A new phase must persist this long before the plan switches
+        self.hold_time = hold_time
+
+        self.phase = "search"
+        self.candidate: Optional[str] = None
+        self.candidate_since = 0.0
+        self.last_run: Dict[str, float] = {}  # camera -> time of its last run
+        self.runs = 0
+        self.skipped = 0
+
+    def classify(self, state: Optional[FlightState]) -> str:
+        """Flight phase of the vehicle state, without hysteresis"""
+        if state is None:
+            return "search"
+        if state.armed is False:
+            return "disarmed"
+
+        altitude = state.relative_alt
+        speed = state.ground_speed
+        climb = state.climb_rate
+        if altitude is not None and altitude < self.ground_altitude:
+            return "ground"
+        if state.mode == "LAND" or (
+            state.mode in self.MISSION_MODES
+            and altitude is not None
+            and altitude < self.approach_altitude
+            and climb is not None
+            and climb < -0.5
+        ):
+            return "approach"
+        if speed is not None:
+            if state.mode in self.HOVER_MODES and speed < self.hover_speed:
+                return "stabilise"
+            if state.mode in self.MISSION_MODES and speed > self.cruise_speed:
+                return "cruise"
+        return "search"
+
+    def update(self, state: Optional[FlightState], now: float) -> str:
+        """Current phase, switching only after the new one held for hold_time"""
+        phase = self.classify(state)
+        if phase == self.phase:
+            self.candidate = None
+        elif phase != self.candidate:
+            self.candidate = phase
+            self.candidate_since = now
+        elif now - self.candidate_since >= self.hold_time:
+            logger.info(
+                "Flight phase %s -> %s (mode %s)",
+                self.phase,
+                phase,
+                state.mode if state else "UNKNOWN",
             )
-            processed_frame = frame_data.frame.copy()
+            self.phase = phase
+            self.candidate = None
+            # Run right away instead of waiting out the previous phase's rate
+            self.last_run.clear()
+        return self.phase
+
+    def plan(
+        self, state: Optional[FlightState], now: float, camera: str = DEFAULT_CAMERA
+    ) -> Optional[InferencePlan]:
+        """Plan for this frame, None when the detector should not run on it
+
+        Shared by every camera, the rate applies to each camera separately.
+        The rate only counts frames passed to record_run(), a planned frame
+        that is rejected or not submitted leaves the next one due.
+        """
+        plan = self.plans[self.update(state, now)]
+        last_run = self.last_run.get(camera, float("-inf"))
+        if plan.rate is not None and (
+            plan.rate <= 0 or now - last_run < 1.0 / plan.rate
+        ):
+            self.skipped += 1
+            return None
+        return plan
 
-        return ProcessedResult(
-            processed_frame=processed_frame,
-            gps_coordinates=gps_coords,
-            pixel_coordinates=pixel_coords,
-            timestamp=frame_data.timestamp,
+    def record_run(self, now: float, camera: str = DEFAULT_CAMERA):
+        """A planned frame of the camera was submitted to the detector"""
+        self.last_run[camera] = now
+        self.runs += 1
+
+    def get_stats(self, reset: bool = True) -> Dict[str, Any]:
+        stats = {"phase": self.phase, "runs": self.runs, "skipped": self.skipped}
+        if reset:
+            self.runs = 0
+            self.skipped = 0
+        return stats
+
+
+class FrameQualityGate:
+    """Rejects or down-weights motion-blurred frames before inference
+
+    Combines the body angular rate from ATTITUDE with the variance of the
+    Laplacian of a small grayscale copy of the frame. Sharpness is compared
+    to a running baseline since its absolute value depends on the scene.
+    The quality weight in [0, 1] falls linearly between the soft and hard
+    limits, frames below `min_quality` are not sent to the detector.
+    """
+
+    def __init__(
+        self,
+        width: int = 320,
+        soft_rate: float = 0.3,
+        max_rate: float = 1.0,
+        min_sharpness: float = 0.4,
+        min_quality: float = 0.25,
+    ):
+        self.width = width
+        self.soft_rate = soft_rate  # rad/s, full weight below this
+        self.max_rate = max_rate  # rad/s, rejected above this
+        self.min_sharpness = min_sharpness  # fraction of the baseline sharpness
+        self.min_quality = min_quality
+        self.baseline: Optional[float] = None
+
+        self.passed = 0
+        self.rejected_rate = 0
+        self.rejected_blur = 0
+        self.quality_sum = 0.0
+
+    def sharpness(self, frame: np.ndarray) -> float:
+        """Variance of the Laplacian of a downsampled grayscale frame"""
+        height, width = frame.shape[:2]
+        scale = min(self.width / width, 1.0)
+        # Bilinear sampling is cheaper than area averaging and keeps more of
+        # the fine detail that blur removes
+        small = cv2.resize(
+            frame,
+            (max(int(width * scale), 1), max(int(height * scale), 1)),
+            interpolation=cv2.INTER_LINEAR,
         )
+        if small.ndim == 3:
+            small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return float(cv2.Laplacian(small, cv2.CV_32F).var())
+
+    def check(
+        self, frame: np.ndarray, angular_rate: Optional[float]
+    ) -> Optional[float]:
+        """Quality weight of the frame, None when it should be skipped"""
+        rate_quality = 1.0
+        if angular_rate is not None:
+            rate_quality = float(
+                np.clip(
+                    (self.max_rate - angular_rate) / (self.max_rate - self.soft_rate),
+                    0.0,
+                    1.0,
+                )
+            )
+            if rate_quality < self.min_quality:
+                # Blur is certain, skip the sharpness measurement too
+                self.rejected_rate += 1
+                return None
+
+        sharpness = self.sharpness(frame)
+        if self.baseline is None:
+            self.baseline = sharpness
+        ratio = sharpness / max(self.baseline, 1e-6)
+        # Follow sharper scenes quickly, blurrier ones slowly so a burst of
+        # blurred frames does not become the new normal
+        alpha = 0.2 if ratio > 1.0 else 0.02
+        self.baseline += alpha * (sharpness - self.baseline)
+
+        blur_quality = float(
+            np.clip(
+                (ratio - self.min_sharpness) / (1.0 - self.min_sharpness), 0.0, 1.0
+            )
+        )
+        quality = min(rate_quality, blur_quality)
+        if quality < self.min_quality:
+            self.rejected_blur += 1
+            return None
+
+        self.passed += 1
+        self.quality_sum += quality
+        return quality
+
+    def get_stats(self, reset: bool = True) -> Dict[str, Any]:
+        stats = {
+            "passed": self.passed,
+            "rejected_rate": self.rejected_rate,
+            "rejected_blur": self.rejected_blur,
+            "mean_quality": round(self.quality_sum / max(self.passed, 1), 2),
+            "baseline": round(self.baseline or 0.0, 1),
+        }
+        if reset:
+            self.passed = 0
+            self.rejected_rate = 0
+            self.rejected_blur = 0
+            self.quality_sum = 0.0
+        return stats
 
 
 class MAVLinkProxy:
@@ -179,6 +1286,8 @@ class MAVLinkProxy:
         self.clients_lock = threading.Lock()
         self.running = False
         self.drone_data = dict()
+        # Timestamped poses for lookups at frame capture time
+        self.pose_buffer = PoseBuffer()
 
     def start(self):
         # Initialize MAVLink connection
@@ -218,7 +1327,19 @@ class MAVLinkProxy:
                     logger.warning("Failed to close client socket")
             self.clients.clear()
 
-    def get_drone_data(self) -> Any | None:
+    def get_drone_data(self, timestamp: Optional[float] = None) -> Any | None:
+        """(position, attitude, ground_level, mode) of the drone
+
+        With a `time.time()` timestamp, e.g. a frame's exposure time, the pose
+        is interpolated from the pose buffer, the latest values are used when
+        it has nothing close enough.
+        """
+        mode = self.drone_data.get("mode", "UNKNOWN")
+        if timestamp is not None:
+            pose = self.pose_buffer.lookup(timestamp)
+            if pose is not None:
+                return (*pose, mode)
+
         if "drone_position" not in self.drone_data or not self.drone_data["drone_position"]:
           logger.warning("Drone position not available")
           return None
@@ -232,8 +1353,19 @@ class MAVLinkProxy:
             self.drone_data["drone_position"],
             self.drone_data["drone_attitude"],
             self.drone_data["ground_level"],
-            self.drone_data.get("mode", "UNKNOWN"),
+            mode,
         )
+    def get_flight_state(self) -> FlightState:
+        """Mode, arming and motion state for the inference scheduler"""
+        return FlightState(
+            mode=self.drone_data.get("mode", "UNKNOWN"),
+            armed=self.drone_data.get("armed"),
+            relative_alt=self.drone_data.get("relative_alt"),
+            ground_speed=self.drone_data.get("ground_speed"),
+            climb_rate=self.drone_data.get("climb_rate"),
+            angular_rate=self.drone_data.get("angular_rate"),
+        )
+
     def fetch_drone_data(self, msg):
         """Get current drone position, attitude, and ground level"""
         if not self.connection:
@@ -251,6 +1383,16 @@ class MAVLinkProxy:
 
             self.drone_data["drone_position"] = (lat, lon, alt_amsl)
             self.drone_data["ground_level"] = alt_amsl - relative_alt
+            self.drone_data["relative_alt"] = relative_alt
+            # cm/s in NED, vz is positive down
+            self.drone_data["ground_speed"] = float(np.hypot(msg.vx, msg.vy)) / 100.0
+            self.drone_data["climb_rate"] = -msg.vz / 100.0
+            self.pose_buffer.add_position(
+                msg.time_boot_ms,
+                (lat, lon, alt_amsl),
+                alt_amsl - relative_alt,
+                received=getattr(msg, "_timestamp", None),
+            )
 
         elif msg_type == "ATTITUDE":
             roll = msg.roll
@@ -262,6 +1404,24 @@ class MAVLinkProxy:
                 yaw += 2 * np.pi
 
             self.drone_data["drone_attitude"] = (roll, pitch, yaw)
+            self.drone_data["angular_rate"] = float(
+                np.linalg.norm((msg.rollspeed, msg.pitchspeed, msg.yawspeed))
+            )
+            self.pose_buffer.add_attitude(
+                msg.time_boot_ms,
+                (roll, pitch, yaw),
+                received=getattr(msg, "_timestamp", None),
+            )
+
+        elif msg_type == "HEARTBEAT":
+            # Skip heartbeats of ground stations and other non-autopilot nodes
+            if (
+                msg.type != mavutil.mavlink.MAV_TYPE_GCS
+                and msg.autopilot != mavutil.mavlink.MAV_AUTOPILOT_INVALID
+            ):
+                self.drone_data["armed"] = bool(
+                    msg.base_mode & mavutil.mavlink.MAV_MODE_FLAG_SAFETY_ARMED
+                )
 
         self.drone_data["mode"] = self.connection.get_mode()
 
@@ -349,12 +1509,67 @@ class ZMQServer:
         control_port: int = 5556,
         video_source: int = 0,
         is_simulation: bool = False,
+        transport: str = "jpeg",
+        target_bitrate: float = TARGET_BITRATE,
+        fps: Optional[float] = None,
+        annotated_stream: bool = True,
+        live: bool = False,
+        backend: str = "auto",
+        model_path: Optional[str] = None,
+        detect_interval: int = 1,
+        roi_mode: bool = False,
+        tiled: bool = False,
+        inference_workers: int = 0,
+        inference_scheduler: bool = True,
+        quality_gate: bool = True,
+        cameras: Optional[List[CameraConfig]] = None,
+        dem_path: Optional[str] = None,
     ):
         self.video_port = video_port
         self.control_port = control_port
         self.video_source = video_source
         self.is_simulation = is_simulation
 
+        # Capture sources, a single camera on video_source unless configured.
+        # The first camera keeps the plain topic names
+        self.cameras = cameras or [CameraConfig(source=video_source)]
+        for i, camera in enumerate(self.cameras):
+            if i > 0 and not camera.topic_prefix:
+                camera.topic_prefix = f"{camera.name}_"
+        if len({camera.name for camera in self.cameras}) != len(self.cameras):
+            raise ValueError("Camera names must be unique")
+
+        # Video transport, "jpeg" or an inter-frame codec with one encoder per topic
+        if transport not in TRANSPORTS:
+            raise ValueError(f"Unknown transport '{transport}', use one of {TRANSPORTS}")
+        self.transport = transport
+        self.encoders: Dict[bytes, VideoEncoder] = {}
+
+        # The annotated JPEG stream is optional, clients can draw overlays
+        # themselves from the detections topic
+        self.annotated_stream = annotated_stream
+
+        # Latency first: a tiny send queue so stale frames are dropped at the
+        # source instead of piling up behind a slow link
+        self.live = live
+        self.stream_seq: Dict[bytes, int] = {}
+
+        # Video loop rate, the camera's native rate unless configured
+        self.fps = fps
+        self.pacers: Dict[str, FramePacer] = {}
+        self.stream_fps: Dict[bytes, float] = {}  # topic -> its camera's rate
+
+        # Adaptive quality/resolution/frame rate, one controller per topic
+        self.target_bitrate = target_bitrate
+        self.stream_controllers: Dict[bytes, AdaptiveStreamController] = {}
+
+        # cv2.imencode and the PyAV encoders release the GIL, so raw and
+        # processed frames are encoded concurrently off the event loop
+        self.encode_executor = ThreadPoolExecutor(
+            max_workers=2, thread_name_prefix="encode"
+        )
+        self.stage_timings = StageTimings()
+
         # ZMQ Context
         self.context = zmq.asyncio.Context()
 
@@ -362,14 +1577,18 @@ class ZMQServer:
         self.video_socket = None
         self.control_socket = None
 
-        # Video capture
-        self.cap = None
+        # Live subscriptions on the video XPUB socket, topic prefix -> count
+        self.subscriptions: Dict[bytes, int] = {}
+
+        # Video capture, one capture thread per camera
+        self.capture_threads: Dict[str, CaptureThread] = {}
 
         # State
         self.hook_state = "dropped"
         self.running = False
 
-        # Latest processed results
+        # Latest processed results, target positions filtered per track
+        self.target_filter = TargetFilterBank()
         self.latest_gps_coordinates = {}
         self.latest_pixel_coordinates = {}
 
@@ -379,85 +1598,408 @@ class ZMQServer:
         # Object classes
         self.object_classes = ["helipad", "tank" if is_simulation else "real_tank"]
 
-        if is_simulation:
+        # Detection rate, classes and resolution follow the flight phase
+        self.scheduler = (
+            InferenceScheduler(focus_classes=["helipad"])
+            if inference_scheduler
+            else None
+        )
+        # Skips blurred frames and down-weights their target positions, each
+        # camera keeps its own sharpness baseline
+        self.quality_gates: Dict[str, FrameQualityGate] = (
+            {camera.name: FrameQualityGate() for camera in self.cameras}
+            if quality_gate
+            else {}
+        )
+
+        for i, camera in enumerate(self.cameras):
+            if camera.K is None:
+                camera.K, distortion = self._camera_intrinsics(camera, primary=i == 0)
+                if camera.distortion is None:
+                    camera.distortion = distortion
+
+        # Detector runtime, an exported onnx/openvino model next to the .pt
+        # weights avoids PyTorch on the CPU-only companion computer
+        if model_path is None:
+            model_path = (
+                "src/controls/detection/sim.pt"
+                if is_simulation
+                else "src/controls/detection/main.pt"
+            )
+        # Terrain for geolocation, cameras that do not geolocate skip it
+        terrain = ElevationModel(dem_path) if dem_path else None
+
+        # detect_interval > 1 runs the detector every N frames and propagates
+        # the boxes with optical flow in between, roi_mode crops around tracks
+        # and tiled searches the full frame as native resolution tiles
+        camera_kwargs = {
+            camera.name: dict(
+                K=camera.K,
+                distortion=camera.distortion,
+                terrain=terrain if camera.geolocate else None,
+                model_path=model_path,
+                backend=backend,
+                detect_interval=detect_interval,
+                roi_mode=roi_mode,
+                tiled=tiled,
+            )
+            for camera in self.cameras
+        }
+
+        # Initialize frame processor, worker processes load their own model.
+        # Every camera has its own tracker state, the model is loaded once
+        self.trackers: Dict[str, yolo.YoloObjectTracker] = {}
+        if inference_workers > 0:
+            self.frame_processor = ProcessFrameProcessor(
+                camera_kwargs=camera_kwargs,
+                object_classes=self.object_classes,
+                workers=inference_workers,
+            )
+        else:
+            for name, tracker_kwargs in camera_kwargs.items():
+                if self.trackers:
+                    backend = next(iter(self.trackers.values())).backend
+                    tracker_kwargs = {**tracker_kwargs, "backend": backend}
+                self.trackers[name] = yolo.YoloObjectTracker(**tracker_kwargs)
+            self.frame_processor = AsyncFrameProcessor(
+                trackers=self.trackers, object_classes=self.object_classes
+            )
+
+    def _camera_intrinsics(
+        self, camera: CameraConfig, primary: bool
+    ) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        """Intrinsic matrix and distortion from Gazebo or config/default.yaml
+
+        The primary camera uses the "camera" section and the gimbal's tilt_link
+        in simulation, other cameras "<name>_camera" and the link "<name>".
+        """
+        if self.is_simulation:
             camera_intrinsics = gz.get_camera_intrinsics(
                 model_name="iris_with_stationary_gimbal",
-                camera_link="tilt_link",
+                camera_link="tilt_link" if primary else camera.name,
                 world="delivery_runway",
             )
         else:
-            camera_intrinsics = mission_types.get_camera_intrinsics()
-
-        if camera_intrinsics is None:
-            raise RuntimeError("Failed to get camera intrinsics")
+            camera_intrinsics = mission_types.get_camera_intrinsics(
+                "camera" if primary else f"{camera.name}_camera"
+            )
 
-        camera_intrinsics = camera_intrinsics.get("camera_intrinsics", None)
         if camera_intrinsics is None:
-            raise RuntimeError("Camera intrinsics not found")
-
-        self.tracker = yolo.YoloObjectTracker(
-            K=camera_intrinsics,
-            model_path="src/controls/detection/sim.pt" if is_simulation else "src/controls/detection/main.pt",
+            raise RuntimeError(f"Failed to get intrinsics of camera {camera.name}")
+
+        K = camera_intrinsics.get("camera_intrinsics", None)
+        if K is None:
+            raise RuntimeError(f"Intrinsics of camera {camera.name} not found")
+        return K, camera_intrinsics.get("distortion", None)
+
+    def _filter_coordinates(
+        self, result: ProcessedResult
+    ) -> Dict[str, Tuple[float, float]]:
+        """Kalman filtered target positions of a result, by class
+
+        Every class of every camera is its own filter. Not keyed by SORT track
+        ID, those differ between inference workers and change on ID switches,
+        the filter's gate restarts a track that really moved. Blurred frames
+        count as noisier measurements.
+        """
+        classes = list(result.gps_coordinates)
+        if not classes:
+            return {}
+        filtered = self.target_filter.update(
+            [(result.camera, name) for name in classes],
+            np.array([result.gps_coordinates[name] for name in classes]),
+            result.timestamp,
+            labels=classes,
+            weights=np.full(len(classes), result.quality),
         )
+        return {
+            name: (float(lat), float(lon))
+            for name, (lat, lon) in zip(classes, filtered)
+        }
 
-        # Initialize frame processor
-        self.frame_processor = AsyncFrameProcessor(
-            tracker=self.tracker, object_classes=self.object_classes, max_workers=2
-        )
-
-    def _initialize_video_capture(self) -> bool:
-        """Initialize video capture"""
+    def _initialize_video_capture(self, camera: CameraConfig):
+        """Open the camera's video capture, None on failure"""
         try:
-            if self.is_simulation:
-                self.cap = gz.GazeboVideoCapture()
+            if not self.is_simulation:
+                cap = cv2.VideoCapture(camera.source)
+            elif camera is self.cameras[0]:
+                cap = gz.GazeboVideoCapture()
             else:
-                self.cap = cv2.VideoCapture(self.video_source)
+                cap = gz.GazeboVideoCapture(camera_port=int(camera.source))
 
-            if not self.cap.isOpened():
-                logger.error(f"Failed to open video source {self.video_source}")
-                return False
+            if not cap.isOpened():
+                logger.error(f"Failed to open video source {camera.source}")
+                return None
 
-            logger.info("Video capture initialized successfully")
-            return True
+            logger.info("Video capture of camera %s initialized", camera.name)
+            return cap
 
         except Exception as e:
             logger.error("Error initializing video capture: %s", e)
-            return False
+            return None
 
     def _encode_frame(
-        self, frame: np.ndarray, topic_prefix: str = ""
+        self, frame: np.ndarray, topic_prefix: str = "", quality: int = IMAGE_QUALITY
     ) -> Tuple[bytes, bytes]: #TODO: use a more efficient implementation in the future
         """Encode frame to JPEG"""
         topic = f"{topic_prefix}video".encode()
-        encode_params = [cv2.IMWRITE_JPEG_QUALITY, IMAGE_QUALITY, cv2.IMWRITE_JPEG_OPTIMIZE, 1]
+        encode_params = [cv2.IMWRITE_JPEG_QUALITY, quality, cv2.IMWRITE_JPEG_OPTIMIZE, 1]
 
         _, jpeg_frame = cv2.imencode(".jpg", frame, encode_params)
         return topic, jpeg_frame.tobytes()
 
-    async def _video_publisher_loop(self, mavlink_proxy: MAVLinkProxy):
-        """Main video publishing loop"""
-        if not self._initialize_video_capture():
+    def _encode_messages(
+        self,
+        frame: np.ndarray,
+        topic_prefix: str = "",
+        settings: Optional[StreamSettings] = None,
+        meta: Optional[FrameMeta] = None,
+    ) -> List[List[bytes]]:
+        """Encode frame for the selected transport as [topic, codec, meta, payload]"""
+        topic = f"{topic_prefix}video".encode()
+        if settings is None:
+            settings = StreamSettings()
+        meta_bytes = (meta or FrameMeta(0, 0, time.time())).pack()
+
+        if settings.scale < 1.0:
+            frame = cv2.resize(
+                frame,
+                None,
+                fx=settings.scale,
+                fy=settings.scale,
+                interpolation=cv2.INTER_AREA,
+            )
+
+        if self.transport == "jpeg":
+            topic, jpeg_frame = self._encode_frame(frame, topic_prefix, settings.quality)
+            return [[topic, b"jpeg", meta_bytes, jpeg_frame]]
+
+        # Created by _encoder() on the event loop, which iterates the encoders
+        encoder = self.encoders[topic]
+        codec = self.transport.encode()
+        return [[topic, codec, meta_bytes, packet] for packet in encoder.encode(frame)]
+
+    def _encoder(self, topic: bytes) -> VideoEncoder:
+        """Inter-frame encoder of a topic, call on the event loop thread"""
+        encoder = self.encoders.get(topic)
+        if encoder is None:
+            encoder = VideoEncoder(codec=self.transport)
+            self.encoders[topic] = encoder
+        return encoder
+
+    def _timed_encode(
+        self,
+        frame: np.ndarray,
+        topic_prefix: str,
+        settings: StreamSettings,
+        meta: FrameMeta,
+    ) -> Tuple[List[List[bytes]], float]:
+        start = time.perf_counter()
+        messages = self._encode_messages(frame, topic_prefix, settings, meta)
+        return messages, time.perf_counter() - start
+
+    async def _encode_stage(
+        self,
+        frame: np.ndarray,
+        topic_prefix: str = "",
+        seq: int = 0,
+        timestamp: float = 0.0,
+    ) -> List[List[bytes]]:
+        """Encode on the encode pool, no messages for idle or rate limited topics"""
+        topic = f"{topic_prefix}video".encode()
+        if not self._has_subscribers(topic):
+            return []
+        controller = self._stream_controller(topic)
+        if not controller.should_send(time.time()):
+            return []
+
+        if self.transport != "jpeg":
+            self._encoder(topic)
+
+        stream_seq = self.stream_seq.get(topic, 0) + 1
+        self.stream_seq[topic] = stream_seq
+        meta = FrameMeta(seq=seq, stream_seq=stream_seq, timestamp=timestamp)
+
+        # Snapshot the settings, the controller may change them mid-encode
+        messages, elapsed = await asyncio.get_running_loop().run_in_executor(
+            self.encode_executor,
+            self._timed_encode,
+            frame,
+            topic_prefix,
+            replace(controller.settings),
+            meta,
+        )
+        self.stage_timings.record(f"encode_{topic.decode()}", elapsed)
+        return messages
+
+    def _stream_controller(self, topic: bytes) -> AdaptiveStreamController:
+        controller = self.stream_controllers.get(topic)
+        if controller is None:
+            controller = AdaptiveStreamController(
+                target_bitrate=self.target_bitrate,
+                max_fps=self.stream_fps.get(topic, DEFAULT_FPS),
+            )
+            self.stream_controllers[topic] = controller
+        return controller
+
+    async def _publish(self, messages: List[List[bytes]]):
+        # XPUB never blocks, it drops for a slow subscriber alone once its queue
+        # is full. Clients report that lag through CLIENT_STATS and request a
+        # keyframe to resync inter-frame streams
+        for message in messages:
+            await self.video_socket.send_multipart(message, zmq.NOBLOCK)
+            controller = self.stream_controllers.get(message[0])
+            if controller:
+                controller.record_sent(sum(len(part) for part in message))
+
+    def _update_stream_controllers(self):
+        now = time.time()
+        for topic, controller in self.stream_controllers.items():
+            if controller.update(now):
+                logger.info(
+                    "Stream %s: %.0f kbit/s -> %s",
+                    topic.decode(),
+                    controller.bitrate / 1000,
+                    controller.settings,
+                )
+
+    def _has_subscribers(self, topic: bytes) -> bool:
+        """Whether any connected client would receive `topic`"""
+        return any(
+            topic.startswith(prefix) for prefix, count in self.subscriptions.items()
+        )
+
+    async def _subscription_loop(self):
+        """Track video subscriptions reported by the XPUB socket"""
+        while self.running:
+            try:
+                if not await self.video_socket.poll(timeout=100):
+                    continue
+                event = await self.video_socket.recv()
+                if not event:
+                    continue
+
+                subscribed, prefix = event[0] == 1, event[1:]
+                if subscribed:
+                    self.subscriptions[prefix] = self.subscriptions.get(prefix, 0) + 1
+                    # A new subscriber can only join an inter-frame stream at a keyframe
+                    for topic, encoder in self.encoders.items():
+                        if topic.startswith(prefix):
+                            encoder.request_keyframe()
+                elif prefix in self.subscriptions:
+                    self.subscriptions[prefix] -= 1
+                    if self.subscriptions[prefix] <= 0:
+                        del self.subscriptions[prefix]
+
+                logger.info(
+                    "Video %s '%s', subscriptions: %s",
+                    "subscribe" if subscribed else "unsubscribe",
+                    prefix.decode(errors="replace"),
+                    self.subscriptions,
+                )
+            except Exception as e:
+                logger.error(f"Error in subscription tracking: {e}")
+                await asyncio.sleep(0.1)
+
+    async def _video_publisher_loop(
+        self, mavlink_proxy: MAVLinkProxy, camera: CameraConfig
+    ):
+        """Main video publishing loop of one camera"""
+        loop = asyncio.get_running_loop()
+        # Pipeline wide stats are logged by the first camera's loop only
+        primary = camera is self.cameras[0]
+
+        # Opening a GStreamer pipeline can block for seconds
+        cap = await loop.run_in_executor(None, self._initialize_video_capture, camera)
+        if cap is None:
             return
 
-        logger.info("Video publishing started")
+        capture_thread = CaptureThread(cap)
+        capture_thread.start(loop)
+        self.capture_threads[camera.name] = capture_thread
+
+        fps = self.fps
+        if not fps:
+            camera_fps = cap.get(cv2.CAP_PROP_FPS)
+            fps = camera_fps if camera_fps and camera_fps > 0 else DEFAULT_FPS
+        pacer = FramePacer(fps)
+        self.pacers[camera.name] = pacer
+        self.stream_fps[camera.video_topic] = fps
+        self.stream_fps[camera.processed_topic] = fps
+        logger.info(f"Pacing video loop of camera {camera.name} at {fps:.1f} FPS")
+
+        processed_prefix = f"processed_{camera.topic_prefix}"
+        quality_gate = self.quality_gates.get(camera.name)
+
+        logger.info("Video publishing of camera %s started", camera.name)
 
         frame_count = 0
         fps_timer = time.time()
 
         while self.running:
+            buffer = None
+            result = None
             try:
-                ret, frame = self.cap.read()
-                if not ret:
-                    logger.warning("Failed to capture frame")
-                    await asyncio.sleep(0.1)
+                stage_start = time.perf_counter()
+                captured = await capture_thread.next_frame()
+                if captured is None:
+                    continue
+                frame = captured.frame
+                buffer = captured.buffer
+                self.stage_timings.record(
+                    "capture_wait", time.perf_counter() - stage_start
+                )
+
+                # Too far behind to be useful, wait for a fresher frame
+                if pacer.is_stale(captured.timestamp):
                     continue
 
-                # Always send raw frame
-                topic, encoded_frame = self._encode_frame(frame)
-                await self.video_socket.send_multipart([topic, encoded_frame], zmq.NOBLOCK)
+                # Check for processed results, they belong to an earlier frame
+                result = self.frame_processor.get_result(camera.name)
+                if result and camera.geolocate:
+                    # Filter the measured positions, the detections topic and
+                    # the GPS commands report the filtered ones
+                    if result.gps_coordinates:
+                        result.gps_coordinates = self._filter_coordinates(result)
+                    self.latest_gps_coordinates = self.target_filter.estimates(
+                        result.timestamp
+                    )
+                    if result.pixel_coordinates is not None:
+                        self.latest_pixel_coordinates = result.pixel_coordinates
+
+                # Encode raw and processed frames concurrently. The raw encode
+                # completes before the buffer is handed over for annotation
+                stage_start = time.perf_counter()
+                encodes = [
+                    self._encode_stage(
+                        frame, camera.topic_prefix, captured.seq, captured.timestamp
+                    )
+                ]
+                if result and result.annotated:
+                    encodes.append(
+                        self._encode_stage(
+                            result.processed_frame,
+                            processed_prefix,
+                            result.seq,
+                            result.timestamp,
+                        )
+                    )
+                encoded = await asyncio.gather(*encodes)
+                if result and self._has_subscribers(camera.detections_topic):
+                    payload = result.detections_message().pack()
+                    topic = camera.detections_topic
+                    encoded.append([[topic, b"detections", payload]])
+                self.stage_timings.record(
+                    "encode_wall", time.perf_counter() - stage_start
+                )
+
+                stage_start = time.perf_counter()
+                for messages in encoded:
+                    await self._publish(messages)
+                self.stage_timings.record("publish", time.perf_counter() - stage_start)
 
                 # Submit frame for processing (non-blocking)
-                data = mavlink_proxy.get_drone_data()
+                data = mavlink_proxy.get_drone_data(captured.timestamp - camera.latency)
                 if data is None:
                     logger.warning("Drone data not available, skipping frame")
                     await asyncio.sleep(0.1)
@@ -469,58 +2011,90 @@ class ZMQServer:
                     mode,
                 ) = data
 
+                plan = InferencePlan(rate=None)
+                flight_state = mavlink_proxy.get_flight_state()
+                planned_at = time.monotonic()
+                if self.scheduler is not None:
+                    plan = self.scheduler.plan(flight_state, planned_at, camera.name)
+
+                quality = 1.0
+                if plan is not None and quality_gate is not None:
+                    quality = quality_gate.check(frame, flight_state.angular_rate)
+
+                # The processor works on the ring slot directly, no copy
                 frame_data = FrameData(
-                    frame=frame.copy(),
-                    timestamp=time.time(),
+                    frame=frame,
+                    timestamp=captured.timestamp,
                     drone_position=drone_pos,
                     drone_attitude=drone_att,
                     ground_level=ground_level,
                     mode=mode,
+                    seq=captured.seq,
+                    buffer=buffer,
+                    annotate=(
+                        self.annotated_stream
+                        and self._has_subscribers(camera.processed_topic)
+                    ),
+                    camera=camera.name,
+                    geolocate=camera.geolocate,
                 )
 
-                # Submit for processing (non-blocking)
-                if not self.frame_processor.submit_frame(frame_data):
-                    logger.debug("Frame processor queue full, skipping frame")
-
-                # Check for processed results
-                result = self.frame_processor.get_result()
-                if result:
-                    # Update latest coordinates
-                    if result.gps_coordinates is not None:
-                        self.latest_gps_coordinates = result.gps_coordinates
-                    if result.pixel_coordinates is not None:
-                        self.latest_pixel_coordinates = result.pixel_coordinates
-
-                    # Send processed frame
-                    topic, proccessed_frame = self._encode_frame(
-                        result.processed_frame, "processed_"
-                    )
-                    await self.video_socket.send_multipart([topic, proccessed_frame], zmq.NOBLOCK)
-                else:
-                  logger.debug("No processed result available, sending raw frame")
-                  # If no processed result, just send the original frame
-                  await self.video_socket.send_multipart([topic, encoded_frame], zmq.NOBLOCK)
+                # Submit for processing (non-blocking), unless the scheduler
+                # throttles or pauses inference in this flight phase or the
+                # frame is too blurred to trust
+                if plan is not None and quality is not None:
+                    frame_data.object_classes = plan.object_classes
+                    frame_data.tiled = plan.tiled
+                    frame_data.propagate = plan.propagate
+                    frame_data.quality = quality
+                    if self.frame_processor.submit_frame(frame_data):
+                        buffer = None  # ownership moved to the processor
+                        if self.scheduler is not None:
+                            self.scheduler.record_run(planned_at, camera.name)
+                    else:
+                        logger.debug("Frame processor queue full, skipping frame")
 
                 frame_count += 1
+                if primary:
+                    self._update_stream_controllers()
 
                 # FPS logging
                 if time.time() - fps_timer > 5:
                     fps = frame_count / 5
-                    logger.debug(f"Publishing video at {fps:.1f} FPS")
+                    logger.debug(f"Publishing {camera.name} video at {fps:.1f} FPS")
+                    logger.debug("Capture stats: %s", capture_thread.get_stats())
+                    logger.debug("Pacer stats: %s", pacer.get_stats())
+                    if quality_gate is not None:
+                        logger.debug("Frame quality gate: %s", quality_gate.get_stats())
+                    if primary:
+                        logger.debug("Stage timings: %s", self.stage_timings.summary())
+                        logger.debug(
+                            "Frame processor stats: %s",
+                            self.frame_processor.get_stats(),
+                        )
+                        if self.scheduler is not None:
+                            logger.debug(
+                                "Inference scheduler: %s", self.scheduler.get_stats()
+                            )
                     frame_count = 0
                     fps_timer = time.time()
 
-                # Small sleep to prevent CPU overload
-                await asyncio.sleep(CPU_BURNOUT) # 30fps is sufficient for video publishing
+                # Sleep only for what is left of this frame's budget
+                await pacer.wait()
 
             except Exception:
                 logger.error("Error in video loop:\n%s", traceback.format_exc())
                 await asyncio.sleep(0.1)
+            finally:
+                if buffer is not None:
+                    buffer.release()
+                if result is not None:
+                    result.release()
 
-        # Cleanup
-        if self.cap:
-            self.cap.release()
-        logger.info("Video publishing stopped")
+        # Cleanup, the capture thread owns and releases the capture. Joining
+        # it blocks, so it runs on the default executor
+        await asyncio.get_running_loop().run_in_executor(None, capture_thread.stop)
+        logger.info("Video publishing of camera %s stopped", camera.name)
 
     async def _control_receiver_loop(self):
         """Control command receiver loop"""
@@ -575,6 +2149,34 @@ class ZMQServer:
                 return f"ACK>{coords[0]},{coords[1]}"
             else:
                 return "NACK: No GPS data available"
+        elif command == ZMQTopics.REQUEST_KEYFRAME.name:
+            if self.transport == "jpeg":
+                return "ACK: Every JPEG frame is a keyframe"
+            for encoder in self.encoders.values():
+                encoder.request_keyframe()
+            return "ACK: Keyframe requested"
+        elif command.startswith(ZMQTopics.CLIENT_STATS.name):
+            # CLIENT_STATS video=12.5;processed_video=4.0
+            known = {
+                topic
+                for camera in self.cameras
+                for topic in (camera.video_topic, camera.processed_topic)
+            }
+            stats = {}
+            try:
+                for item in command[len(ZMQTopics.CLIENT_STATS.name):].strip().split(";"):
+                    if not item:
+                        continue
+                    topic, fps = item.split("=")
+                    stats[topic.strip().encode()] = float(fps)
+            except ValueError:
+                return "NACK: Malformed client stats"
+            unknown = [topic.decode() for topic in stats if topic not in known]
+            if unknown:
+                return f"NACK: Unknown topics {', '.join(unknown)}"
+            for topic, fps in stats.items():
+                self._stream_controller(topic).record_client_fps(fps)
+            return "ACK: Client stats received"
         else:
             logger.error("Unknown command: %s", command)
             return "NACK: Unknown command"
@@ -586,7 +2188,14 @@ class ZMQServer:
             return
 
         # Initialize ZMQ sockets
-        self.video_socket = self.context.socket(zmq.PUB)
+        # XPUB so subscriptions are visible, VERBOSER reports every (un)subscribe
+        # so they can be reference counted across clients
+        self.video_socket = self.context.socket(zmq.XPUB)
+        self.video_socket.setsockopt(zmq.XPUB_VERBOSER, 1)
+        if self.live:
+            # ZMQ_CONFLATE does not support multipart messages, a send queue of
+            # a couple of frames gives the same latency bound
+            self.video_socket.setsockopt(zmq.SNDHWM, 2)
         self.video_socket.bind(f"tcp://*:{self.video_port}")
 
         self.control_socket = self.context.socket(zmq.REP)
@@ -600,7 +2209,12 @@ class ZMQServer:
 
         # Run both loops concurrently
         await asyncio.gather(
-            self._video_publisher_loop(mavlink_proxy), self._control_receiver_loop()
+            *(
+                self._video_publisher_loop(mavlink_proxy, camera)
+                for camera in self.cameras
+            ),
+            self._control_receiver_loop(),
+            self._subscription_loop(),
         )
 
     def stop(self):
@@ -608,9 +2222,12 @@ class ZMQServer:
         logger.info("Stopping server...")
         self.running = False
 
-        # Stop frame processor
+        # Stop capture, frame processor and encoders
+        for capture_thread in self.capture_threads.values():
+            capture_thread.stop()
         if self.frame_processor:
             self.frame_processor.stop()
+        self.encode_executor.shutdown(wait=True)
 
         # Close sockets
         if self.video_socket:
@@ -638,6 +2255,102 @@ async def main():
     parser.add_argument(
         "--video-source", default=0, help="Video source (device ID or file path)"
     )
+    parser.add_argument(
+        "--camera",
+        action="append",
+        default=[],
+        metavar="NAME=SOURCE",
+        help=(
+            "Additional camera, e.g. forward=/dev/video2 (a UDP port in "
+            "simulation). Intrinsics come from the <NAME>_camera config section, "
+            "its frames are detected on but not geolocated"
+        ),
+    )
+    parser.add_argument(
+        "--transport",
+        choices=TRANSPORTS,
+        default="jpeg",
+        help="Video transport, per-frame JPEG or inter-frame H.264/VP8 (needs PyAV)",
+    )
+    parser.add_argument(
+        "--no-annotated-stream",
+        action="store_true",
+        help="Do not draw or send the annotated processed_video stream",
+    )
+    parser.add_argument(
+        "--live",
+        action="store_true",
+        help="Latency first video, drop frames instead of queueing them",
+    )
+    parser.add_argument(
+        "--fps",
+        type=float,
+        default=None,
+        help="Video loop rate, defaults to the camera's native frame rate",
+    )
+    parser.add_argument(
+        "--backend",
+        choices=BACKENDS,
+        default="auto",
+        help="Detector runtime, onnx/openvino load the export next to the .pt weights",
+    )
+    parser.add_argument(
+        "--model",
+        default=None,
+        help="Detector model path, defaults to sim.pt/main.pt",
+    )
+    parser.add_argument(
+        "--detect-interval",
+        type=int,
+        default=1,
+        help="Run the detector every N frames, track with optical flow in between",
+    )
+    parser.add_argument(
+        "--roi",
+        action="store_true",
+        help="Detect on native resolution crops around tracked targets",
+    )
+    parser.add_argument(
+        "--tiled",
+        action="store_true",
+        help="Search the full frame as overlapping tiles, for small targets",
+    )
+    parser.add_argument(
+        "--inference-workers",
+        type=int,
+        default=0,
+        help="Run detection in N worker processes instead of threads",
+    )
+    parser.add_argument(
+        "--no-inference-scheduler",
+        action="store_true",
+        help="Run detection at full rate in every flight phase",
+    )
+    parser.add_argument(
+        "--no-quality-gate",
+        action="store_true",
+        help="Send motion-blurred frames to the detector too",
+    )
+    parser.add_argument(
+        "--camera-latency",
+        type=float,
+        default=0.0,
+        metavar="MS",
+        help="Delay from exposure to frame capture, the pose is taken at exposure",
+    )
+    parser.add_argument(
+        "--dem",
+        default=None,
+        metavar="DIR",
+        help="Folder of elevation tiles (SRTM .hgt/.npy or GeoTIFF) to geolocate "
+        "targets on the terrain instead of a flat ground plane",
+    )
+    parser.add_argument(
+        "--target-bitrate",
+        type=float,
+        default=TARGET_BITRATE / 1000,
+        help="Per-topic video bitrate target in kbit/s for the adaptive controller",
+    )
 
     args = parser.parse_args()
 
@@ -647,6 +2360,20 @@ async def main():
     except ValueError:
         pass
 
+    latency = args.camera_latency / 1000
+    cameras = [CameraConfig(source=args.video_source, latency=latency)]
+    for camera in args.camera:
+        name, _, source = camera.partition("=")
+        if not name or not source:
+            parser.error(f"--camera expects NAME=SOURCE, got '{camera}'")
+        try:
+            source = int(source)
+        except ValueError:
+            pass
+        cameras.append(
+            CameraConfig(name=name, source=source, geolocate=False, latency=latency)
+        )
+
     # Initialize MAVLink proxy
     connection_string = "udp:127.0.0.1:14550" if args.is_simulation else "/dev/ttyUSB0"
     mavlink_proxy = MAVLinkProxy(connection_string)
@@ -669,6 +2396,21 @@ async def main():
         control_port=args.control_port,
         video_source=args.video_source,
         is_simulation=args.is_simulation,
+        transport=args.transport,
+        target_bitrate=args.target_bitrate * 1000,
+        fps=args.fps,
+        annotated_stream=not args.no_annotated_stream,
+        live=args.live,
+        backend=args.backend,
+        model_path=args.model,
+        detect_interval=args.detect_interval,
+        roi_mode=args.roi,
+        tiled=args.tiled,
+        inference_workers=args.inference_workers,
+        inference_scheduler=not args.no_inference_scheduler,
+        quality_gate=not args.no_quality_gate,
+        cameras=cameras,
+        dem_path=args.dem,
     )
 
     try: